@@ -13,10 +13,12 @@ from openai import OpenAI
 
 from .agent_utils import extract_tool_calls, last_ai_content, wrap_tool
 from ..config import RuntimeConfig, DEFAULT_CONFIG
+from ..resource_cache import DerivedCache, ResourceCache
 from ..skills_runtime import load_skill, build_system_prompt, filter_tools, validate_output
 from ..state import RiskState, Finding
-from ..tools.csv_data import etf_industry_map, etf_codes_by_industry
+from ..tools.csv_data import industry_index, etf_codes_for_industries
 from ..tools.rules import get_blocklist
+from ..tools.text_index import BM25Index
 
 
 def _provenance(source: str, params: dict[str, Any]) -> dict[str, Any]:
@@ -78,26 +80,29 @@ def _cosine_similarity(a: np.ndarray, b: np.ndarray) -> np.ndarray:
 
 # ============ 文档缓存 ============
 
-_docs_cache: dict[str, list[dict[str, Any]]] = {}
-_embeddings_cache: dict[tuple[str, str, str], np.ndarray] = {}
+# 语料在文件变化后自动重新加载；BM25 索引与 embeddings 跟随语料对象重建，下标始终与语料一致
+_docs_cache = ResourceCache("rag_docs")
+_bm25_cache = DerivedCache("rag_bm25")
+_embeddings_cache = DerivedCache("rag_embeddings")
 _industry_embeddings_cache: tuple[list[str], np.ndarray, tuple[str, str]] | None = None
 
 
 def _get_cached_docs(path: Path) -> list[dict[str, Any]]:
     """获取缓存的文档，避免重复加载"""
-    key = str(path)
-    if key not in _docs_cache:
-        _docs_cache[key] = _load_rag_docs(path)
-    return _docs_cache[key]
+    return _docs_cache.get(str(path), [path], lambda: _load_rag_docs(path))
 
 
-def _get_cached_embeddings(path: Path, docs: list[dict[str, Any]], runtime: RuntimeConfig) -> np.ndarray:
+def _get_cached_bm25(docs: list[dict[str, Any]]) -> BM25Index:
+    """获取缓存的 BM25 索引（每个语料只分词一次）"""
+    return _bm25_cache.get(docs, lambda base: BM25Index([str(doc.get("text") or "") for doc in base]))
+
+
+def _get_cached_embeddings(docs: list[dict[str, Any]], runtime: RuntimeConfig) -> np.ndarray:
     """获取缓存的文档 embeddings"""
-    key = (str(path), runtime.openai_api_key or "", runtime.openai_base_url or "")
-    if key not in _embeddings_cache:
-        texts = [doc.get("text", "") for doc in docs]
-        _embeddings_cache[key] = _get_embeddings(texts, runtime)
-    return _embeddings_cache[key]
+    key = (runtime.openai_api_key or "", runtime.openai_base_url or "")
+    return _embeddings_cache.get(
+        docs, lambda base: _get_embeddings([doc.get("text", "") for doc in base], runtime), key=key
+    )
 
 
 def _get_industry_embeddings(industries: list[str], runtime: RuntimeConfig) -> tuple[list[str], np.ndarray]:
@@ -206,8 +211,22 @@ def _keyword_retrieve(docs: list[dict[str, Any]], query: str, limit: int) -> lis
     ]
 
 
+def _bm25_retrieve(docs: list[dict[str, Any]], query: str, limit: int) -> list[dict[str, Any]]:
+    """BM25 检索（中文 bigram 分词，无需 embedding 服务）"""
+    if not query or not docs:
+        return []
+    index = _get_cached_bm25(docs)
+    return [
+        {
+            "score": round(score, 4),
+            "snippet": (docs[idx].get("text") or "")[:200],
+            "meta": docs[idx].get("meta"),
+        }
+        for idx, score in index.search(query, limit)
+    ]
+
+
 def _vector_retrieve(
-    path: Path,
     docs: list[dict[str, Any]],
     query: str,
     limit: int,
@@ -218,7 +237,7 @@ def _vector_retrieve(
     if not query or not docs:
         return []
     try:
-        doc_embeddings = _get_cached_embeddings(path, docs, runtime)
+        doc_embeddings = _get_cached_embeddings(docs, runtime)
         query_embedding = _get_embeddings([query], runtime)[0]
         scores = _cosine_similarity(query_embedding, doc_embeddings)
 
@@ -252,8 +271,7 @@ def _infer_industry_hits(
         hits: 检索命中结果
         min_similarity: 最小相似度阈值（默认 0.5）
     """
-    mapping = etf_industry_map(runtime)
-    industries = sorted({v for v in mapping.values() if str(v).strip()})
+    industries = industry_index(runtime).industries.tolist()
     if not industries or not hits:
         return []
 
@@ -321,7 +339,7 @@ def rag_search(
     用法：
     - 设置 COMPLIANCE_RAG_SOURCE 为库名或文件路径；
     - 若为库名，将在 CSV_DATA_DIR 下尝试匹配同名文件。
-    - 设置 RAG_ENGINE=vector 启用向量检索（默认），=keyword 使用关键词检索。
+    - 设置 RAG_ENGINE=vector 启用向量检索（默认），=bm25 使用 BM25 检索，=keyword 使用关键词检索。
     - 向量检索使用阿里云 text-embedding-v4 模型。
     """
     runtime = runtime or DEFAULT_CONFIG
@@ -336,12 +354,13 @@ def rag_search(
     engine = (runtime.rag_engine or "vector").lower()
 
     if engine == "vector":
-        hits = _vector_retrieve(path, docs, query, limit, runtime)
+        hits = _vector_retrieve(docs, query, limit, runtime)
+    elif engine == "bm25":
+        hits = _bm25_retrieve(docs, query, limit)
     else:
         hits = _keyword_retrieve(docs, query, limit)
     industry_hits = _infer_industry_hits(hits, runtime)
-    industry_map = etf_codes_by_industry(industry_hits, runtime)
-    etf_blocklist = sorted({code for codes in industry_map.values() for code in codes})
+    etf_blocklist = etf_codes_for_industries(industry_hits, runtime)
 
     # 构建用于 LLM 上下文的文档引用
     context_docs = []
@@ -4,7 +4,6 @@ import hashlib
 import json
 import time
 from datetime import datetime, timezone, timedelta
-from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
@@ -16,6 +15,7 @@ from .agent_utils import extract_tool_calls, last_ai_content, wrap_tool
 from ..state import RiskState, Finding
 from ..tools.csv_data import macro_search_hits
 from ..config import RuntimeConfig, DEFAULT_CONFIG
+from ..resource_cache import ResourceCache
 from ..skills_runtime import load_skill, build_system_prompt, filter_tools, validate_output
 
 def _provenance(source: str, params: dict[str, Any]) -> dict[str, Any]:
@@ -28,6 +28,7 @@ def _provenance(source: str, params: dict[str, Any]) -> dict[str, Any]:
 
 
 _ROOT = Path(__file__).resolve().parents[2]
+_SERIES_CACHE = ResourceCache("macro_series", capacity=8)
 
 
 def _macro_series_path(config: RuntimeConfig) -> Path:
@@ -37,8 +38,11 @@ def _macro_series_path(config: RuntimeConfig) -> Path:
     return base / "macro_series.yaml"
 
 
-@lru_cache(maxsize=8)
 def _load_macro_series_config(path_str: str) -> dict[str, Any]:
+    return _SERIES_CACHE.get(path_str, [path_str], lambda: _read_macro_series_config(path_str))
+
+
+def _read_macro_series_config(path_str: str) -> dict[str, Any]:
     path = Path(path_str)
     if not path.exists():
         raise FileNotFoundError(f"macro series config not found: {path}")
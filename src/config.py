@@ -59,12 +59,22 @@ def _env_bool(name: str, default: bool = True) -> bool:
 @dataclass(frozen=True)
 class RuntimeConfig:
     market_lookback_days: int = 60
+    market_lookback_unit: str = "calendar"
+    volatility_model: str = "weighted"
     macro_stale_days: int = 30
     macro_severity_weight: float = 0.7
     cash_symbol: str = "CASH"
     lp_turnover_weight: float = 0.1
     lp_solver: Optional[str] = None
+    lp_time_limit: float = 5.0
+    solver_workers: int = 0
     csv_data_dir: str = ""
+    data_cache: bool = True
+    data_compact: bool = False
+    data_backend: str = "csv"
+    data_db_path: str = ""
+    shard_cache_size: int = 8
+    resource_check_interval: float = 2.0
     macro_series_config: str = ""
     tushare_token: str = ""
     openai_api_key: str = ""
@@ -83,12 +93,22 @@ class RuntimeConfig:
     def from_env(cls) -> "RuntimeConfig":
         return cls(
             market_lookback_days=_env_int("MARKET_LOOKBACK_DAYS", 60),
+            market_lookback_unit=os.getenv("MARKET_LOOKBACK_UNIT", "calendar").strip().lower() or "calendar",
+            volatility_model=os.getenv("VOLATILITY_MODEL", "weighted").strip().lower() or "weighted",
             macro_stale_days=_env_int("MACRO_STALE_DAYS", 30),
             macro_severity_weight=_env_float("MACRO_SEVERITY_WEIGHT", 0.7),
             cash_symbol=(os.getenv("CASH_SYMBOL", "CASH").strip() or "CASH"),
             lp_turnover_weight=_env_float("LP_TURNOVER_WEIGHT", 0.1),
             lp_solver=os.getenv("LP_SOLVER") or None,
+            lp_time_limit=_env_float("LP_TIME_LIMIT", 5.0),
+            solver_workers=_env_int("SOLVER_WORKERS", 0),
             csv_data_dir=os.getenv("CSV_DATA_DIR", "").strip(),
+            data_cache=_env_bool("DATA_CACHE", True),
+            data_compact=_env_bool("DATA_COMPACT", False),
+            data_backend=os.getenv("DATA_BACKEND", "csv").strip().lower() or "csv",
+            data_db_path=os.getenv("DATA_DB_PATH", "").strip(),
+            shard_cache_size=_env_int("SHARD_CACHE_SIZE", 8),
+            resource_check_interval=_env_float("RESOURCE_CHECK_INTERVAL", 2.0),
             macro_series_config=os.getenv("MACRO_SERIES_CONFIG", "").strip(),
             tushare_token=os.getenv("TUSHARE_TOKEN", "").strip(),
             openai_api_key=os.getenv("OPENAI_API_KEY", "").strip(),
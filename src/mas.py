@@ -9,6 +9,7 @@ from .app import _build_minimal_view, _build_payload, _load_llm, _print_tables
 from .graph import build_graph
 from .config import RuntimeConfig, DEFAULT_CONFIG
 from .state import new_state
+from .tools.whatif import WhatIfSession
 
 
 class RiskMAS:
@@ -33,6 +34,10 @@ class RiskMAS:
         state = new_state(intent, context or {})
         return self._graph.invoke(state)
 
+    def what_if(self, intent: Dict[str, Any], context: Optional[Dict[str, Any]] = None) -> WhatIfSession:
+        """建立交互式会话：之后 session.update({code: weight}) 增量返回指标与规则结果。"""
+        return WhatIfSession.open(intent, context, self._config)
+
     def run(
         self,
         intent: Dict[str, Any],
@@ -0,0 +1,301 @@
+"""Change-aware cache for file-backed resources (data files, rules, skills).
+
+Each entry remembers the files it was loaded from by (mtime_ns, size) and, for
+files up to ``HASH_LIMIT`` bytes, a sha256 of their content.  A cache hit
+re-stats those files at most once per ``RESOURCE_CHECK_INTERVAL`` seconds; if
+the stat changed but the content hash did not (a touch, a copy that preserved
+bytes) the entry is kept, otherwise the resource is reloaded.
+
+Reloads run outside the cache lock (one loader per key at a time) and the new
+value replaces the old one in a single assignment, so readers see either the
+previous or the new dataset, never a partially built one.  Caches created with a
+``dispose`` callback hand replaced and evicted values to it (e.g. to close a
+database connection) once they are out of the cache.
+
+Versions are content signatures, not counters: every source file is identified
+by its size and sha256 (or, above ``HASH_LIMIT``, its mtime and size), an
+entry's version is the digest of its sources, and ``data_version()`` digests
+every source loaded in this process.  Processes that loaded the same data report
+the same version, and LRU evictions or reloads of unchanged files leave it
+unchanged.  ``source_signature(paths)`` lets derived caches key on exactly the
+files they depend on.
+
+Objects computed from a cached value (a search index over cached documents, a
+compiled rule table) live in a ``DerivedCache`` keyed on that value's identity
+rather than on a second stat check of the files, so they are rebuilt exactly
+when the base value is replaced and never pair a stale base with a new version.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from .config import DEFAULT_CONFIG
+
+HASH_LIMIT = 16 << 20
+
+_SOURCES: Dict[str, str] = {}  # 已加载的源文件 -> 加载时的内容签名
+_SOURCES_LOCK = threading.Lock()
+_REGISTRY: List["ResourceCache"] = []
+
+
+def _file_signature(stat: Optional[Tuple[int, int]], digest: Optional[str]) -> str:
+    if stat is None:
+        return "missing"
+    if digest is not None:
+        return f"{stat[1]}:{digest}"
+    return f"{stat[0]}:{stat[1]}"
+
+
+def _digest(parts: Iterable[str]) -> str:
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+def _record(
+    paths: Tuple[Path, ...], stats: Tuple[Optional[Tuple[int, int]], ...], hashes: Tuple[Optional[str], ...]
+) -> str:
+    """登记各源文件的内容签名，返回由它们合成的条目版本。"""
+    signatures = [(str(path), _file_signature(stat, digest)) for path, stat, digest in zip(paths, stats, hashes)]
+    with _SOURCES_LOCK:
+        _SOURCES.update(signatures)
+    return _digest(f"{Path(path).name}={sig}" for path, sig in signatures)
+
+
+def data_version() -> str:
+    """本进程已加载的全部源文件内容签名的摘要（只取文件名，与数据目录所在位置无关；尚未加载任何资源时为空串）。"""
+    with _SOURCES_LOCK:
+        items = sorted(f"{Path(path).name}={sig}" for path, sig in _SOURCES.items())
+    return _digest(items) if items else ""
+
+
+def source_signature(paths: Iterable[Path | str]) -> str:
+    """paths 的内容签名：已加载过的文件取加载时登记的签名，其余按当前 mtime/大小。"""
+    parts = []
+    for path in paths:
+        path = Path(path)
+        with _SOURCES_LOCK:
+            sig = _SOURCES.get(str(path))
+        parts.append(f"{path.name}={sig if sig is not None else _file_signature(_stat(path), None)}")
+    return _digest(parts)
+
+
+def _stat(path: Path) -> Optional[Tuple[int, int]]:
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return int(stat.st_mtime_ns), int(stat.st_size)
+
+
+def _content_hash(path: Path, stat: Optional[Tuple[int, int]]) -> Optional[str]:
+    if stat is None or stat[1] > HASH_LIMIT:
+        return None
+    digest = hashlib.sha256()
+    try:
+        with path.open("rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    paths: Tuple[Path, ...]
+    stats: Tuple[Optional[Tuple[int, int]], ...]
+    hashes: Tuple[Optional[str], ...]
+    version: str
+    loaded_at: float
+    checked_at: float
+
+
+class ResourceCache:
+    """按 key 缓存由若干文件加载出的对象；文件变化时重新加载并整体替换。"""
+
+    def __init__(
+        self, name: str, capacity: Optional[int] = None, dispose: Optional[Callable[[Any], None]] = None
+    ) -> None:
+        self.name = name
+        self.capacity = capacity
+        self.dispose = dispose
+        self.check_interval: Optional[float] = None
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[Hashable, threading.Lock] = {}
+        _REGISTRY.append(self)
+
+    def _interval(self) -> float:
+        if self.check_interval is not None:
+            return self.check_interval
+        return float(DEFAULT_CONFIG.resource_check_interval)
+
+    def _unchanged(self, entry: _Entry, paths: Tuple[Path, ...], now: float) -> bool:
+        """文件签名未变（或仅 mtime 变化而内容哈希相同）时返回 True，并刷新检查时间。"""
+        if paths != entry.paths:
+            return False
+        stats = tuple(_stat(path) for path in paths)
+        if stats != entry.stats:
+            hashes = tuple(_content_hash(path, stat) for path, stat in zip(paths, stats))
+            if None in hashes or hashes != entry.hashes:
+                return False
+            entry.stats = stats
+        entry.checked_at = now
+        return True
+
+    def get(
+        self,
+        key: Hashable,
+        paths: Iterable[Path | str],
+        loader: Callable[[], Any],
+        capacity: Optional[int] = None,
+    ) -> Any:
+        """返回 key 对应的对象；距上次检查超过间隔且 paths 有变化时调用 loader 重新加载。"""
+        paths = tuple(Path(path) for path in paths)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                if now - entry.checked_at < self._interval() and paths == entry.paths:
+                    return entry.value
+        if entry is not None and self._unchanged(entry, paths, now):
+            return entry.value
+
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            with self._lock:
+                current = self._entries.get(key)
+            if current is not None and current is not entry and self._unchanged(current, paths, now):
+                return current.value
+            # 先取签名再加载：加载期间文件若再被改写，下一次检查会发现并重新加载
+            stats = tuple(_stat(path) for path in paths)
+            hashes = tuple(_content_hash(path, stat) for path, stat in zip(paths, stats))
+            value = loader()
+            loaded = time.monotonic()
+            new = _Entry(value, paths, stats, hashes, _record(paths, stats, hashes), time.time(), loaded)
+            dropped = []
+            with self._lock:
+                replaced = self._entries.get(key)
+                if replaced is not None:
+                    dropped.append(replaced.value)
+                self._entries[key] = new
+                self._entries.move_to_end(key)
+                limit = capacity if capacity is not None else self.capacity
+                while limit is not None and len(self._entries) > max(int(limit), 1):
+                    evicted, old = self._entries.popitem(last=False)
+                    self._load_locks.pop(evicted, None)
+                    dropped.append(old.value)
+        self._dispose(dropped)
+        return value
+
+    def peek(self, key: Hashable, paths: Iterable[Path | str]) -> Any:
+        """已加载且文件未变化时返回 key 对应的对象，否则返回 None；不加载、不调整 LRU 顺序。"""
+        paths = tuple(Path(path) for path in paths)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or not self._unchanged(entry, paths, time.monotonic()):
+            return None
+        return entry.value
+
+    def discard(self, key: Hashable) -> None:
+        """丢弃 key 对应的对象（内存中的来源数据已变化时），下一次 get 重新加载。"""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            self._load_locks.pop(key, None)
+        if entry is not None:
+            self._dispose([entry.value])
+
+    def _dispose(self, values: Iterable[Any]) -> None:
+        if self.dispose is None:
+            return
+        for value in values:
+            self.dispose(value)
+
+    def restamp(self, key: Hashable) -> None:
+        """调用方已把内存中的对象与文件同步更新（如增量追加）时，记录文件的新签名，避免重新加载。
+
+        不重算内容哈希（追加只需 O(新增行)）：签名有变化的文件哈希记为未知，之后再变化即重新加载。
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return
+        stats = tuple(_stat(path) for path in entry.paths)
+        entry.hashes = tuple(
+            digest if stat == old else None for stat, old, digest in zip(stats, entry.stats, entry.hashes)
+        )
+        entry.stats = stats
+        entry.version = _record(entry.paths, stats, entry.hashes)
+        entry.loaded_at = time.time()
+        entry.checked_at = time.monotonic()
+
+    def items(self) -> List[Tuple[Hashable, Any]]:
+        with self._lock:
+            return [(key, entry.value) for key, entry in self._entries.items()]
+
+    def versions(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._entries.items())
+        return {
+            str(key): {
+                "version": entry.version,
+                "loaded_at": entry.loaded_at,
+                "paths": [str(path) for path in entry.paths],
+            }
+            for key, entry in entries
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            dropped = [entry.value for entry in self._entries.values()]
+            self._entries.clear()
+            self._load_locks.clear()
+        self._dispose(dropped)
+
+
+class DerivedCache:
+    """由 ResourceCache 中的对象派生的对象缓存，以基础对象的身份为键，基础对象被替换后随之重建。"""
+
+    def __init__(self, name: str, capacity: int = 8) -> None:
+        self.name = name
+        self.capacity = capacity
+        # (id(base), key) -> (base, value)；持有 base 引用，保证其 id 在条目存活期间不被复用
+        self._entries: "OrderedDict[Tuple[int, Hashable], Tuple[Any, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, base: Any, builder: Callable[[Any], Any], key: Hashable = None) -> Any:
+        """base（及附加 key）对应的派生对象；同一个 base 对象只构建一次。"""
+        slot = (id(base), key)
+        with self._lock:
+            entry = self._entries.get(slot)
+            if entry is not None and entry[0] is base:
+                self._entries.move_to_end(slot)
+                return entry[1]
+        value = builder(base)
+        with self._lock:
+            self._entries[slot] = (base, value)
+            self._entries.move_to_end(slot)
+            while len(self._entries) > max(int(self.capacity), 1):
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+def resource_versions() -> Dict[str, Any]:
+    """当前数据版本与各缓存中已加载资源的版本（来源文件内容签名）、加载时间和来源文件。"""
+    resources = {cache.name: cache.versions() for cache in _REGISTRY}
+    return {
+        "data_version": data_version(),
+        "resources": {name: versions for name, versions in resources.items() if versions},
+    }
@@ -1,7 +1,6 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from functools import lru_cache
 import json
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Sequence, Set
@@ -14,11 +13,14 @@ try:
 except ImportError:  # pragma: no cover - optional dependency drift
     jsonschema = None
 
+from .resource_cache import ResourceCache
 
 _ROOT = Path(__file__).resolve().parents[1]
 _SKILLS_ROOT = _ROOT / "skills"
 _SNIPPETS_ROOT = _SKILLS_ROOT / "snippets"
 _TOOL_REGISTRY = _SKILLS_ROOT / "tools" / "tool_interfaces.yaml"
+_SKILL_CACHE = ResourceCache("skills")
+_REGISTRY_CACHE = ResourceCache("tool_registry")
 
 
 @dataclass(frozen=True)
@@ -56,8 +58,13 @@ def _hash_text(text: str) -> str:
     return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
 
 
-@lru_cache(maxsize=None)
 def load_skill(skill_dir: str) -> SkillSpec:
+    skill_path = _SKILLS_ROOT / skill_dir / "SKILL.md"
+    schema_path = _SKILLS_ROOT / skill_dir / "output.schema.json"
+    return _SKILL_CACHE.get(skill_dir, [skill_path, schema_path], lambda: _read_skill(skill_dir))
+
+
+def _read_skill(skill_dir: str) -> SkillSpec:
     skill_path = _SKILLS_ROOT / skill_dir / "SKILL.md"
     if not skill_path.exists():
         raise FileNotFoundError(f"skill not found: {skill_dir}")
@@ -104,8 +111,11 @@ def load_skill(skill_dir: str) -> SkillSpec:
     )
 
 
-@lru_cache(maxsize=None)
 def load_tool_registry() -> Set[str]:
+    return _REGISTRY_CACHE.get("tool_interfaces", [_TOOL_REGISTRY], _read_tool_registry)
+
+
+def _read_tool_registry() -> Set[str]:
     if not _TOOL_REGISTRY.exists():
         return set()
     data = yaml.safe_load(_TOOL_REGISTRY.read_text(encoding="utf-8")) or {}
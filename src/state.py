@@ -48,6 +48,7 @@ class RiskState(TypedDict, total=False):
     compliance_blocklist: List[str]
     compliance_blocklist_soft: List[str]
     compliance_blocklist_meta: Dict[str, Any]
+    market_context: Any  # tools.market_context.MarketContext，本次运行内共享的行情指标
 
     # routing
     candidate_nodes: List[str]
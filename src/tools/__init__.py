@@ -1,17 +1,23 @@
 from .validate import validate_and_normalize
 from .data_quality import check_data_quality
-from .snapshot import risk_snapshot_bundle
-from .constraints import constraints_evaluator
+from .snapshot import risk_snapshot_bundle, risk_snapshot_batch
+from .constraints import constraints_evaluator, compile_rules, screen_profiles
 from .decision import decision_engine
-from .solver import constraint_solver
+from .solver import constraint_solver, solve_batch
 from .audit import audit_log
+from .whatif import WhatIfSession
 
 __all__ = [
     "validate_and_normalize",
     "check_data_quality",
     "risk_snapshot_bundle",
+    "risk_snapshot_batch",
     "constraints_evaluator",
+    "compile_rules",
+    "screen_profiles",
     "decision_engine",
     "constraint_solver",
+    "solve_batch",
     "audit_log",
+    "WhatIfSession",
 ]
@@ -7,6 +7,7 @@ from typing import Any, Dict
 
 from ..state import RiskState
 from ..skills_runtime import load_skill
+from ..resource_cache import data_version
 from .rules import load_rules
 from ..config import RuntimeConfig, DEFAULT_CONFIG
 
@@ -73,6 +74,7 @@ def audit_log(state: RiskState, config: RuntimeConfig | None = None) -> Dict[str
         "rules_snapshot": rules,
         "rules_snapshot_hash": _hash_payload(rules),
         "data_snapshot_hash": _hash_payload({"snapshot": snapshot, "rules": rule_findings}),
+        "data_version": data_version(),
         "tool_calls": tool_calls,
         "tool_call_summary": {
             "count": len(tool_calls),
@@ -93,6 +95,10 @@ def audit_log(state: RiskState, config: RuntimeConfig | None = None) -> Dict[str
         "trace_id": _hash_payload({"ts": ts}),
     }
 
+    solver_runs = [a["solver"] for a in state.get("recommended_actions") or [] if a.get("solver")]
+    if solver_runs:
+        audit["solver"] = solver_runs[0]
+
     compliance_blocklist = state.get("compliance_blocklist")
     if compliance_blocklist is not None:
         audit["compliance_blocklist"] = compliance_blocklist
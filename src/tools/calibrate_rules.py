@@ -9,9 +9,12 @@ from datetime import datetime
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
+import numpy as np
 import yaml
 
-from .csv_data import market_metrics_by_range
+from ..config import RuntimeConfig, DEFAULT_CONFIG
+from .covariance import CovarianceModel
+from .market_context import MarketContext, range_market_context
 
 
 _ROOT = Path(__file__).resolve().parents[2]
@@ -59,8 +62,10 @@ def _dirichlet(n: int, rng: random.Random) -> List[float]:
     return [v / total for v in raw]
 
 
-def _load_market_metrics_range(start_date: str, end_date: str) -> Tuple[List[str], Dict[str, Dict[str, float]]]:
-    codes, metrics = market_metrics_by_range(start_date, end_date)
+def _load_market_metrics_range(
+    context: MarketContext,
+) -> Tuple[List[str], Dict[str, Dict[str, float]]]:
+    codes, metrics = list(context.codes), context.metrics
     if not codes:
         raise RuntimeError("no market data available for the window")
     cleaned = {}
@@ -83,6 +88,7 @@ def _simulate(
     n: int,
     samples: int,
     seed: str | None,
+    model: CovarianceModel | None = None,
 ) -> Dict[str, List[float]]:
     rng = random.Random(seed) if seed else random
     vols: List[float] = []
@@ -94,6 +100,7 @@ def _simulate(
 
     if len(codes) < n:
         raise RuntimeError(f"not enough symbols to sample: have={len(codes)} need={n}")
+    index = {code: i for i, code in enumerate(model.codes)} if model is not None else {}
 
     for _ in range(samples):
         pick = rng.sample(codes, n)
@@ -111,6 +118,9 @@ def _simulate(
             spread += w * m["spread_bps"]
             adv += w * m["adv"]
 
+        if model is not None and all(code in index for code in pick):
+            vol = model.subset_volatility(np.asarray([index[code] for code in pick]), np.asarray(weights))
+
         vols.append(vol)
         spreads.append(spread)
         advs.append(adv)
@@ -159,7 +169,15 @@ def _build_rules(
     }
 
 
-def calibrate_rules(asof_date: str, n: int, *, samples: int | None = None, seed: str | None = None) -> Dict[str, Any]:
+def calibrate_rules(
+    asof_date: str,
+    n: int,
+    *,
+    samples: int | None = None,
+    seed: str | None = None,
+    config: RuntimeConfig | None = None,
+) -> Dict[str, Any]:
+    cfg = config or DEFAULT_CONFIG
     try:
         asof = datetime.strptime(asof_date, "%Y-%m-%d")
     except ValueError as exc:
@@ -170,8 +188,12 @@ def calibrate_rules(asof_date: str, n: int, *, samples: int | None = None, seed:
         samples = int(os.getenv("CALIB_SAMPLES", "5000"))
     if seed is None:
         seed = os.getenv("RANDOM_SEED")
-    codes, metrics = _load_market_metrics_range(start_date, end_date)
-    series = _simulate(codes, metrics, n, samples, seed)
+    context = range_market_context(start_date, end_date, cfg)
+    codes, metrics = _load_market_metrics_range(context)
+    model = None
+    if cfg.volatility_model == "covariance":
+        model = context.covariance(codes)
+    series = _simulate(codes, metrics, n, samples, seed, model)
 
     high_warn = _env_float("CALIB_WARN_PCTL", "0.8")
     high_restrict = _env_float("CALIB_RESTRICT_PCTL", "0.9")
@@ -0,0 +1,217 @@
+"""Typed columnar sidecar caches for files under CSV_DATA_DIR.
+
+A cache is an uncompressed ``.npz`` written next to its source file
+(``etf_2025_data.csv`` -> ``etf_2025_data.csv.cache.npz``).  Numeric and
+datetime columns are stored with their native dtypes; string columns are
+dictionary-encoded (utf-8 blob + offsets + int codes, code -1 for missing values)
+so no pickling is needed.
+The cache is valid while the source mtime/size match, or, if they changed,
+while the source sha256 still matches the recorded one.  When the source only
+grew (an appended CSV: the sha256 of its first ``size`` bytes still matches),
+readers that pass a ``tail_parser`` parse just the appended bytes and rewrite
+the cache instead of reparsing the whole file.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+_FORMAT_VERSION = 2
+_META_KEY = "__meta__"
+_INDEX_KEY = "__index__"
+
+
+def cache_path(source: Path) -> Path:
+    return source.with_name(f"{source.name}.cache.npz")
+
+
+def file_sha256(path: Path, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _grown_tail(
+    path: Path, old_size: int, new_size: int, old_sha256: str, chunk_size: int = 1 << 20
+) -> Optional[Tuple[bytes, str]]:
+    """前 old_size 字节的哈希仍为 old_sha256 时返回 (old_size..new_size 的追加字节, 前 new_size 字节的 sha256)。"""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        remaining = old_size
+        last = b""
+        while remaining > 0:
+            chunk = f.read(min(chunk_size, remaining))
+            if not chunk:
+                return None
+            digest.update(chunk)
+            remaining -= len(chunk)
+            last = chunk[-1:]
+        if digest.hexdigest() != old_sha256:
+            return None
+        tail = f.read(new_size - old_size)
+        if len(tail) != new_size - old_size:
+            return None
+    # 原文件末行没有换行而追加内容又没有另起一行时，末行被续写，不能只解析追加部分
+    if old_size and last != b"\n" and not tail.startswith((b"\n", b"\r\n")):
+        return None
+    digest.update(tail)
+    return tail, digest.hexdigest()
+
+
+TailParser = Callable[[Path, bytes], pd.DataFrame]
+
+
+def _signature(path: Path) -> Dict[str, int]:
+    st = path.stat()
+    return {"mtime_ns": int(st.st_mtime_ns), "size": int(st.st_size)}
+
+
+def _encode_strings(values: np.ndarray) -> Dict[str, np.ndarray]:
+    missing = pd.isna(values)
+    categories, present = np.unique(values[~missing].astype(str), return_inverse=True)
+    codes = np.full(len(values), -1, dtype=np.int64)
+    codes[~missing] = present
+    blobs = [c.encode("utf-8") for c in categories.tolist()]
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    if blobs:
+        offsets[1:] = np.cumsum([len(b) for b in blobs])
+    data = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+    return {"data": data, "offsets": offsets, "codes": codes.astype(np.int32)}
+
+
+def _decode_strings(data: np.ndarray, offsets: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    raw = data.tobytes()
+    bounds = offsets.tolist()
+    # 末尾追加一个缺失值类别，code -1 正好取到它
+    categories = np.empty(len(bounds), dtype=object)
+    categories[:-1] = [raw[bounds[i]:bounds[i + 1]].decode("utf-8") for i in range(len(bounds) - 1)]
+    categories[-1] = np.nan
+    return categories[codes]
+
+
+def _read_meta(arrays: Any) -> Dict[str, Any]:
+    return json.loads(arrays[_META_KEY].tobytes().decode("utf-8"))
+
+
+def read_cached_frame(source: Path, tag: str, *, tail_parser: TailParser | None = None) -> Optional[pd.DataFrame]:
+    """读取 source 对应的列式缓存；缓存缺失、格式不符或源文件已变化时返回 None。
+
+    提供 tail_parser 时，源文件仅在末尾追加了内容的缓存仍可用：追加部分交给
+    tail_parser 解析后接在缓存之后，并把合并结果写回缓存。
+    """
+    target = cache_path(source)
+    if not source.exists() or not target.exists():
+        return None
+    grown: Optional[Tuple[bytes, str]] = None
+    try:
+        with np.load(target, allow_pickle=False) as arrays:
+            meta = _read_meta(arrays)
+            if meta.get("version") != _FORMAT_VERSION or meta.get("tag") != tag:
+                return None
+            signature = _signature(source)
+            recorded = meta.get("source") or {}
+            stale_signature = recorded != signature
+            if stale_signature:
+                old_size = int(recorded.get("size", -1))
+                if signature["size"] == old_size:
+                    if meta.get("sha256") != file_sha256(source):
+                        return None
+                elif tail_parser is not None and 0 <= old_size < signature["size"] and meta.get("sha256"):
+                    grown = _grown_tail(source, old_size, signature["size"], meta["sha256"])
+                    if grown is None:
+                        return None
+                else:
+                    return None
+            data: Dict[str, Any] = {}
+            for col in meta.get("columns") or []:
+                name = col["name"]
+                key = f"col:{name}"
+                if col["kind"] == "str":
+                    values = _decode_strings(arrays[f"{key}:data"], arrays[f"{key}:offsets"], arrays[f"{key}:codes"])
+                    data[name] = pd.Series(values, dtype=col["dtype"])
+                else:
+                    data[name] = arrays[key]
+            index = pd.Index(arrays[_INDEX_KEY])
+    except (OSError, ValueError, KeyError):
+        return None
+    df = pd.DataFrame(data)
+    df.index = index
+    if grown is not None:
+        tail_bytes, sha256 = grown
+        try:
+            tail = tail_parser(source, tail_bytes).reindex(columns=df.columns)
+            tail = tail.astype(df.dtypes.to_dict())
+        except (ValueError, TypeError):
+            # 追加部分的列类型与缓存不一致（如整数列出现缺失值）：交给调用方整体重新解析
+            return None
+        if len(tail):
+            start = int(df.index.max()) + 1 if len(df) else 0
+            tail.index = pd.RangeIndex(start, start + len(tail))
+            df = pd.concat([df, tail]) if len(df) else tail
+        write_cached_frame(source, df, tag, sha256=sha256, signature=signature)
+    elif stale_signature:
+        # 内容未变，仅 mtime 变化：刷新签名，避免后续进程重复计算哈希
+        write_cached_frame(source, df, tag, sha256=meta.get("sha256"))
+    return df
+
+
+def write_cached_frame(
+    source: Path,
+    df: pd.DataFrame,
+    tag: str,
+    *,
+    sha256: str | None = None,
+    signature: Dict[str, int] | None = None,
+) -> bool:
+    """将类型化的 DataFrame 写成 source 旁的 npz 缓存（原子替换，失败时静默跳过）。"""
+    if not source.exists():
+        return False
+    arrays: Dict[str, np.ndarray] = {}
+    columns = []
+    for name in df.columns:
+        series = df[name]
+        key = f"col:{name}"
+        if pd.api.types.is_numeric_dtype(series.dtype) or pd.api.types.is_datetime64_any_dtype(series.dtype):
+            arrays[key] = series.to_numpy()
+            columns.append({"name": str(name), "kind": "array"})
+        else:
+            encoded = _encode_strings(series.to_numpy())
+            for part, values in encoded.items():
+                arrays[f"{key}:{part}"] = values
+            columns.append({"name": str(name), "kind": "str", "dtype": str(series.dtype)})
+    arrays[_INDEX_KEY] = np.asarray(df.index.to_numpy(), dtype=np.int64)
+    meta = {
+        "version": _FORMAT_VERSION,
+        "tag": tag,
+        "source": signature or _signature(source),
+        "sha256": sha256 or file_sha256(source),
+        "columns": columns,
+    }
+    arrays[_META_KEY] = np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8)
+
+    target = cache_path(source)
+    try:
+        mode = stat.S_IMODE(source.stat().st_mode) & 0o666
+        fd, tmp_name = tempfile.mkstemp(prefix=f".{target.name}.", dir=str(target.parent))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            # mkstemp 固定以 0600 创建；沿用源文件的读写权限，使共享数据目录的其他账户也能读缓存
+            os.chmod(tmp_name, mode)
+            os.replace(tmp_name, target)
+        except BaseException:
+            Path(tmp_name).unlink(missing_ok=True)
+            raise
+    except OSError:
+        return False
+    return True
@@ -1,152 +1,212 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
 
 from ..state import RiskState
 from ..config import RuntimeConfig, DEFAULT_CONFIG
-from .rules import load_rules
+from ..resource_cache import DerivedCache
+from .rules import _load_rules_cached, _rules_path
 
 
 _LEVEL = {"pass": 0, "warn": 1, "restrict": 2, "block": 3}
+_COMPILED_CACHE = DerivedCache("compiled_rules", capacity=32)
 
 
-def constraints_evaluator(state: RiskState, config: RuntimeConfig | None = None) -> Dict[str, Any]:
-    cfg = config or DEFAULT_CONFIG
-    normalized = state.get("normalized") or {}
-    metrics = state.get("snapshot_metrics") or {}
+@dataclass(frozen=True)
+class Check:
+    """一条阈值规则：metric 与 rules[rule_id]（缺省 default）比较。
 
-    rules, _ = load_rules(normalized.get("policy_profile", "default"), cfg)
-
-    findings: List[Dict[str, Any]] = []
-
-    def add(rule_id: str, severity: str, metric: str, value: float, limit: float, message: str) -> None:
-        findings.append(
-            {
-                "rule_id": rule_id,
-                "severity": severity,
-                "level": _LEVEL.get(severity, 0),
-                "metric": metric,
-                "value": value,
-                "limit": limit,
-                "message": message,
-                "evidence": [{"ref": f"snapshot_metrics.{metric}", "value": value}],
-            }
-        )
+    direction="max" 时超过上限触发；"min" 时仅在下限为正且低于下限时触发。
+    optional=True 的指标缺失（None）时跳过，否则按 0 处理。
+    """
+
+    rule_id: str
+    metric: str
+    default: float
+    direction: str
+    severity: str
+    message: str
+    optional: bool = False
+
+
+CHECKS: Tuple[Check, ...] = (
+    Check("max_single_weight", "top_weight", 1.0, "max", "restrict", "single position exceeds maximum weight"),
+    Check("max_hhi", "hhi", 1.0, "max", "warn", "concentration exceeds target"),
+    Check("max_portfolio_volatility", "portfolio_volatility", 1.0, "max", "restrict", "portfolio volatility above limit"),
+    Check("max_weighted_spread_bps", "weighted_spread_bps", 1.0e9, "max", "warn", "liquidity spread above threshold"),
+    Check("min_weighted_adv", "weighted_adv", 0.0, "min", "warn", "average daily value below minimum"),
+    Check("max_turnover", "turnover", 1.0, "max", "warn", "turnover above threshold"),
+    Check("max_position_delta", "max_position_delta", 1.0, "max", "warn", "single position change above threshold"),
+    Check("max_adv_ratio", "max_adv_ratio", 1.0, "max", "warn", "trade size above adv ratio threshold", optional=True),
+    Check("max_delta_hhi", "delta_hhi", 1.0, "max", "warn", "hhi increase above threshold"),
+    Check("max_delta_volatility", "delta_portfolio_volatility", 1.0, "max", "warn", "volatility increase above threshold"),
+)
 
-    def _get_float(mapping: Dict[str, Any], key: str, default: float) -> float:
-        try:
-            return float(mapping.get(key, default))
-        except (TypeError, ValueError):
-            return float(default)
-
-    def _metric(key: str) -> float:
-        return _get_float(metrics, key, 0.0)
-
-    def _rule(key: str, default: float) -> float:
-        return _get_float(rules, key, default)
-
-    def _check_max(rule_id: str, metric_key: str, limit: float, severity: str, message: str) -> None:
-        value = _metric(metric_key)
-        if value > limit:
-            add(rule_id, severity, metric_key, value, limit, message)
-
-    def _check_min(rule_id: str, metric_key: str, limit: float, severity: str, message: str) -> None:
-        value = _metric(metric_key)
-        if limit > 0 and value < limit:
-            add(rule_id, severity, metric_key, value, limit, message)
-
-    _check_max(
-        "max_single_weight",
-        "top_weight",
-        _rule("max_single_weight", 1.0),
-        "restrict",
-        "single position exceeds maximum weight",
-    )
-    _check_max(
-        "max_hhi",
-        "hhi",
-        _rule("max_hhi", 1.0),
-        "warn",
-        "concentration exceeds target",
-    )
-    _check_max(
-        "max_portfolio_volatility",
-        "portfolio_volatility",
-        _rule("max_portfolio_volatility", 1.0),
-        "restrict",
-        "portfolio volatility above limit",
-    )
-    _check_max(
-        "max_weighted_spread_bps",
-        "weighted_spread_bps",
-        _rule("max_weighted_spread_bps", 1.0e9),
-        "warn",
-        "liquidity spread above threshold",
-    )
-    _check_min(
-        "min_weighted_adv",
-        "weighted_adv",
-        _rule("min_weighted_adv", 0.0),
-        "warn",
-        "average daily value below minimum",
-    )
-    _check_max(
-        "max_turnover",
-        "turnover",
-        _rule("max_turnover", 1.0),
-        "warn",
-        "turnover above threshold",
-    )
-    _check_max(
-        "max_position_delta",
-        "max_position_delta",
-        _rule("max_position_delta", 1.0),
-        "warn",
-        "single position change above threshold",
-    )
 
-    max_adv_ratio = _rule("max_adv_ratio", 1.0)
-    adv_ratio_raw = metrics.get("max_adv_ratio")
+def _get_float(mapping: Dict[str, Any], key: str, default: float) -> float:
     try:
-        adv_ratio = float(adv_ratio_raw)
+        return float(mapping.get(key, default))
     except (TypeError, ValueError):
-        adv_ratio = None
-    if adv_ratio is not None and adv_ratio > max_adv_ratio:
-        add(
-            "max_adv_ratio",
-            "warn",
-            "max_adv_ratio",
-            adv_ratio,
-            max_adv_ratio,
-            "trade size above adv ratio threshold",
+        return float(default)
+
+
+def _finding(rule_id: str, severity: str, metric: str, value: float, limit: float, message: str) -> Dict[str, Any]:
+    return {
+        "rule_id": rule_id,
+        "severity": severity,
+        "level": _LEVEL.get(severity, 0),
+        "metric": metric,
+        "value": value,
+        "limit": limit,
+        "message": message,
+        "evidence": [{"ref": f"snapshot_metrics.{metric}", "value": value}],
+    }
+
+
+def _metric_value(check: Check, raw: Any) -> float:
+    """缺失或无法解析时按 0（optional 时按 NaN，NaN 不触发）。"""
+    try:
+        return float(raw)
+    except (TypeError, ValueError):
+        return np.nan if check.optional else 0.0
+
+
+def _metric_values(check: Check, metrics: Mapping[str, Any]) -> np.ndarray:
+    """取单条规则对应的指标列：标量或逐候选数组均可。"""
+    raw = metrics.get(check.metric, None if check.optional else 0.0)
+    if raw is None or isinstance(raw, (str, bytes)) or np.ndim(raw) == 0:
+        return np.asarray([_metric_value(check, raw)])
+    return np.asarray(raw, dtype=float)
+
+
+@dataclass(frozen=True)
+class CompiledRules:
+    """某个 profile 的规则编译为按 CHECKS 排列的数组，可对单个快照或一批快照指标整体比较。"""
+
+    profile: str
+    version: str
+    checks: Tuple[Check, ...]
+    limits: np.ndarray  # (C,)
+    is_max: np.ndarray  # (C,) bool；False 为下限规则
+    active: np.ndarray  # (C,) bool；下限非正的下限规则永不触发
+    levels: np.ndarray  # (C,) int，_LEVEL 中的等级
+    blocklist: Tuple[str, ...]
+
+    @classmethod
+    def from_rules(cls, profile: str, rules: Mapping[str, Any], version: str = "") -> "CompiledRules":
+        limits = np.asarray([_get_float(rules, c.rule_id, c.default) for c in CHECKS])
+        is_max = np.asarray([c.direction == "max" for c in CHECKS])
+        return cls(
+            profile=profile,
+            version=version,
+            checks=CHECKS,
+            limits=limits,
+            is_max=is_max,
+            active=is_max | (limits > 0),
+            levels=np.asarray([_LEVEL.get(c.severity, 0) for c in CHECKS]),
+            blocklist=tuple(rules.get("blocklist") or []),
         )
 
-    _check_max(
-        "max_delta_hhi",
-        "delta_hhi",
-        _rule("max_delta_hhi", 1.0),
-        "warn",
-        "hhi increase above threshold",
-    )
-    _check_max(
-        "max_delta_volatility",
-        "delta_portfolio_volatility",
-        _rule("max_delta_volatility", 1.0),
-        "warn",
-        "volatility increase above threshold",
+    def values(self, metrics: Mapping[str, Any]) -> np.ndarray:
+        """(K, C) 指标矩阵；metrics 为单个快照（K=1）或 risk_snapshot_batch 的逐列数组。"""
+        columns = [_metric_values(check, metrics) for check in self.checks]
+        rows = max((len(col) for col in columns), default=1)
+        return np.column_stack([np.broadcast_to(col, (rows,)) for col in columns])
+
+    def breaches(self, values: np.ndarray) -> np.ndarray:
+        """(K, C) 布尔矩阵：一次比较得出每个候选触发了哪些规则（NaN 视为未触发）。"""
+        with np.errstate(invalid="ignore"):
+            above = values > self.limits
+            below = values < self.limits
+        return self.active & np.where(self.is_max, above, below)
+
+    def screen(self, metrics: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+        """批量筛查：返回触发矩阵、每个候选的最高等级与触发条数。"""
+        breached = self.breaches(self.values(metrics))
+        return {
+            "breaches": breached,
+            "level": np.where(breached, self.levels, 0).max(axis=1, initial=0),
+            "count": breached.sum(axis=1),
+        }
+
+    def evaluate(
+        self, metrics: Mapping[str, Any], only: Optional[Iterable[str]] = None
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """单个快照逐条规则的结果（rule_id -> finding 或 None）；only 给定时只检查依赖这些指标的规则。"""
+        wanted = None if only is None else set(only)
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        for check, limit, is_max, active in zip(self.checks, self.limits.tolist(), self.is_max.tolist(), self.active.tolist()):
+            if wanted is not None and check.metric not in wanted:
+                continue
+            value = _metric_value(check, metrics.get(check.metric, None if check.optional else 0.0))
+            breached = active and (value > limit if is_max else value < limit)
+            results[check.rule_id] = (
+                _finding(check.rule_id, check.severity, check.metric, value, limit, check.message) if breached else None
+            )
+        return results
+
+    def findings(self, metrics: Mapping[str, Any]) -> List[Dict[str, Any]]:
+        return [f for f in self.evaluate(metrics).values() if f is not None]
+
+
+def compile_rules(profile: str, config: RuntimeConfig | None = None) -> CompiledRules:
+    """编译（并缓存）profile 的规则表；rules.yaml 变化时随之重新编译。"""
+    loaded = _load_rules_cached(profile, str(_rules_path(config)))
+    return _COMPILED_CACHE.get(loaded, lambda base: CompiledRules.from_rules(profile, *base), key=profile)
+
+
+def screen_profiles(
+    metrics: Mapping[str, Any], profiles: Iterable[str], config: RuntimeConfig | None = None
+) -> Dict[str, Any]:
+    """同一批快照指标对多个 profile 一次筛查：breaches 为 (K, P, C)，level 为 (K, P)。"""
+    compiled = [compile_rules(profile, config) for profile in profiles]
+    if not compiled:
+        raise ValueError("profiles must not be empty")
+    values = compiled[0].values(metrics)
+    limits = np.stack([c.limits for c in compiled])
+    active = np.stack([c.active for c in compiled])
+    is_max = compiled[0].is_max
+    with np.errstate(invalid="ignore"):
+        above = values[:, None, :] > limits
+        below = values[:, None, :] < limits
+    breached = active & np.where(is_max, above, below)
+    return {
+        "profiles": [c.profile for c in compiled],
+        "rule_ids": [check.rule_id for check in CHECKS],
+        "breaches": breached,
+        "level": np.where(breached, compiled[0].levels, 0).max(axis=2, initial=0),
+    }
+
+
+def blocklist_finding(target_weights: Dict[str, float], blocklist: Iterable[str]) -> Optional[Dict[str, Any]]:
+    blocked_set = set(blocklist)
+    blocked = [c for c, w in target_weights.items() if c in blocked_set and w > 0]
+    if not blocked:
+        return None
+    return _finding(
+        "blocklist",
+        "block",
+        "blocked_assets",
+        float(len(blocked)),
+        0.0,
+        f"blocked assets present: {', '.join(blocked)}",
     )
 
-    blocklist = set(state.get("compliance_blocklist") or rules.get("blocklist") or [])
-    target_weights = normalized.get("target_weights") or {}
-    blocked = [c for c, w in target_weights.items() if c in blocklist and w > 0]
-    if blocked:
-        add(
-            "blocklist",
-            "block",
-            "blocked_assets",
-            float(len(blocked)),
-            0.0,
-            f"blocked assets present: {', '.join(blocked)}",
-        )
+
+def constraints_evaluator(state: RiskState, config: RuntimeConfig | None = None) -> Dict[str, Any]:
+    cfg = config or DEFAULT_CONFIG
+    normalized = state.get("normalized") or {}
+    metrics = state.get("snapshot_metrics") or {}
+
+    compiled = compile_rules(normalized.get("policy_profile", "default"), cfg)
+    findings: List[Dict[str, Any]] = compiled.findings(metrics)
+
+    blocklist = state.get("compliance_blocklist") or compiled.blocklist
+    finding = blocklist_finding(normalized.get("target_weights") or {}, blocklist)
+    if finding is not None:
+        findings.append(finding)
 
     return {"rule_findings": findings}
@@ -0,0 +1,153 @@
+"""Shrunk covariance of daily ETF returns for correlation-aware portfolio volatility.
+
+``covariance_model`` builds the return matrix of a universe over the lookback
+window, shrinks the sample correlation towards the identity with the
+Ledoit-Wolf optimal intensity, rescales it by each code's return volatility
+(the same volatility ``market_metrics`` reports) and factorizes the result
+once.  Models are cached by (window, universe hash) and validated against the
+content signature of the price files the window reads, so repeated requests
+over the same universe reuse the factor and ``sqrt(w' Σ w)`` is a
+single matrix-vector product.
+"""
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from ..config import RuntimeConfig, DEFAULT_CONFIG
+from ..resource_cache import source_signature
+from .csv_data import price_sources, return_matrix
+
+_CACHE_SIZE = 32
+_CACHE: "OrderedDict[Hashable, Tuple[str, Optional[CovarianceModel]]]" = OrderedDict()
+_CACHE_LOCK = threading.Lock()
+
+
+def ledoit_wolf(x: np.ndarray) -> Tuple[np.ndarray, float]:
+    """x 为去均值的 (T, N) 观测矩阵；返回向 tr(S)/N·I 收缩后的协方差与收缩强度。"""
+    t, n = x.shape
+    sample = x.T @ x / t
+    mu = float(np.trace(sample)) / n
+    target = mu * np.eye(n)
+    d2 = float(np.sum((sample - target) ** 2))
+    if d2 <= 0.0:
+        return target, 1.0
+    b2 = (float(np.sum(np.sum(x * x, axis=1) ** 2)) / t - float(np.sum(sample ** 2))) / t
+    shrinkage = min(max(b2, 0.0), d2) / d2
+    return shrinkage * target + (1.0 - shrinkage) * sample, shrinkage
+
+
+def _factor(corr: np.ndarray) -> np.ndarray:
+    """corr = L L'；非正定时（样本少于 code 数且未收缩）退回特征分解并截断负特征值。"""
+    try:
+        return np.linalg.cholesky(corr)
+    except np.linalg.LinAlgError:
+        values, vectors = np.linalg.eigh(corr)
+        return vectors * np.sqrt(np.clip(values, 0.0, None))
+
+
+@dataclass(frozen=True)
+class CovarianceModel:
+    codes: Tuple[str, ...]
+    cov: np.ndarray
+    factor: np.ndarray  # cov = factor @ factor.T
+    shrinkage: float
+    observations: int
+
+    @classmethod
+    def from_returns(cls, codes: Iterable[str], returns: np.ndarray) -> "CovarianceModel":
+        codes = tuple(codes)
+        returns = np.where(np.isfinite(returns), returns, np.nan)
+        valid = ~np.isnan(returns)
+        counts = valid.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(counts > 0, np.nansum(returns, axis=0) / np.maximum(counts, 1), 0.0)
+            centered = np.where(valid, returns - mean, 0.0)
+            vol = np.sqrt((centered ** 2).sum(axis=0) / np.maximum(counts, 1))
+            z = np.where(vol > 0, centered / np.where(vol > 0, vol, 1.0), 0.0)
+        if len(returns):
+            shrunk, shrinkage = ledoit_wolf(z)
+        else:
+            shrunk, shrinkage = np.eye(len(codes)), 1.0
+        # 缺失观测以 0 填充会压低对角线，重新归一化为相关矩阵后再乘回各自波动率
+        diag = np.sqrt(np.clip(np.diag(shrunk), 1e-12, None))
+        corr = shrunk / np.outer(diag, diag)
+        np.fill_diagonal(corr, 1.0)
+        factor = vol[:, None] * _factor(corr)
+        return cls(
+            codes=codes,
+            cov=corr * np.outer(vol, vol),
+            factor=factor,
+            shrinkage=float(shrinkage),
+            observations=int(len(returns)),
+        )
+
+    def weight_vector(self, weights: Mapping[str, float]) -> np.ndarray:
+        """按 codes 顺序排列的权重向量；不在模型内的 code 忽略（与缺行情时权重不计入一致）。"""
+        index = {code: i for i, code in enumerate(self.codes)}
+        w = np.zeros(len(self.codes))
+        for code, weight in weights.items():
+            i = index.get(code)
+            if i is not None:
+                w[i] += float(weight)
+        return w
+
+    def volatility(self, weights: Mapping[str, float]) -> float:
+        """组合日收益率波动率 sqrt(w' Σ w)。"""
+        return float(np.linalg.norm(self.factor.T @ self.weight_vector(weights)))
+
+    def subset_volatility(self, index: np.ndarray, weights: np.ndarray) -> float:
+        """仅含 codes[index] 的组合波动率，用于大量抽样组合的校准。"""
+        sub = self.cov[np.ix_(index, index)]
+        return float(np.sqrt(max(float(weights @ sub @ weights), 0.0)))
+
+
+def universe_hash(codes: Iterable[str]) -> str:
+    joined = "\n".join(sorted({str(c) for c in codes}))
+    return hashlib.sha256(joined.encode("utf-8")).hexdigest()[:16]
+
+
+def covariance_model(
+    codes: Iterable[str],
+    start_date: str | None,
+    end_date: str | None,
+    config: RuntimeConfig | None = None,
+    returns: Callable[[], Tuple[List[str], np.ndarray, np.ndarray]] | None = None,
+) -> Optional[CovarianceModel]:
+    """[start_date, end_date] 内 codes 的收缩协方差模型；无行情时返回 None。
+
+    同一窗口与 universe 在所读行情文件内容不变时复用已构建的模型（含分解）。returns 可提供已读取的
+    收益率矩阵（同 return_matrix 的返回值），缓存未命中时代替重新读取行情。
+    """
+    cfg = config or DEFAULT_CONFIG
+    universe = sorted({str(c) for c in codes if str(c).strip()})
+    if not universe:
+        return None
+    key = (start_date or "", end_date or "", universe_hash(universe), cfg.csv_data_dir, cfg.data_backend)
+    with _CACHE_LOCK:
+        cached = _CACHE.get(key)
+    if cached is not None and cached[0] == source_signature(price_sources(cfg, start_date, end_date)):
+        with _CACHE_LOCK:
+            if key in _CACHE:
+                _CACHE.move_to_end(key)
+        return cached[1]
+    present, _, matrix = returns() if returns is not None else return_matrix(universe, start_date, end_date, cfg)
+    model = CovarianceModel.from_returns(present, matrix) if present else None
+    # 读取行情会加载（或重新加载）分片并登记其内容签名，因此在构建之后取签名
+    signature = source_signature(price_sources(cfg, start_date, end_date))
+    with _CACHE_LOCK:
+        _CACHE[key] = (signature, model)
+        _CACHE.move_to_end(key)
+        while len(_CACHE) > _CACHE_SIZE:
+            _CACHE.popitem(last=False)
+    return model
+
+
+def cache_info() -> Dict[str, int]:
+    with _CACHE_LOCK:
+        return {"size": len(_CACHE), "capacity": _CACHE_SIZE}
@@ -1,8 +1,8 @@
 from __future__ import annotations
 
-import json
+import io
 import random
-from functools import lru_cache
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, Iterable, List, Tuple
 
@@ -10,6 +10,16 @@ import numpy as np
 import pandas as pd
 
 from ..config import RuntimeConfig, DEFAULT_CONFIG
+from ..resource_cache import DerivedCache, ResourceCache
+from .columnar_cache import read_cached_frame, write_cached_frame
+from .json_stream import iter_array_items
+from .macro_store import MacroDocStore
+from .market_panel import MarketPanel, combined_metrics, combined_prices
+from .price_store import PriceStore, compact_price_frame, normalize_price_frame
+from .sql_backend import SQLBackend, default_db_path, engine_available
+from .shards import Shard, discover_shards, overlapping, shard_path
+from .text_index import SubstringIndex, is_literal_query
+from .trading_calendar import ShardedCalendar, TradingCalendar, to_datetime64
 
 _ROOT = Path(__file__).resolve().parents[2]
 
@@ -27,29 +37,272 @@ def _load_csv(path: Path, *, usecols: Iterable[str] | None = None) -> pd.DataFra
     return pd.read_csv(path, usecols=usecols)
 
 
-@lru_cache(maxsize=4)
-def _load_etf_prices_cached(path_str: str) -> pd.DataFrame:
+def _parse_price_tail(path: Path, tail: bytes) -> pd.DataFrame:
+    """解析追加到行情 CSV 末尾的字节（不含表头），列名取自文件表头。"""
+    header = list(pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns)
+    if not tail.strip():
+        return pd.DataFrame(columns=header)
+    return normalize_price_frame(pd.read_csv(io.BytesIO(tail), header=None, names=header))
+
+
+def _read_etf_prices(path_str: str, use_cache: bool = True) -> pd.DataFrame:
     path = Path(path_str)
-    df = _load_csv(path)
-    if df.empty:
-        return df
-    df = df.copy()
-    df["code"] = df["code"].astype(str)
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
-    for col in ("open", "high", "low", "close", "vol", "amount", "pre_close", "change", "pct_chg", "adj_factor"):
-        if col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors="coerce")
-    df = df.dropna(subset=["date", "code"])
+    if use_cache:
+        cached = read_cached_frame(path, "etf_prices", tail_parser=_parse_price_tail)
+        if cached is not None:
+            return cached
+    df = normalize_price_frame(_load_csv(path))
+    if use_cache and not df.empty:
+        write_cached_frame(path, df, "etf_prices")
     return df
 
 
+_PRICE_SHARDS = ("etf_", "_data.csv")
+_COMPLIANCE_SHARDS = ("csrc_", ".csv")
+_MACRO_RESULTS_SHARDS = ("govcn_", "_results.json")
+_MACRO_CSV_SHARDS = ("govcn_", ".csv")
+_PRICE_CACHE = ResourceCache("etf_prices")
+_MACRO_CACHE = ResourceCache("macro_docs")
+_BASIC_CACHE = ResourceCache("etf_basic", capacity=4)
+_INDUSTRY_CACHE = DerivedCache("industry_index", capacity=4)
+_COMPLIANCE_CACHE = ResourceCache("compliance_docs", capacity=4)
+_COMPLIANCE_INDEX_CACHE = DerivedCache("compliance_text_index", capacity=4)
+_SQL_CACHE = ResourceCache("sql_backend", capacity=4, dispose=SQLBackend.close)
+# 每个行情分片的 code 概要（首/末交易日、行数）很小，独立于分片 LRU 缓存全部分片
+_SUMMARY_CACHE = ResourceCache("price_code_summary")
+
+
+def price_shards(config: RuntimeConfig | None = None) -> List[Shard]:
+    """CSV_DATA_DIR 下的行情分片（etf_<YYYY>_data.csv / etf_<YYYYMM>_data.csv），按周期升序。"""
+    return discover_shards(_data_dir(config), *_PRICE_SHARDS)
+
+
+def _shard_key(shard: Shard, cfg: RuntimeConfig) -> Tuple[str, bool, bool]:
+    return str(shard.path), bool(cfg.data_cache), bool(cfg.data_compact)
+
+
+def _shard_store(shard: Shard, cfg: RuntimeConfig) -> PriceStore:
+    path_str, use_cache, compact = _shard_key(shard, cfg)
+    return _PRICE_CACHE.get(
+        (path_str, use_cache, compact),
+        [shard.path],
+        lambda: PriceStore(_read_etf_prices(path_str, use_cache), compact=compact),
+        cfg.shard_cache_size,
+    )
+
+
+def price_stores(
+    config: RuntimeConfig | None = None, start_date: str | None = None, end_date: str | None = None
+) -> List[PriceStore]:
+    """与 [start_date, end_date] 有交集的行情分片（按时间先后），未加载的分片按需读入。"""
+    cfg = config or DEFAULT_CONFIG
+    shards = overlapping(price_shards(cfg), to_datetime64(start_date), to_datetime64(end_date))
+    return [_shard_store(shard, cfg) for shard in shards]
+
+
+def _loaded_store(shard: Shard, cfg: RuntimeConfig) -> PriceStore | None:
+    """已在分片 LRU 中且文件未变化的 PriceStore；不加载、不影响淘汰顺序。"""
+    return _PRICE_CACHE.peek(_shard_key(shard, cfg), [shard.path])
+
+
+_SUMMARY_COLUMNS = ["code", "first_date", "last_date", "rows"]
+
+
+def _listing_frame(store: PriceStore) -> pd.DataFrame:
+    listing = store.panel.listing()
+    return pd.DataFrame(
+        {
+            "code": listing.codes.astype(str),
+            "first_date": listing.first_date,
+            "last_date": listing.last_date,
+            "rows": listing.rows,
+        }
+    )
+
+
+def _read_code_summary(shard: Shard, cfg: RuntimeConfig) -> pd.DataFrame:
+    store = _loaded_store(shard, cfg)
+    if store is not None:
+        return _listing_frame(store)
+    df = _read_etf_prices(str(shard.path), bool(cfg.data_cache))
+    if df.empty or "code" not in df.columns or "date" not in df.columns:
+        return pd.DataFrame(columns=_SUMMARY_COLUMNS)
+    # groupby(sort=False) 按首次出现顺序排列，与 MarketPanel.listing() 一致
+    return (
+        df.groupby(df["code"].astype(str), sort=False)["date"]
+        .agg(first_date="min", last_date="max", rows="size")
+        .reset_index()
+    )
+
+
+def _code_summary(shard: Shard, cfg: RuntimeConfig) -> pd.DataFrame:
+    """分片内每个 code 的首/末交易日与行数（按首次出现顺序）；不占用分片 LRU。"""
+    return _SUMMARY_CACHE.get(str(shard.path), [shard.path], lambda: _read_code_summary(shard, cfg))
+
+
+def _concat_frames(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+def _shard_frame(shard: Shard, cfg: RuntimeConfig) -> pd.DataFrame:
+    store = _loaded_store(shard, cfg)
+    if store is not None:
+        return store.frame
+    df = _read_etf_prices(str(shard.path), bool(cfg.data_cache))
+    return compact_price_frame(df) if cfg.data_compact else df
+
+
 def load_etf_prices(config: RuntimeConfig | None = None) -> pd.DataFrame:
-    path = _data_dir(config) / "etf_2025_data.csv"
-    return _load_etf_prices_cached(str(path))
+    """全部分片的行情长表（全量扫描）。
+
+    已在分片 LRU 中的分片直接取其行情表，其余分片临时读取、不放入 LRU，
+    避免分片数超过 SHARD_CACHE_SIZE 时整体换出常用分片。
+    """
+    cfg = config or DEFAULT_CONFIG
+    return _concat_frames([_shard_frame(shard, cfg) for shard in price_shards(cfg)])
 
 
-@lru_cache(maxsize=4)
-def _load_etf_basic_cached(path_str: str) -> pd.DataFrame:
+def market_panels(
+    config: RuntimeConfig | None = None, start_date: str | None = None, end_date: str | None = None
+) -> List[MarketPanel]:
+    return [store.panel for store in price_stores(config, start_date, end_date)]
+
+
+def price_memory_report(config: RuntimeConfig | None = None) -> Dict[str, Any]:
+    """当前进程内已加载行情分片的内存占用（逐列字节数），用于对比 DATA_COMPACT 前后。"""
+    cfg = config or DEFAULT_CONFIG
+    paths = {str(shard.path) for shard in price_shards(cfg)}
+    shards = {}
+    for (path_str, _, compact), store in _PRICE_CACHE.items():
+        if path_str in paths and compact == bool(cfg.data_compact):
+            shards[Path(path_str).name] = store.memory_report()
+    return {
+        "compact": bool(cfg.data_compact),
+        "shards": shards,
+        "frame_total": sum(report["frame_total"] for report in shards.values()),
+        "panel_total": sum(report["panel_total"] for report in shards.values()),
+    }
+
+
+def _append_price_csv(path: Path, rows: pd.DataFrame) -> None:
+    if path.exists() and path.stat().st_size:
+        # 按 CSV 规则解析表头（BOM、带引号的列名），保证追加列与已有列对齐
+        header = list(pd.read_csv(path, nrows=0, encoding="utf-8-sig").columns)
+    else:
+        header = list(rows.columns)
+    out = rows.reindex(columns=header)
+    if "date" in out.columns:
+        out["date"] = out["date"].dt.strftime("%Y-%m-%d")
+    needs_newline = False
+    if path.exists() and path.stat().st_size:
+        with path.open("rb") as f:
+            f.seek(-1, 2)
+            needs_newline = f.read(1) != b"\n"
+    with path.open("a", encoding="utf-8", newline="") as f:
+        if needs_newline:
+            f.write("\n")
+        out.to_csv(f, index=False, header=not path.exists() or path.stat().st_size == 0, lineterminator="\n")
+
+
+def append_etf_prices(
+    rows: pd.DataFrame, config: RuntimeConfig | None = None, *, persist: bool = True
+) -> pd.DataFrame:
+    """追加新交易日的 ETF 日线并返回实际接受的行。
+
+    行按日期归入所属分片；已晚于该分片内各 code 最后交易日的行才会被接受。内存中
+    已加载分片的行情表、MarketPanel 与交易日历增量更新，同进程内运行中的 RiskMAS
+    下一次调用即可看到新数据。persist=True 时同时追加写入分片 CSV（不存在时按最新
+    分片的年/月粒度新建）；列式缓存保持不动，下一次冷加载只解析缓存之后追加的部分；
+    persist=False 时不在现有分片周期内的行不被接受。
+    """
+    cfg = config or DEFAULT_CONFIG
+    rows = normalize_price_frame(rows) if not rows.empty and {"code", "date"} <= set(rows.columns) else rows.iloc[0:0]
+    if rows.empty:
+        return rows
+    shards = price_shards(cfg)
+    monthly = bool(shards and shards[-1].monthly)
+    directory = _data_dir(cfg)
+    groups: Dict[Path, Tuple[Shard | None, List[pd.DataFrame]]] = {}
+    for date, group in rows.groupby("date", sort=True):
+        day = pd.Timestamp(date).to_datetime64()
+        shard = next((s for s in shards if s.contains(day)), None)
+        path = shard.path if shard else shard_path(directory, *_PRICE_SHARDS, day, monthly)
+        groups.setdefault(path, (shard, []))[1].append(group)
+
+    accepted_parts = []
+    for path, (shard, parts) in groups.items():
+        group = pd.concat(parts)
+        if shard is None:
+            # 新周期的分片文件：写入后由分片发现逻辑按需加载
+            if not persist:
+                continue
+            accepted = PriceStore(pd.DataFrame()).new_rows(group)
+            _append_price_csv(path, accepted)
+            accepted_parts.append(accepted)
+            continue
+        store = _shard_store(shard, cfg)
+        accepted = store.new_rows(group)
+        if accepted.empty:
+            continue
+        if persist:
+            _append_price_csv(path, accepted)
+        accepted = store.append(accepted)
+        if persist:
+            # 内存中的分片已与文件同步，记录新签名，避免热加载把它当作外部改动重新读入
+            _PRICE_CACHE.restamp(_shard_key(shard, cfg))
+        # code 概要下一次按已更新的 PriceStore 重建（persist=False 时文件签名不变，不能靠签名发现）
+        _SUMMARY_CACHE.discard(str(path))
+        accepted_parts.append(accepted)
+    if not accepted_parts:
+        return rows.iloc[0:0]
+    return pd.concat(accepted_parts, ignore_index=True)
+
+
+def _sql_backend_cached(path_str: str, engine: str) -> SQLBackend:
+    return _SQL_CACHE.get((path_str, engine), [path_str], lambda: SQLBackend(Path(path_str), engine))
+
+
+def sql_backend(config: RuntimeConfig | None = None) -> SQLBackend | None:
+    """DATA_BACKEND=sqlite/duckdb 且数据库文件已构建时返回查询后端，否则返回 None（走 CSV）。"""
+    cfg = config or DEFAULT_CONFIG
+    engine = cfg.data_backend
+    if engine == "csv" or not engine_available(engine):
+        return None
+    path = Path(cfg.data_db_path) if cfg.data_db_path else default_db_path(_data_dir(cfg), engine)
+    if not path.exists():
+        return None
+    return _sql_backend_cached(str(path), engine)
+
+
+def price_sources(
+    config: RuntimeConfig | None = None, start_date: str | None = None, end_date: str | None = None
+) -> List[Path]:
+    """[start_date, end_date] 的行情查询所依赖的文件：SQL 后端的数据库文件，或与窗口有交集的行情分片。"""
+    cfg = config or DEFAULT_CONFIG
+    backend = sql_backend(cfg)
+    if backend is not None:
+        return [backend.path]
+    return [shard.path for shard in overlapping(price_shards(cfg), to_datetime64(start_date), to_datetime64(end_date))]
+
+
+def trading_calendar(config: RuntimeConfig | None = None) -> TradingCalendar | ShardedCalendar:
+    cfg = config or DEFAULT_CONFIG
+    backend = sql_backend(cfg)
+    if backend is not None:
+        return backend.calendar()
+    shards = price_shards(cfg)
+    return ShardedCalendar(
+        [(shard.start, shard.end) for shard in shards],
+        lambda i: _shard_store(shards[i], cfg).panel.calendar,
+    )
+
+
+def _read_etf_basic(path_str: str) -> pd.DataFrame:
     path = Path(path_str)
     df = _load_csv(path)
     if df.empty:
@@ -59,48 +312,86 @@ def _load_etf_basic_cached(path_str: str) -> pd.DataFrame:
     return df
 
 
+def _load_etf_basic_cached(path_str: str) -> pd.DataFrame:
+    return _BASIC_CACHE.get(path_str, [path_str], lambda: _read_etf_basic(path_str))
+
+
 def load_etf_basic(config: RuntimeConfig | None = None) -> pd.DataFrame:
     path = _data_dir(config) / "sampled_etf_basic.csv"
     return _load_etf_basic_cached(str(path))
 
 
-@lru_cache(maxsize=4)
-def _etf_industry_map_cached(path_str: str) -> Dict[str, str]:
-    basic = _load_etf_basic_cached(path_str)
-    if basic.empty or "code" not in basic.columns or "indx_csname" not in basic.columns:
-        return {}
-    df = basic[["code", "indx_csname"]].dropna()
-    mapping: Dict[str, str] = {}
-    for _, row in df.iterrows():
-        code = str(row.get("code") or "").strip()
-        industry = str(row.get("indx_csname") or "").strip()
-        if code and industry:
-            mapping[code] = industry
-    return mapping
+@dataclass(frozen=True)
+class IndustryIndex:
+    """security master 上的双向行业索引：code→行业、行业→有序 code 数组、行业→位图。"""
+
+    codes: np.ndarray
+    industries: np.ndarray
+    code_to_industry: Dict[str, str]
+    industry_codes: Dict[str, np.ndarray]
+    industry_bits: Dict[str, np.ndarray]
+
+    @classmethod
+    def from_frame(cls, basic: pd.DataFrame) -> "IndustryIndex":
+        if basic.empty or "code" not in basic.columns or "indx_csname" not in basic.columns:
+            empty = np.empty(0, dtype=str)
+            return cls(empty, empty, {}, {}, {})
+        df = basic[["code", "indx_csname"]].dropna()
+        codes = df["code"].astype(str).str.strip()
+        industries = df["indx_csname"].astype(str).str.strip()
+        pairs = pd.DataFrame({"code": codes, "industry": industries})
+        pairs = pairs[(pairs["code"] != "") & (pairs["industry"] != "")]
+        pairs = pairs.drop_duplicates("code", keep="last")
+
+        universe, code_pos = np.unique(pairs["code"].to_numpy().astype(str), return_inverse=True)
+        names, industry_pos = np.unique(pairs["industry"].to_numpy().astype(str), return_inverse=True)
+        dense = np.zeros((len(names), len(universe)), dtype=bool)
+        dense[industry_pos, code_pos] = True
+        bits = np.packbits(dense, axis=1)
+        return cls(
+            codes=universe,
+            industries=names,
+            code_to_industry=dict(zip(pairs["code"].tolist(), pairs["industry"].tolist())),
+            industry_codes={name: universe[dense[i]] for i, name in enumerate(names.tolist())},
+            industry_bits={name: bits[i] for i, name in enumerate(names.tolist())},
+        )
 
+    def codes_for(self, industry_names: Iterable[str]) -> List[str]:
+        """多个行业对应 code 的并集（位图按位或），按 code 排序。"""
+        selected = [self.industry_bits[name] for name in industry_names if name in self.industry_bits]
+        if not selected:
+            return []
+        merged = np.bitwise_or.reduce(np.stack(selected), axis=0)
+        mask = np.unpackbits(merged, count=len(self.codes)).astype(bool)
+        return self.codes[mask].tolist()
 
-def etf_industry_map(config: RuntimeConfig | None = None) -> Dict[str, str]:
+
+def _industry_index_cached(path_str: str) -> IndustryIndex:
+    return _INDUSTRY_CACHE.get(_load_etf_basic_cached(path_str), IndustryIndex.from_frame)
+
+
+def industry_index(config: RuntimeConfig | None = None) -> IndustryIndex:
     path = _data_dir(config) / "sampled_etf_basic.csv"
-    return _etf_industry_map_cached(str(path))
+    return _industry_index_cached(str(path))
+
+
+def etf_industry_map(config: RuntimeConfig | None = None) -> Dict[str, str]:
+    return industry_index(config).code_to_industry
 
 
 def etf_codes_by_industry(industry_names: Iterable[str], config: RuntimeConfig | None = None) -> Dict[str, List[str]]:
-    mapping = etf_industry_map(config)
-    if not mapping:
-        return {}
+    index = industry_index(config)
     wanted = {str(name).strip() for name in industry_names if str(name).strip()}
-    if not wanted:
-        return {}
-    reverse: Dict[str, List[str]] = {}
-    for code, industry in mapping.items():
-        if industry in wanted:
-            reverse.setdefault(industry, []).append(code)
-    return reverse
+    return {name: index.industry_codes[name].tolist() for name in wanted if name in index.industry_codes}
 
 
-@lru_cache(maxsize=4)
-def _load_compliance_docs_cached(path_str: str) -> pd.DataFrame:
-    path = Path(path_str)
+def etf_codes_for_industries(industry_names: Iterable[str], config: RuntimeConfig | None = None) -> List[str]:
+    """行业名集合 → 其下全部 ETF code（去重、排序）。"""
+    wanted = {str(name).strip() for name in industry_names if str(name).strip()}
+    return industry_index(config).codes_for(wanted)
+
+
+def _read_compliance_docs(path: Path) -> pd.DataFrame:
     df = _load_csv(path)
     if df.empty:
         return df
@@ -113,66 +404,108 @@ def _load_compliance_docs_cached(path_str: str) -> pd.DataFrame:
     return df
 
 
+def _load_compliance_docs_cached(paths: Tuple[str, ...]) -> pd.DataFrame:
+    return _COMPLIANCE_CACHE.get(
+        paths, paths, lambda: _concat_frames([_read_compliance_docs(Path(path)) for path in paths])
+    )
+
+
+def _compliance_paths(config: RuntimeConfig | None = None) -> Tuple[str, ...]:
+    """合规文本分片（csrc_<YYYY>.csv / csrc_<YYYYMM>.csv）；合规检索不按日期裁剪，全部分片按时间拼接。"""
+    return tuple(str(shard.path) for shard in discover_shards(_data_dir(config), *_COMPLIANCE_SHARDS))
+
+
 def load_compliance_docs(config: RuntimeConfig | None = None) -> pd.DataFrame:
-    path = _data_dir(config) / "csrc_2025.csv"
-    return _load_compliance_docs_cached(str(path))
+    return _load_compliance_docs_cached(_compliance_paths(config))
+
+
+def _build_text_index(df: pd.DataFrame) -> SubstringIndex:
+    columns = [df[col].astype(str).tolist() for col in ("title", "content") if col in df.columns]
+    dates = df["date"].to_numpy() if "date" in df.columns else None
+    return SubstringIndex(columns, dates)
+
+
+def _compliance_text_index(df: pd.DataFrame) -> SubstringIndex:
+    """df（缓存中的合规文档表）上的子串索引；文档表重新加载后随之重建，行号始终与 df 对应。"""
+    return _COMPLIANCE_INDEX_CACHE.get(df, _build_text_index)
+
+
+def compliance_text_index(config: RuntimeConfig | None = None) -> SubstringIndex:
+    return _compliance_text_index(load_compliance_docs(config))
+
+
+def _flatten_macro_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    industry_summaries = item.get("industry_signal_summaries") or []
+    industries: List[str] = []
+    bullets: List[str] = []
+    for summary in industry_summaries:
+        if not isinstance(summary, dict):
+            continue
+        name = summary.get("industry_name")
+        if name:
+            industries.append(str(name))
+        for key in ("daily_signal_bullet_points", "positive_signals", "negative_signals"):
+            for bullet in summary.get(key) or []:
+                if bullet:
+                    bullets.append(str(bullet))
+    attributions = item.get("key_policy_attributions") or []
+    events: List[str] = []
+    quotes: List[str] = []
+    for att in attributions:
+        if not isinstance(att, dict):
+            continue
+        event = att.get("key_event")
+        if event:
+            events.append(str(event))
+        quote = att.get("quote_text")
+        if quote:
+            quotes.append(str(quote))
+    return {
+        "date": item.get("date"),
+        "title": "; ".join(events) if events else "policy_sentiment",
+        "content": "；".join(bullets + quotes),
+        "industry_name": "; ".join(sorted(set(industries))),
+        "sentiment_score": item.get("daily_macro_sentiment_score"),
+    }
+
+
+def _macro_results_frame(path: Path, start_date: str | None = None, end_date: str | None = None) -> pd.DataFrame:
+    """流式解析宏观结果 JSON 并展平成列；给定日期范围时跳过范围外的条目。"""
+    start = to_datetime64(start_date)
+    end = to_datetime64(end_date)
+    bounded = start is not None or end is not None
+    rows = []
+    try:
+        for item in iter_array_items(path, "results"):
+            if not isinstance(item, dict):
+                continue
+            if bounded:
+                date = to_datetime64(str(item.get("date") or ""))
+                if date is None or (start is not None and date < start) or (end is not None and date > end):
+                    continue
+            rows.append(_flatten_macro_item(item))
+    except (OSError, ValueError):
+        return pd.DataFrame()
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    for col in ("title", "content", "industry_name"):
+        if col in df.columns:
+            df[col] = df[col].astype(str)
+    return df
 
 
-@lru_cache(maxsize=4)
-def _load_macro_docs_cached(results_str: str, csv_str: str) -> pd.DataFrame:
+def _read_macro_docs(results_str: str, csv_str: str, use_cache: bool = True) -> pd.DataFrame:
     results_path = Path(results_str)
     if results_path.exists():
-        try:
-            raw = json.loads(results_path.read_text(encoding="utf-8"))
-        except (OSError, json.JSONDecodeError):
-            raw = {}
-        items = raw.get("results") if isinstance(raw, dict) else None
-        if isinstance(items, list) and items:
-            rows = []
-            for item in items:
-                if not isinstance(item, dict):
-                    continue
-                industry_summaries = item.get("industry_signal_summaries") or []
-                industries: List[str] = []
-                bullets: List[str] = []
-                for summary in industry_summaries:
-                    if not isinstance(summary, dict):
-                        continue
-                    name = summary.get("industry_name")
-                    if name:
-                        industries.append(str(name))
-                    for key in ("daily_signal_bullet_points", "positive_signals", "negative_signals"):
-                        for bullet in summary.get(key) or []:
-                            if bullet:
-                                bullets.append(str(bullet))
-                attributions = item.get("key_policy_attributions") or []
-                events: List[str] = []
-                quotes: List[str] = []
-                for att in attributions:
-                    if not isinstance(att, dict):
-                        continue
-                    event = att.get("key_event")
-                    if event:
-                        events.append(str(event))
-                    quote = att.get("quote_text")
-                    if quote:
-                        quotes.append(str(quote))
-                rows.append(
-                    {
-                        "date": item.get("date"),
-                        "title": "; ".join(events) if events else "policy_sentiment",
-                        "content": "；".join(bullets + quotes),
-                        "industry_name": "; ".join(sorted(set(industries))),
-                        "sentiment_score": item.get("daily_macro_sentiment_score"),
-                    }
-                )
-            df = pd.DataFrame(rows)
-            if not df.empty:
-                df["date"] = pd.to_datetime(df["date"], errors="coerce")
-                for col in ("title", "content", "industry_name"):
-                    if col in df.columns:
-                        df[col] = df[col].astype(str)
-                return df
+        df = read_cached_frame(results_path, "macro_docs") if use_cache else None
+        if df is None:
+            df = _macro_results_frame(results_path)
+            if use_cache and not df.empty:
+                write_cached_frame(results_path, df, "macro_docs")
+        if not df.empty:
+            return df
 
     path = Path(csv_str)
     df = _load_csv(path)
@@ -187,30 +520,169 @@ def _load_macro_docs_cached(results_str: str, csv_str: str) -> pd.DataFrame:
     return df
 
 
-def load_macro_docs(config: RuntimeConfig | None = None) -> pd.DataFrame:
+def macro_shards(config: RuntimeConfig | None = None) -> List[Tuple[Shard, str, str]]:
+    """宏观文本分片：每个周期一对 (govcn_<period>_results.json, govcn_<period>.csv)，优先使用 results。"""
     base = _data_dir(config)
-    return _load_macro_docs_cached(str(base / "govcn_2025_results.json"), str(base / "govcn_2025.csv"))
+    periods: Dict[Tuple[np.datetime64, np.datetime64], Tuple[Shard, str]] = {}
+    for prefix, suffix in (_MACRO_CSV_SHARDS, _MACRO_RESULTS_SHARDS):
+        for shard in discover_shards(base, prefix, suffix):
+            periods[(shard.start, shard.end)] = (shard, shard.path.name[len(prefix):-len(suffix)])
+    out = []
+    for key in sorted(periods):
+        shard, period = periods[key]
+        results = base / f"{_MACRO_RESULTS_SHARDS[0]}{period}{_MACRO_RESULTS_SHARDS[1]}"
+        csv = base / f"{_MACRO_CSV_SHARDS[0]}{period}{_MACRO_CSV_SHARDS[1]}"
+        out.append((shard, str(results), str(csv)))
+    return out
+
+
+def macro_stores(
+    config: RuntimeConfig | None = None, start_date: str | None = None, end_date: str | None = None
+) -> List[MacroDocStore]:
+    """与 [start_date, end_date] 有交集的宏观文本分片（按时间先后），未加载的分片按需读入。"""
+    cfg = config or DEFAULT_CONFIG
+    start = to_datetime64(start_date)
+    end = to_datetime64(end_date)
+    use_cache = bool(cfg.data_cache)
+    stores = []
+    for shard, results_str, csv_str in macro_shards(cfg):
+        if not shard.overlaps(start, end):
+            continue
+        stores.append(
+            _MACRO_CACHE.get(
+                (results_str, csv_str, use_cache),
+                [results_str, csv_str],
+                lambda r=results_str, c=csv_str: MacroDocStore(_read_macro_docs(r, c, use_cache)),
+                cfg.shard_cache_size,
+            )
+        )
+    return stores
+
+
+def load_macro_docs(config: RuntimeConfig | None = None) -> pd.DataFrame:
+    return _concat_frames([store.frame for store in macro_stores(config)])
+
+
+def append_macro_results(items: Iterable[Dict[str, Any]], config: RuntimeConfig | None = None) -> int:
+    """把新的日度宏观结果（govcn results 条目格式）追加到内存中最新分片的文档库，返回追加条数。
+
+    尚无任何宏观文本分片时不追加，返回 0。
+    """
+    rows = [_flatten_macro_item(item) for item in items if isinstance(item, dict)]
+    stores = macro_stores(config)
+    if not rows or not stores:
+        return 0
+    df = pd.DataFrame(rows)
+    for col in ("title", "content", "industry_name"):
+        df[col] = df[col].astype(str)
+    stores[-1].append(df)
+    return len(rows)
+
+
+def _macro_range_frame(
+    results_str: str, csv_str: str, use_cache: bool, start_date: str | None, end_date: str | None
+) -> pd.DataFrame:
+    results_path = Path(results_str)
+    cached = read_cached_frame(results_path, "macro_docs") if use_cache else None
+    if cached is None and results_path.exists():
+        df = _macro_results_frame(results_path, start_date, end_date)
+        if not df.empty:
+            return df
+    df = cached if cached is not None else _read_macro_docs(results_str, csv_str, use_cache)
+    if df.empty or "date" not in df.columns:
+        return df
+    start = to_datetime64(start_date)
+    end = to_datetime64(end_date)
+    mask = df["date"].notna()
+    if start is not None:
+        mask &= df["date"] >= start
+    if end is not None:
+        mask &= df["date"] <= end
+    return df[mask]
+
+
+def load_macro_docs_range(
+    start_date: str | None, end_date: str | None, config: RuntimeConfig | None = None
+) -> pd.DataFrame:
+    """按日期范围读取宏观文本：只读与范围有交集的分片；分片已有列式缓存时直接切片，否则流式解析并跳过范围外条目。"""
+    cfg = config or DEFAULT_CONFIG
+    start = to_datetime64(start_date)
+    end = to_datetime64(end_date)
+    frames = [
+        _macro_range_frame(results_str, csv_str, bool(cfg.data_cache), start_date, end_date)
+        for shard, results_str, csv_str in macro_shards(cfg)
+        if shard.overlaps(start, end)
+    ]
+    return _concat_frames(frames)
 
 
 def security_master_codes(config: RuntimeConfig | None = None) -> Tuple[set, str]:
     basic = load_etf_basic(config)
     if not basic.empty and "code" in basic.columns:
         return set(basic["code"].dropna().astype(str)), "sampled_etf_basic.csv"
-    prices = load_etf_prices(config)
-    if not prices.empty:
-        return set(prices["code"].dropna().astype(str)), "etf_2025_data.csv"
+    listing = code_listing(config)
+    if not listing.empty:
+        return set(listing["code"]), "etf_2025_data.csv"
     return set(), "missing"
 
 
-def sample_universe(asof_date: str, size: int, seed: str | None, config: RuntimeConfig | None = None) -> List[str]:
-    df = load_etf_prices(config)
-    if df.empty:
-        return []
-    if asof_date:
-        cutoff = pd.to_datetime(asof_date, errors="coerce")
-        if pd.notna(cutoff):
-            df = df[df["date"] <= cutoff]
-    codes = list(dict.fromkeys(df["code"].dropna().astype(str).tolist()))
+def _merge_counts(parts: Iterable[Tuple[Iterable[str], Iterable[int]]], min_rows: int = 1) -> List[str]:
+    """按分片先后合并各分片的 (codes, 行数)，保留首次出现顺序，合计行数不少于 min_rows。"""
+    counts: Dict[str, int] = {}
+    for codes, rows in parts:
+        for code, n in zip(codes, rows):
+            counts[code] = counts.get(code, 0) + int(n)
+    return [code for code, n in counts.items() if n >= max(int(min_rows), 1)]
+
+
+def _window_codes(
+    stores: List[PriceStore], start: np.datetime64 | None, end: np.datetime64 | None, min_rows: int = 1
+) -> List[str]:
+    """各分片 listing 上合并出窗口内有行情的 code（按首次出现顺序），窗口内合计行数不少于 min_rows。"""
+    parts = []
+    for store in stores:
+        codes, rows = store.panel.listing().window(start, end)
+        parts.append((codes.tolist(), rows.tolist()))
+    return _merge_counts(parts, min_rows)
+
+
+def code_listing(config: RuntimeConfig | None = None) -> pd.DataFrame:
+    """每个 code 的首/末交易日与行数（跨分片合并，按首次出现顺序）；由各分片的 code 概要得到，不加载整个分片。"""
+    cfg = config or DEFAULT_CONFIG
+    parts = [summary for summary in (_code_summary(shard, cfg) for shard in price_shards(cfg)) if not summary.empty]
+    if not parts:
+        return pd.DataFrame(columns=_SUMMARY_COLUMNS)
+    df = pd.concat(parts, ignore_index=True)
+    return df.groupby("code", sort=False).agg(
+        first_date=("first_date", "min"), last_date=("last_date", "max"), rows=("rows", "sum")
+    ).reset_index()
+
+
+def listed_codes(asof_date: str | None, min_history: int = 0, config: RuntimeConfig | None = None) -> List[str]:
+    """截至 asof_date 已有行情的 code（按首次出现顺序）；min_history > 0 时要求截至当日至少有这么多个交易日。
+
+    整个周期都不晚于 asof_date 的分片只用其 code 概要，只有 asof_date 所在分片需要加载行情。
+    """
+    cfg = config or DEFAULT_CONFIG
+    backend = sql_backend(cfg)
+    if backend is not None:
+        return backend.codes_asof(asof_date, min_history)
+    end = to_datetime64(asof_date)
+    parts = []
+    for shard in overlapping(price_shards(cfg), None, end):
+        if end is None or shard.end <= end.astype("datetime64[D]"):
+            summary = _code_summary(shard, cfg)
+            parts.append((summary["code"].tolist(), summary["rows"].tolist()))
+        else:
+            codes, rows = _shard_store(shard, cfg).panel.listing().window(None, end)
+            parts.append((codes.tolist(), rows.tolist()))
+    return _merge_counts(parts, min_history)
+
+
+def sample_universe(
+    asof_date: str, size: int, seed: str | None, config: RuntimeConfig | None = None, min_history: int = 0
+) -> List[str]:
+    codes = listed_codes(asof_date, min_history, config)
     if not codes:
         return []
     rng = random.Random(seed)
@@ -219,31 +691,41 @@ def sample_universe(asof_date: str, size: int, seed: str | None, config: Runtime
     return rng.sample(codes, size)
 
 
-def lookback_start_date(asof_date: str, lookback_days: int) -> str:
+def lookback_start_date(asof_date: str, lookback_days: int, config: RuntimeConfig | None = None) -> str:
+    """回溯窗口起点；MARKET_LOOKBACK_UNIT=trading 时按交易日回溯，否则按自然日。"""
     if not asof_date:
         return ""
     cutoff = pd.to_datetime(asof_date, errors="coerce")
     if pd.isna(cutoff):
         return ""
+    cfg = config or DEFAULT_CONFIG
+    if cfg.market_lookback_unit == "trading":
+        start = trading_days_back(asof_date, int(lookback_days), cfg)
+        if start:
+            return start
     return (cutoff - pd.Timedelta(days=int(lookback_days))).date().isoformat()
 
 
 def previous_trading_date(asof_date: str, config: RuntimeConfig | None = None) -> str:
     if not asof_date:
         return ""
-    df = load_etf_prices(config)
-    if df.empty or "date" not in df.columns:
-        return asof_date
-    cutoff = pd.to_datetime(asof_date, errors="coerce")
-    if pd.isna(cutoff):
-        return asof_date
-    prior = df[df["date"] < cutoff]
-    if prior.empty:
-        return asof_date
-    latest = prior["date"].max()
-    if pd.isna(latest):
-        return asof_date
-    return str(latest.date())
+    backend = sql_backend(config)
+    if backend is not None:
+        return backend.previous_trading_date(asof_date) or asof_date
+    return trading_calendar(config).previous(asof_date) or asof_date
+
+
+def next_trading_date(asof_date: str, config: RuntimeConfig | None = None) -> str:
+    if not asof_date:
+        return ""
+    return trading_calendar(config).next(asof_date) or ""
+
+
+def trading_days_back(asof_date: str, n: int, config: RuntimeConfig | None = None) -> str:
+    """asof_date 当日或之前最近交易日往前数 n 个交易日的日期；无数据时返回空串。"""
+    if not asof_date:
+        return ""
+    return trading_calendar(config).shift_back(asof_date, n) or ""
 
 
 def market_metrics(
@@ -255,68 +737,64 @@ def market_metrics(
     code_set = {str(c) for c in codes if str(c).strip()}
     if not code_set:
         return {}
-    df = load_etf_prices(config)
-    if df.empty:
-        return {}
-    df = df[df["code"].isin(code_set)]
-    if start_date:
-        start = pd.to_datetime(start_date, errors="coerce")
-        if pd.notna(start):
-            df = df[df["date"] >= start]
-    if end_date:
-        end = pd.to_datetime(end_date, errors="coerce")
-        if pd.notna(end):
-            df = df[df["date"] <= end]
-    if df.empty:
-        return {}
+    backend = sql_backend(config)
+    if backend is not None:
+        return backend.market_metrics(code_set, start_date, end_date)
+    return combined_metrics(market_panels(config, start_date, end_date), code_set, start_date, end_date)
+
 
-    df = df.sort_values(["code", "date"])
-    if "adj_factor" in df.columns:
-        adj_factor = pd.to_numeric(df["adj_factor"], errors="coerce")
-        adj_close = df["close"] * adj_factor
-        df["adj_close"] = adj_close.where(adj_close.notna(), df["close"])
-        price_col = "adj_close"
+def return_matrix(
+    codes: Iterable[str],
+    start_date: str | None,
+    end_date: str | None,
+    config: RuntimeConfig | None = None,
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """窗口内的日收益率矩阵：返回 (有行情的 codes, 交易日, 收益率[交易日 × code])，缺失为 NaN。
+
+    每个 code 的收益率按其窗口内相邻两行计算（跨分片时首尾相接），与 market_metrics 的波动率口径一致。
+    """
+    code_list = sorted({str(c) for c in codes if str(c).strip()})
+    backend = sql_backend(config)
+    if backend is not None:
+        history = backend.price_history(code_list, start_date, end_date)
     else:
-        price_col = "close"
-    df["ret"] = df.groupby("code")[price_col].pct_change()
-    close = df["close"].replace(0, np.nan)
-    df["spread_bps"] = (df["high"] - df["low"]) / close * 10000
-
-    grouped = df.groupby("code")
-    volatility = grouped["ret"].std(ddof=0).fillna(0.0)
-    adv = grouped["amount"].mean().fillna(0.0)
-    spread_bps = grouped["spread_bps"].mean().fillna(0.0)
-
-    metrics = {}
-    for code in code_set:
-        if code not in volatility.index:
+        start, end = to_datetime64(start_date), to_datetime64(end_date)
+        panels = market_panels(config, start_date, end_date)
+        history = {code: combined_prices(panels, code, start, end) for code in code_list}
+    history = {code: pair for code, pair in history.items() if len(pair[0])}
+    present = [code for code in code_list if code in history]
+    if not present:
+        return [], np.empty(0, dtype="datetime64[ns]"), np.empty((0, 0))
+    dates = np.unique(np.concatenate([history[code][0][1:] for code in present]).astype("datetime64[ns]"))
+    matrix = np.full((len(dates), len(present)), np.nan)
+    for j, code in enumerate(present):
+        day, price = history[code]
+        if len(price) < 2:
             continue
-        metrics[code] = {
-            "volatility": float(volatility.get(code, 0.0)),
-            "adv": float(adv.get(code, 0.0)),
-            "spread_bps": float(spread_bps.get(code, 0.0)),
-        }
-    return metrics
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = price[1:] / price[:-1] - 1.0
+        matrix[np.searchsorted(dates, day[1:].astype("datetime64[ns]")), j] = ret
+    return present, dates, matrix
 
 
 def market_metrics_by_range(
     start_date: str, end_date: str, config: RuntimeConfig | None = None
 ) -> Tuple[List[str], Dict[str, Dict[str, float]]]:
-    df = load_etf_prices(config)
-    if df.empty:
-        return [], {}
-    df = df[(df["date"] >= start_date) & (df["date"] <= end_date)]
-    if df.empty:
+    backend = sql_backend(config)
+    if backend is not None:
+        codes = backend.window_codes(start_date, end_date)
+    else:
+        stores = price_stores(config, start_date, end_date)
+        codes = _window_codes(stores, to_datetime64(start_date), to_datetime64(end_date))
+    if not codes:
         return [], {}
-    codes = list(dict.fromkeys(df["code"].dropna().astype(str).tolist()))
     metrics = market_metrics(codes, start_date, end_date, config)
     codes = [c for c in codes if c in metrics]
     return codes, metrics
 
 
 def macro_docs_available(config: RuntimeConfig | None = None) -> bool:
-    df = load_macro_docs(config)
-    return not df.empty
+    return any(not store.empty for store in reversed(macro_stores(config)))
 
 
 def compliance_docs_available(config: RuntimeConfig | None = None) -> bool:
@@ -337,23 +815,7 @@ def _text_mask(df: pd.DataFrame, query: str, columns: Iterable[str]) -> pd.Serie
     return mask
 
 
-def macro_search_hits(
-    query: str,
-    limit: int = 5,
-    asof_date: str | None = None,
-    config: RuntimeConfig | None = None,
-) -> List[Dict[str, Any]]:
-    df = load_macro_docs(config)
-    if df.empty or not query:
-        return []
-    if asof_date and "date" in df.columns:
-        cutoff = pd.to_datetime(asof_date, errors="coerce")
-        if pd.notna(cutoff):
-            df = df[df["date"] <= cutoff]
-    mask = _text_mask(df, query, ("title", "content"))
-    if mask.empty:
-        return []
-    hits = df[mask].head(limit)
+def _macro_hit_rows(hits: pd.DataFrame) -> List[Dict[str, Any]]:
     results = []
     for _, row in hits.iterrows():
         date = row.get("date")
@@ -378,28 +840,62 @@ def macro_search_hits(
     return results
 
 
+def macro_search_hits(
+    query: str,
+    limit: int = 5,
+    asof_date: str | None = None,
+    config: RuntimeConfig | None = None,
+) -> List[Dict[str, Any]]:
+    if not query:
+        return []
+    backend = sql_backend(config)
+    if backend is not None and is_literal_query(query):
+        return _macro_hit_rows(backend.macro_search(query, limit, asof_date))
+    stores = macro_stores(config, None, asof_date)
+    if all(store.empty for store in stores):
+        return []
+    if is_literal_query(query):
+        parts = []
+        remaining = limit
+        for store in stores:
+            if remaining <= 0:
+                break
+            found = store.search(query, remaining, asof_date)
+            parts.append(found)
+            remaining -= len(found)
+        hits = _concat_frames(parts)
+    else:
+        df = _concat_frames([store.frame for store in stores])
+        if asof_date and "date" in df.columns:
+            cutoff = pd.to_datetime(asof_date, errors="coerce")
+            if pd.notna(cutoff):
+                df = df[df["date"] <= cutoff]
+        mask = _text_mask(df, query, ("title", "content"))
+        if mask.empty:
+            return []
+        hits = df[mask].head(limit)
+    return _macro_hit_rows(hits)
+
+
 def compliance_search_hits(query: str, limit: int = 5, config: RuntimeConfig | None = None) -> List[str]:
     df = load_compliance_docs(config)
     if df.empty or not query:
         return []
-    mask = _text_mask(df, query, ("title", "content"))
-    if mask.empty:
-        return []
-    hits = df[mask].head(limit)
+    if is_literal_query(query):
+        hits = df.iloc[_compliance_text_index(df).search(query, limit)]
+    else:
+        mask = _text_mask(df, query, ("title", "content"))
+        if mask.empty:
+            return []
+        hits = df[mask].head(limit)
     return [str(row.get("content") or "") for _, row in hits.iterrows()]
 
 
 def macro_latest_date(asof_date: str | None = None, config: RuntimeConfig | None = None) -> str:
-    df = load_macro_docs(config)
-    if df.empty or "date" not in df.columns:
-        return ""
-    if asof_date:
-        cutoff = pd.to_datetime(asof_date, errors="coerce")
-        if pd.notna(cutoff):
-            df = df[df["date"] <= cutoff]
-            if df.empty:
-                return ""
-    latest = df["date"].max()
-    if pd.isna(latest):
-        return ""
-    return str(latest.date())
+    for store in reversed(macro_stores(config, None, asof_date)):
+        if store.empty or "date" not in store.frame.columns:
+            continue
+        latest = store.latest_date(asof_date)
+        if latest is not None:
+            return str(latest.date())
+    return ""
@@ -10,10 +10,9 @@ from .csv_data import (
     compliance_docs_available,
     macro_docs_available,
     macro_latest_date,
-    market_metrics,
-    lookback_start_date,
     security_master_codes,
 )
+from .market_context import market_context
 
 
 def _append_gap(
@@ -60,13 +59,12 @@ def check_data_quality(state: RiskState, config: RuntimeConfig | None = None) ->
 
     market_codes = set()
     market_checked = False
-    lookback_days = int(cfg.market_lookback_days)
-    start_date = lookback_start_date(asof_date, lookback_days)
+    context = None
 
     if universe:
-        metrics = market_metrics(universe, start_date or asof_date, asof_date, cfg)
+        context = market_context(state, universe, asof_date, cfg)
         market_checked = True
-        market_codes = set(metrics.keys())
+        market_codes = set(context.coverage)
 
     missing_master = [c for c in universe if sec_checked and c not in sec_codes]
     missing_market = [c for c in universe if market_checked and c not in market_codes]
@@ -169,4 +167,7 @@ def check_data_quality(state: RiskState, config: RuntimeConfig | None = None) ->
         except ValueError:
             data_quality["positions"]["freshness_days"] = None
 
-    return {"data_quality": data_quality, "data_gaps": data_gaps}
+    out: Dict[str, Any] = {"data_quality": data_quality, "data_gaps": data_gaps}
+    if context is not None:
+        out["market_context"] = context
+    return out
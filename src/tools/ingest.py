@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterable, Mapping
+
+import pandas as pd
+
+from ..config import RuntimeConfig, DEFAULT_CONFIG
+from .csv_data import append_etf_prices, trading_calendar
+
+
+def _read_bars(path: Path) -> pd.DataFrame:
+    if path.suffix.lower() == ".json":
+        payload = json.loads(path.read_text(encoding="utf-8"))
+        if isinstance(payload, dict):
+            payload = payload.get("data") or payload.get("results") or []
+        return pd.DataFrame(payload)
+    return pd.read_csv(path)
+
+
+def ingest_etf_bars(
+    bars: pd.DataFrame | Iterable[Mapping[str, Any]],
+    config: RuntimeConfig | None = None,
+    *,
+    persist: bool = True,
+) -> Dict[str, Any]:
+    """追加新交易日 ETF 日线（字段同 etf_<YYYY>_data.csv），返回接受/跳过的统计。"""
+    cfg = config or DEFAULT_CONFIG
+    rows = bars if isinstance(bars, pd.DataFrame) else pd.DataFrame(list(bars))
+    accepted = append_etf_prices(rows, cfg, persist=persist)
+    dates = sorted({d.date().isoformat() for d in accepted["date"]}) if not accepted.empty else []
+    return {
+        "received": int(len(rows)),
+        "accepted": int(len(accepted)),
+        "skipped": int(len(rows) - len(accepted)),
+        "codes": int(accepted["code"].nunique()) if not accepted.empty else 0,
+        "dates": dates,
+        "latest_trading_date": trading_calendar(cfg).latest() or "",
+        "persisted": bool(persist and not accepted.empty),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Append new ETF daily bars to the price store.")
+    parser.add_argument("files", nargs="+", help="CSV or JSON files with date/code/open/high/low/close/vol/amount/... rows")
+    parser.add_argument("--dry-run", action="store_true", help="update the in-memory store only, do not write the shard CSV files")
+    args = parser.parse_args()
+
+    bars = pd.concat([_read_bars(Path(p)) for p in args.files], ignore_index=True)
+    result = ingest_etf_bars(bars, persist=not args.dry_run)
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Incremental reader for ``{"...": ..., "<key>": [item, item, ...]}`` JSON files.
+
+Only one array item is materialized at a time, so large result files can be
+filtered while they are read instead of after a full ``json.loads``.
+"""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Any, Iterator, TextIO
+
+_WHITESPACE = " \t\r\n"
+
+
+class _Reader:
+    def __init__(self, f: TextIO, chunk_size: int) -> None:
+        self._f = f
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self._f.read(self._chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > self._chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, ch: str) -> None:
+        if self.peek() != ch:
+            raise ValueError(f"expected {ch!r} at offset {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # 数字等标量可能恰好在缓冲区末尾被截断，需读入更多内容后重新解析
+            if end == len(self.buf) and self._fill():
+                continue
+            self.pos = end
+            return obj
+
+
+def iter_array_items(path: Path, key: str = "results", chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """逐个产出顶层对象中 ``key`` 数组的元素；根节点不是对象或缺少该键时不产出任何元素。"""
+    with path.open("r", encoding="utf-8") as f:
+        reader = _Reader(f, chunk_size)
+        if reader.peek() != "{":
+            return
+        reader.expect("{")
+        while reader.peek() not in ("}", ""):
+            name = reader.value()
+            reader.expect(":")
+            if name == key and reader.peek() == "[":
+                reader.expect("[")
+                while reader.peek() not in ("]", ""):
+                    yield reader.value()
+                    if reader.peek() == ",":
+                        reader.expect(",")
+                reader.expect("]")
+            else:
+                reader.value()
+            if reader.peek() == ",":
+                reader.expect(",")
+        reader.expect("}")
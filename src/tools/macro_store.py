@@ -0,0 +1,100 @@
+"""Date-sorted macro document store with binary-search as-of queries."""
+from __future__ import annotations
+
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .text_index import SubstringIndex
+from .trading_calendar import to_datetime64
+
+_TEXT_COLUMNS = ("title", "content")
+
+
+def _text_fields(df: pd.DataFrame) -> List[List[str]]:
+    return [df[col].astype(str).tolist() for col in _TEXT_COLUMNS if col in df.columns]
+
+
+class MacroDocStore:
+    """宏观文本按日期稳定排序存放（无日期的行排在末尾）。
+
+    日期有序使“as-of 最新日期”和“窗口内文档”都变成二分查找；子串倒排索引
+    与排序后的行号对齐，as-of 截断直接作用在 postings 上。
+    """
+
+    def __init__(self, frame: pd.DataFrame) -> None:
+        self._load(frame)
+
+    def _load(self, frame: pd.DataFrame) -> None:
+        if not frame.empty and "date" in frame.columns:
+            frame = frame.sort_values("date", kind="stable", na_position="last")
+        self.frame = frame.reset_index(drop=True)
+        if "date" in self.frame.columns:
+            self.dates = self.frame["date"].to_numpy()
+        else:
+            self.dates = np.empty(0, dtype="datetime64[ns]")
+        self.dated = int((~np.isnat(self.dates)).sum()) if len(self.dates) else 0
+        self.index = SubstringIndex(_text_fields(self.frame))
+
+    @property
+    def empty(self) -> bool:
+        return self.frame.empty
+
+    def cutoff_position(self, asof_date: str | None) -> Optional[int]:
+        """日期 <= asof_date 的行数（即 as-of 截断位置）；asof 无效时返回 None。"""
+        cutoff = to_datetime64(asof_date)
+        if cutoff is None:
+            return None
+        return int(np.searchsorted(self.dates[: self.dated], cutoff, side="right"))
+
+    def latest_date(self, asof_date: str | None = None) -> Optional[pd.Timestamp]:
+        end = self.dated
+        if asof_date:
+            pos = self.cutoff_position(asof_date)
+            if pos is not None:
+                end = pos
+        if end <= 0:
+            return None
+        return pd.Timestamp(self.dates[end - 1])
+
+    def window_bounds(self, start_date: str | None, end_date: str | None) -> Tuple[int, int]:
+        dated = self.dates[: self.dated]
+        start = to_datetime64(start_date)
+        end = to_datetime64(end_date)
+        lo = 0 if start is None else int(np.searchsorted(dated, start, side="left"))
+        hi = self.dated if end is None else int(np.searchsorted(dated, end, side="right"))
+        return lo, max(lo, hi)
+
+    def window(self, start_date: str | None, end_date: str | None) -> pd.DataFrame:
+        lo, hi = self.window_bounds(start_date, end_date)
+        return self.frame.iloc[lo:hi]
+
+    def search(self, query: str, limit: int, asof_date: str | None = None) -> pd.DataFrame:
+        before = self.cutoff_position(asof_date) if asof_date else None
+        return self.frame.iloc[self.index.search(query, limit, before=before)]
+
+    def append(self, rows: pd.DataFrame) -> None:
+        """追加新的日度结果；新行日期不早于现有最新日期时只增量更新索引，否则整体重排。"""
+        if rows.empty:
+            return
+        rows = rows.copy()
+        if "date" in rows.columns:
+            rows["date"] = pd.to_datetime(rows["date"], errors="coerce")
+            rows = rows.sort_values("date", kind="stable", na_position="last")
+        new_dates = rows["date"].to_numpy() if "date" in rows.columns else None
+        in_order = (
+            new_dates is not None
+            and list(rows.columns) == list(self.frame.columns)
+            and self.dated == len(self.frame)
+            and not np.isnat(new_dates).any()
+            and (self.dated == 0 or new_dates[0] >= self.dates[self.dated - 1])
+        )
+        if not in_order:
+            self._load(pd.concat([self.frame, rows], ignore_index=True))
+            return
+        # 先扩展 frame 再扩展索引：并发查询只会看到旧 doc id，不会越界
+        self.frame = pd.concat([self.frame, rows], ignore_index=True)
+        self.dates = self.frame["date"].to_numpy()
+        self.dated = len(self.frame)
+        self.index.add_documents(_text_fields(rows))
@@ -0,0 +1,122 @@
+"""Request-scoped market data shared by the nodes of one graph run.
+
+``check_data_quality`` builds a ``MarketContext`` for the request universe over
+the lookback window and stores it in ``RiskState["market_context"]``;
+``risk_snapshot_bundle`` (and anything else working on the same window) reads
+metrics, coverage and the return matrix from it instead of running the
+csv_data pipeline again.  A context is keyed by (asof_date, lookback start,
+codes); asking for codes it does not cover yields a new context that only
+queries the missing ones.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from ..config import RuntimeConfig, DEFAULT_CONFIG
+from ..state import RiskState
+from .covariance import CovarianceModel, covariance_model
+from .csv_data import lookback_start_date, market_metrics, market_metrics_by_range, return_matrix
+
+
+@dataclass
+class MarketContext:
+    asof_date: str
+    start_date: str
+    codes: Tuple[str, ...]
+    metrics: Dict[str, Dict[str, float]]
+    config: RuntimeConfig = field(default=DEFAULT_CONFIG, repr=False)
+    _returns: Optional[Tuple[List[str], np.ndarray, np.ndarray]] = field(default=None, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @property
+    def key(self) -> Tuple[str, str, Tuple[str, ...]]:
+        return self.asof_date, self.start_date, self.codes
+
+    @property
+    def coverage(self) -> List[str]:
+        """有行情指标的 code（按 codes 顺序）。"""
+        return [code for code in self.codes if code in self.metrics]
+
+    def missing(self, codes: Iterable[str]) -> List[str]:
+        return [code for code in codes if code not in self.metrics]
+
+    def covers(self, codes: Iterable[str], asof_date: str, start_date: str) -> bool:
+        known = set(self.codes)
+        return (asof_date, start_date) == (self.asof_date, self.start_date) and all(c in known for c in codes)
+
+    def metrics_for(self, codes: Iterable[str]) -> Dict[str, Dict[str, float]]:
+        return {code: self.metrics[code] for code in codes if code in self.metrics}
+
+    def returns(self) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """覆盖 code 的日收益率矩阵（首次使用时读取）。"""
+        with self._lock:
+            if self._returns is None:
+                self._returns = return_matrix(self.coverage, self.start_date, self.asof_date, self.config)
+            return self._returns
+
+    def covariance(self, codes: Iterable[str] | None = None) -> Optional[CovarianceModel]:
+        universe = self.coverage if codes is None else [c for c in codes if c in self.metrics]
+        return covariance_model(
+            universe, self.start_date, self.asof_date, self.config, returns=self._returns_for(universe)
+        )
+
+    def _returns_for(self, universe: List[str]):
+        def load() -> Tuple[List[str], np.ndarray, np.ndarray]:
+            present, dates, matrix = self.returns()
+            wanted = set(universe)
+            cols = [j for j, code in enumerate(present) if code in wanted]
+            return [present[j] for j in cols], dates, matrix[:, cols]
+        return load
+
+
+def _window(asof_date: str, config: RuntimeConfig) -> str:
+    start = lookback_start_date(asof_date, int(config.market_lookback_days), config)
+    return start or asof_date
+
+
+def build_market_context(
+    codes: Iterable[str],
+    asof_date: str,
+    config: RuntimeConfig | None = None,
+    base: MarketContext | None = None,
+) -> MarketContext:
+    """为 codes 在 asof_date 的回溯窗口内构建上下文；base 窗口相同时沿用其指标，只查询新增的 code。"""
+    cfg = config or DEFAULT_CONFIG
+    start_date = _window(asof_date, cfg)
+    wanted = tuple(dict.fromkeys(str(c) for c in codes if str(c).strip()))
+    metrics: Dict[str, Dict[str, float]] = {}
+    known: Tuple[str, ...] = ()
+    if base is not None and (base.asof_date, base.start_date) == (asof_date, start_date):
+        metrics = dict(base.metrics)
+        known = base.codes
+    extra = [code for code in wanted if code not in set(known)]
+    if extra:
+        metrics.update(market_metrics(extra, start_date, asof_date, cfg))
+    all_codes = tuple(dict.fromkeys(known + wanted))
+    return MarketContext(asof_date, start_date, all_codes, metrics, cfg)
+
+
+def market_context(
+    state: RiskState, codes: Iterable[str], asof_date: str, config: RuntimeConfig | None = None
+) -> MarketContext:
+    """返回覆盖 codes 的上下文：优先复用 state 中的 market_context，不覆盖时补齐后新建。"""
+    cfg = config or DEFAULT_CONFIG
+    codes = [str(c) for c in codes if str(c).strip()]
+    current = state.get("market_context")
+    if isinstance(current, MarketContext) and current.covers(codes, asof_date, _window(asof_date, cfg)):
+        return current
+    return build_market_context(codes, asof_date, cfg, base=current if isinstance(current, MarketContext) else None)
+
+
+def range_market_context(
+    start_date: str, end_date: str, config: RuntimeConfig | None = None
+) -> MarketContext:
+    """[start_date, end_date] 内全部有行情的 code 的上下文（用于规则校准）。"""
+    cfg = config or DEFAULT_CONFIG
+    codes, metrics = market_metrics_by_range(start_date, end_date, cfg)
+    return MarketContext(end_date, start_date, tuple(codes), metrics, cfg)
+
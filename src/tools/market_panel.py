@@ -0,0 +1,442 @@
+"""Per-code contiguous price blocks built once from the long-format price frame.
+
+``MarketPanel`` sorts the price history by (code, date) a single time and keeps,
+for every code, views of the typed columns it needs (dates, adjusted price,
+returns, spread, amount) plus prefix sums (count / sum / sum of squares) of the
+metric inputs.  Any lookback window is then two ``searchsorted`` calls and O(1)
+arithmetic per code, and new trading days extend the prefix sums in place of a
+rebuild.  The prefix sums are a (rows + 1) x 7 float64 array, i.e. 56 bytes per
+bar on top of the typed columns; panels built with ``prefix_sums=False`` (compact
+mode) skip them and sum the window from the stored columns on demand, O(window)
+per code.
+
+Each block also records the source row number (``seq``) of its rows, and
+``MarketPanel.listing()`` summarizes every code's first/last trading date, row
+count and first appearance, so universe queries ("codes listed by date X with
+at least N days of history") cost O(codes) instead of a scan over all bars.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .trading_calendar import TradingCalendar, to_datetime64
+
+
+# prefix-sum columns of CodeBlock.cum
+_RET_N, _RET_S, _RET_SS, _ADV_N, _ADV_S, _SPREAD_N, _SPREAD_S = range(7)
+
+
+def _prefix_inputs(ret: np.ndarray, amount: np.ndarray, spread_bps: np.ndarray) -> np.ndarray:
+    values = np.zeros((len(ret), 7))
+    for col_n, col_s, series in ((_RET_N, _RET_S, ret), (_ADV_N, _ADV_S, amount), (_SPREAD_N, _SPREAD_S, spread_bps)):
+        valid = ~np.isnan(series)
+        values[:, col_n] = valid
+        values[:, col_s] = np.where(valid, series, 0.0)
+    values[:, _RET_SS] = values[:, _RET_S] ** 2
+    return values
+
+
+def _prefix_sums(values: np.ndarray, base: np.ndarray | None = None) -> np.ndarray:
+    cum = np.empty((len(values) + 1, values.shape[1]))
+    cum[0] = 0.0 if base is None else base
+    np.cumsum(values, axis=0, out=cum[1:])
+    if base is not None:
+        cum[1:] += base
+    return cum
+
+
+_BLOCK_ARRAYS = ("dates", "price", "ret", "spread_bps", "amount", "seq")
+
+
+class _GrowthBuffer:
+    """CodeBlock 追加用的预留容量数组（cum 多一行）；只有长度等于 used 的 block 可原地续写。"""
+
+    def __init__(self, arrays: Dict[str, np.ndarray], used: int) -> None:
+        self.arrays = arrays
+        self.used = used
+        self.lock = threading.Lock()
+
+    @property
+    def capacity(self) -> int:
+        return len(self.arrays["dates"])
+
+    def claim(self, length: int, extra: int) -> bool:
+        # 已被更晚的 block 续写过的缓冲区不能再写，否则会覆盖对方的行
+        with self.lock:
+            if self.used != length or length + extra > self.capacity:
+                return False
+            self.used = length + extra
+            return True
+
+
+@dataclass(frozen=True)
+class CodeBlock:
+    dates: np.ndarray
+    price: np.ndarray
+    ret: np.ndarray
+    spread_bps: np.ndarray
+    amount: np.ndarray
+    cum: Optional[np.ndarray]  # (len + 1, 7) prefix sums, only differences are meaningful; None 时按需求和
+    seq: np.ndarray  # 各行在源行情表中的行号
+    buffer: Optional[_GrowthBuffer] = field(default=None, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def window(self, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> Tuple[int, int]:
+        lo = 0 if start is None else int(np.searchsorted(self.dates, start, side="left"))
+        hi = len(self.dates) if end is None else int(np.searchsorted(self.dates, end, side="right"))
+        return lo, max(lo, hi)
+
+    def window_sums(self, lo: int, hi: int) -> np.ndarray:
+        # 窗口内首行的收益率依赖窗口外的价格，与按窗口过滤后再 pct_change 的口径保持一致
+        if self.cum is None:
+            values = _prefix_inputs(
+                *(np.asarray(a[lo:hi], dtype=np.float64) for a in (self.ret, self.amount, self.spread_bps))
+            )
+            values[:1, [_RET_N, _RET_S, _RET_SS]] = 0.0
+            return values.sum(axis=0)
+        sums = self.cum[hi] - self.cum[lo]
+        sums[[_RET_N, _RET_S, _RET_SS]] = (self.cum[hi] - self.cum[min(lo + 1, hi)])[[_RET_N, _RET_S, _RET_SS]]
+        return sums
+
+    def metrics(self, lo: int, hi: int) -> Dict[str, float]:
+        return _metrics_from_sums(self.window_sums(lo, hi))
+
+    def extend(
+        self, dates: np.ndarray, price: np.ndarray, amount: np.ndarray, spread_bps: np.ndarray, seq: np.ndarray
+    ) -> "CodeBlock":
+        """追加严格晚于当前最后交易日的新行，前缀和从末尾接续计算。
+
+        新行写入预留容量的缓冲区（容量不足时按两倍扩容并复制一次），已有 block 只引用
+        缓冲区的前 len 行，不会看到后写入的行；摊还后每次追加只与新行数成正比。
+        """
+        if len(self.dates) and len(dates) and dates[0] <= self.dates[-1]:
+            raise ValueError("new rows must be later than the existing history")
+        prev = self.price[-1:] if len(self.price) else np.array([np.nan])
+        chained = np.concatenate([prev, price])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret = chained[1:] / chained[:-1] - 1.0
+        dtype = self.price.dtype
+        tail = {
+            "dates": dates,
+            "price": price.astype(dtype, copy=False),
+            "ret": ret.astype(dtype, copy=False),
+            "spread_bps": spread_bps.astype(dtype, copy=False),
+            "amount": amount.astype(dtype, copy=False),
+            "seq": seq.astype(self.seq.dtype, copy=False),
+        }
+        if self.cum is not None:
+            tail["cum"] = _prefix_sums(_prefix_inputs(ret, amount, spread_bps), base=self.cum[-1])[1:]
+        n, k = len(self), len(dates)
+        buffer = self.buffer
+        if buffer is None or not buffer.claim(n, k):
+            capacity = max(2 * (n + k), 16)
+            arrays = {}
+            for name in _BLOCK_ARRAYS:
+                current = getattr(self, name)
+                arrays[name] = np.empty(capacity, dtype=current.dtype)
+                arrays[name][:n] = current
+            if self.cum is not None:
+                arrays["cum"] = np.empty((capacity + 1, self.cum.shape[1]))
+                arrays["cum"][:n + 1] = self.cum
+            buffer = _GrowthBuffer(arrays, n + k)
+        for name, values in tail.items():
+            offset = n + 1 if name == "cum" else n
+            buffer.arrays[name][offset:offset + k] = values
+        views = {name: buffer.arrays[name][:n + k] for name in _BLOCK_ARRAYS}
+        return CodeBlock(
+            cum=buffer.arrays["cum"][:n + k + 1] if self.cum is not None else None, buffer=buffer, **views
+        )
+
+
+def _metrics_from_sums(sums: np.ndarray) -> Dict[str, float]:
+    volatility = 0.0
+    if sums[_RET_N] > 0:
+        mean = sums[_RET_S] / sums[_RET_N]
+        volatility = float(np.sqrt(max(sums[_RET_SS] / sums[_RET_N] - mean * mean, 0.0)))
+    return {
+        "volatility": volatility,
+        "adv": float(sums[_ADV_S] / sums[_ADV_N]) if sums[_ADV_N] > 0 else 0.0,
+        "spread_bps": float(sums[_SPREAD_S] / sums[_SPREAD_N]) if sums[_SPREAD_N] > 0 else 0.0,
+    }
+
+
+def combined_metrics(
+    panels: Sequence["MarketPanel"], codes: Iterable[str], start_date: str | None, end_date: str | None
+) -> Dict[str, Dict[str, float]]:
+    """按时间先后排列的多个分片 panel 上合并计算窗口指标。
+
+    各分片的窗口前缀和直接相加；相邻分片交界处的收益率（后一分片窗口首行相对
+    前一分片窗口末行）单独补上，结果与把窗口内各分片行情拼接后计算一致。
+    """
+    start = to_datetime64(start_date)
+    end = to_datetime64(end_date)
+    out: Dict[str, Dict[str, float]] = {}
+    for code in codes:
+        sums: Optional[np.ndarray] = None
+        prev_price = None
+        for panel in panels:
+            block = panel.blocks.get(code)
+            if block is None:
+                continue
+            lo, hi = block.window(start, end)
+            if hi <= lo:
+                continue
+            part = block.window_sums(lo, hi)
+            if sums is None:
+                sums = part
+            else:
+                sums += part
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    ret = np.float64(block.price[lo]) / prev_price - 1.0
+                if not np.isnan(ret):
+                    sums[_RET_N] += 1.0
+                    sums[_RET_S] += ret
+                    sums[_RET_SS] += ret * ret
+            prev_price = np.float64(block.price[hi - 1])
+        if sums is not None:
+            out[code] = _metrics_from_sums(sums)
+    return out
+
+
+def combined_prices(
+    panels: Sequence["MarketPanel"], code: str, start: Optional[np.datetime64], end: Optional[np.datetime64]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """code 在各分片窗口内的 (dates, 复权价格)，按时间拼接。"""
+    dates, prices = [], []
+    for panel in panels:
+        block = panel.blocks.get(code)
+        if block is None:
+            continue
+        lo, hi = block.window(start, end)
+        if hi > lo:
+            dates.append(block.dates[lo:hi])
+            prices.append(block.price[lo:hi].astype(np.float64))
+    if not dates:
+        return np.empty(0, dtype="datetime64[ns]"), np.empty(0)
+    return np.concatenate(dates), np.concatenate(prices)
+
+
+def _empty_block(date_dtype: np.dtype, value_dtype: np.dtype, prefix_sums: bool, seq_dtype: np.dtype) -> CodeBlock:
+    empty = np.empty(0, dtype=value_dtype)
+    return CodeBlock(
+        dates=np.empty(0, dtype=date_dtype),
+        price=empty,
+        ret=empty,
+        spread_bps=empty,
+        amount=empty,
+        cum=np.zeros((1, 7)) if prefix_sums else None,
+        seq=np.empty(0, dtype=seq_dtype),
+    )
+
+
+@dataclass(frozen=True)
+class CodeListing:
+    """每个 code 的首/末交易日、行数与首次出现行号，按首次出现顺序排列。"""
+
+    codes: np.ndarray
+    first_date: np.ndarray
+    last_date: np.ndarray
+    rows: np.ndarray
+    first_seq: np.ndarray
+    seq_ascending: np.ndarray  # block 内行号随日期递增（源文件按时间顺序）时可直接取窗口首行
+    blocks: Tuple[CodeBlock, ...]
+
+    @classmethod
+    def from_blocks(
+        cls, blocks: Dict[str, CodeBlock], date_dtype: np.dtype, stats: Dict[str, Tuple[int, bool]]
+    ) -> "CodeListing":
+        items = [(code, block) for code, block in blocks.items() if len(block)]
+        first_seq = np.asarray([stats[code][0] for code, _ in items], dtype=np.int64)
+        order = np.argsort(first_seq, kind="stable")
+        items = [items[i] for i in order.tolist()]
+        return cls(
+            codes=np.asarray([code for code, _ in items], dtype=object),
+            first_date=np.asarray([block.dates[0] for _, block in items], dtype=date_dtype),
+            last_date=np.asarray([block.dates[-1] for _, block in items], dtype=date_dtype),
+            rows=np.asarray([len(block) for _, block in items], dtype=np.int64),
+            first_seq=first_seq[order],
+            seq_ascending=np.asarray([stats[code][1] for code, _ in items], dtype=bool),
+            blocks=tuple(block for _, block in items),
+        )
+
+    def window(self, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> Tuple[np.ndarray, np.ndarray]:
+        """[start, end] 内有行情的 code 及其窗口内行数，按窗口内首次出现的行号排序。"""
+        overlap = np.ones(len(self.codes), dtype=bool)
+        inside = overlap.copy()
+        if start is not None:
+            overlap &= self.last_date >= start
+            inside &= self.first_date >= start
+        if end is not None:
+            overlap &= self.first_date <= end
+            inside &= self.last_date <= end
+        rows = np.where(overlap & inside, self.rows, 0)
+        first_seq = self.first_seq.copy()
+        for i in np.flatnonzero(overlap & ~inside).tolist():
+            block = self.blocks[i]
+            lo, hi = block.window(start, end)
+            rows[i] = hi - lo
+            if hi > lo:
+                first_seq[i] = block.seq[lo] if self.seq_ascending[i] else block.seq[lo:hi].min()
+        keep = np.flatnonzero(rows > 0)
+        keep = keep[np.argsort(first_seq[keep], kind="stable")]
+        return self.codes[keep], rows[keep]
+
+
+def _block_returns(price: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    ret = np.full(price.shape, np.nan)
+    if price.size > 1:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ret[1:] = price[1:] / price[:-1] - 1.0
+    ret[starts] = np.nan
+    return ret
+
+
+def _sorted_columns(df: pd.DataFrame) -> Tuple[np.ndarray, ...]:
+    """按 (code, date) 稳定排序后返回 codes/dates/price/amount/spread_bps 数组及各行在 df 中的位置。"""
+    codes = df["code"].astype(str).to_numpy().astype(str)
+    dates = df["date"].to_numpy()
+    order = np.lexsort((dates, codes))
+
+    def column(name: str) -> np.ndarray:
+        if name not in df.columns:
+            return np.full(len(order), np.nan)
+        return pd.to_numeric(df[name], errors="coerce").to_numpy(dtype=float)[order]
+
+    close = column("close")
+    if "adj_factor" in df.columns:
+        adj_close = close * column("adj_factor")
+        price = np.where(np.isnan(adj_close), close, adj_close)
+    else:
+        price = close
+    with np.errstate(divide="ignore", invalid="ignore"):
+        spread_bps = (column("high") - column("low")) / np.where(close == 0, np.nan, close) * 10000
+    return codes[order], dates[order], price, column("amount"), spread_bps, order.astype(np.int64)
+
+
+class MarketPanel:
+    """code -> CodeBlock 索引；初始 block 均为同一组排序后数组的切片视图。
+
+    ``value_dtype`` 控制 price/ret/spread/amount 的存储精度（紧凑模式用 float32）；
+    前缀和按 float64 在转换前计算。``prefix_sums=False`` 时不建前缀和、行号存为 int32，
+    窗口指标由 float32 列按需求和（相对误差约 1e-6）。
+    """
+
+    def __init__(
+        self,
+        blocks: Dict[str, CodeBlock],
+        calendar: TradingCalendar | None = None,
+        value_dtype: np.dtype = np.float64,
+        prefix_sums: bool = True,
+    ) -> None:
+        self.blocks = blocks
+        self.calendar = calendar or TradingCalendar.from_dates([])
+        self.value_dtype = np.dtype(value_dtype)
+        self.prefix_sums = prefix_sums
+        self.seq_dtype = np.dtype(np.int64 if prefix_sums else np.int32)
+        self.size = sum(len(block) for block in blocks.values())
+        self._listing: Optional[CodeListing] = None
+        # code -> (首次出现行号, 行号是否随日期递增)；首次 listing 时全量计算，之后随 append 增量维护
+        self._seq_stats: Optional[Dict[str, Tuple[int, bool]]] = None
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_frame(
+        cls, df: pd.DataFrame, value_dtype: np.dtype = np.float64, prefix_sums: bool = True
+    ) -> "MarketPanel":
+        if df.empty or "code" not in df.columns or "date" not in df.columns:
+            return cls({}, value_dtype=value_dtype, prefix_sums=prefix_sums)
+        codes, dates, price, amount, spread_bps, seq = _sorted_columns(df)
+        calendar = TradingCalendar.from_dates(dates)
+        unique_codes, starts = np.unique(codes, return_index=True)
+        ret = _block_returns(price, starts)
+        cum = _prefix_sums(_prefix_inputs(ret, amount, spread_bps)) if prefix_sums else None
+        if not prefix_sums:
+            seq = seq.astype(np.int32)
+        price, ret, amount, spread_bps = (a.astype(value_dtype, copy=False) for a in (price, ret, amount, spread_bps))
+        ends = np.append(starts[1:], len(codes))
+        blocks = {
+            str(code): CodeBlock(
+                dates=dates[lo:hi],
+                price=price[lo:hi],
+                ret=ret[lo:hi],
+                spread_bps=spread_bps[lo:hi],
+                amount=amount[lo:hi],
+                cum=None if cum is None else cum[lo:hi + 1],
+                seq=seq[lo:hi],
+            )
+            for code, lo, hi in zip(unique_codes.tolist(), starts.tolist(), ends.tolist())
+        }
+        return cls(blocks, calendar, value_dtype, prefix_sums)
+
+    def append(self, df: pd.DataFrame) -> None:
+        """增量追加新交易日的行情，仅更新受影响 code 的 block、前缀和与行号统计。"""
+        if df.empty:
+            return
+        codes, dates, price, amount, spread_bps, seq = _sorted_columns(df)
+        seq += self.size
+        unique_codes, starts = np.unique(codes, return_index=True)
+        ends = np.append(starts[1:], len(codes))
+        with self._stats_lock:
+            blocks = dict(self.blocks)
+            stats = None if self._seq_stats is None else dict(self._seq_stats)
+            for code, lo, hi in zip(unique_codes.tolist(), starts.tolist(), ends.tolist()):
+                code = str(code)
+                block = blocks.get(code)
+                if block is None:
+                    block = _empty_block(dates.dtype, self.value_dtype, self.prefix_sums, self.seq_dtype)
+                if stats is not None:
+                    # 新行号都大于已有行号，首次出现行号不变；递增性只需检查新行及其与旧末行的衔接
+                    part = seq[lo:hi]
+                    ascending = bool(np.all(np.diff(part) > 0))
+                    if code in stats:
+                        first, previous = stats[code]
+                        ascending = previous and ascending and bool(part[0] > block.seq[-1])
+                    else:
+                        first = int(part.min())
+                    stats[code] = (first, ascending)
+                blocks[code] = block.extend(dates[lo:hi], price[lo:hi], amount[lo:hi], spread_bps[lo:hi], seq[lo:hi])
+            self._seq_stats = stats
+            self.blocks = blocks
+        self.size += len(codes)
+        self._listing = None
+        self.calendar.append(dates)
+
+    def listing(self) -> CodeListing:
+        """各 code 的上市/行数概要（首次调用时构建，append 后按增量维护的行号统计重建）。"""
+        listing = self._listing
+        if listing is None:
+            with self._stats_lock:
+                blocks = self.blocks
+                stats = self._seq_stats
+                if stats is None:
+                    stats = {
+                        code: (int(block.seq.min()), bool(np.all(np.diff(block.seq) > 0)))
+                        for code, block in blocks.items()
+                        if len(block)
+                    }
+                    self._seq_stats = stats
+            listing = CodeListing.from_blocks(blocks, self.calendar.dates.dtype, stats)
+            self._listing = listing
+        return listing
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """各数组在全部 block 上的字节数合计（初始 block 为视图，合计即底层数组大小；追加缓冲区按容量计）。"""
+        report = {name: 0 for name in ("dates", "price", "ret", "spread_bps", "amount", "cum", "seq")}
+        for block in self.blocks.values():
+            for name in report:
+                array = block.buffer.arrays.get(name) if block.buffer is not None else getattr(block, name)
+                report[name] += 0 if array is None else int(array.nbytes)
+        report["calendar"] = int(self.calendar.dates.nbytes)
+        return report
+
+    def metrics(
+        self, codes: Iterable[str], start_date: str | None, end_date: str | None
+    ) -> Dict[str, Dict[str, float]]:
+        return combined_metrics([self], codes, start_date, end_date)
@@ -0,0 +1,142 @@
+"""In-memory ETF daily bar store that accepts new trading days incrementally.
+
+``PriceStore`` owns the typed long-format price frame together with the
+``MarketPanel`` (and its trading calendar) derived from it.  Appending a batch
+of new bars only normalizes the batch, extends the affected per-code blocks and
+prefix sums (into amortized growth buffers), and records the batch as a new frame
+segment; segments are concatenated lazily the next time ``frame`` is read, so
+an append costs time proportional to the new rows and history is never reparsed.
+
+In compact mode the frame keeps ``code`` as a categorical and price columns as
+float32, and the panel stores its derived columns (adjusted price, returns,
+spread) as float32 without the per-bar float64 prefix sums; the derived columns
+are computed once at load either way.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .market_panel import MarketPanel
+
+PRICE_COLUMNS = ("open", "high", "low", "close", "vol", "amount", "pre_close", "change", "pct_chg", "adj_factor")
+
+
+def normalize_price_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """统一 code/date/数值列类型，丢弃缺少 date 或 code 的行。"""
+    if df.empty:
+        return df
+    df = df.copy()
+    df["code"] = df["code"].astype(str)
+    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors="coerce")
+    return df.dropna(subset=["date", "code"])
+
+
+def compact_price_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """code 转为 category，数值列降为 float32。"""
+    if df.empty:
+        return df
+    df = df.copy()
+    df["code"] = df["code"].astype("category")
+    for col in PRICE_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype(np.float32)
+    return df
+
+
+def _align_dtypes(extra: pd.DataFrame, frame: pd.DataFrame) -> pd.DataFrame:
+    """把待追加行转换为与 frame 一致的列类型，category 列合并类别，避免 concat 退化为 object。"""
+    extra = extra.copy()
+    for col in frame.columns:
+        dtype = frame[col].dtype
+        if isinstance(dtype, pd.CategoricalDtype):
+            categories = dtype.categories.union(pd.Index(extra[col].dropna().unique()), sort=False)
+            extra[col] = pd.Categorical(extra[col], categories=categories)
+        elif extra[col].dtype != dtype:
+            extra[col] = extra[col].astype(dtype)
+    return extra
+
+
+class PriceStore:
+    """行情长表 + MarketPanel；append 时两者同步增量更新，长表按分段追加、读取时再合并。"""
+
+    def __init__(self, frame: pd.DataFrame, compact: bool = False) -> None:
+        self.compact = compact
+        frame = compact_price_frame(frame) if compact else frame
+        self._segments: List[pd.DataFrame] = [frame]
+        self._next_index = int(frame.index.max()) + 1 if len(frame) else 0
+        self._lock = threading.Lock()
+        value_dtype = np.float32 if compact else np.float64
+        self.panel = MarketPanel.from_frame(frame, value_dtype=value_dtype, prefix_sums=not compact)
+
+    @property
+    def frame(self) -> pd.DataFrame:
+        """完整行情长表；有未合并的追加分段时在此合并一次。"""
+        with self._lock:
+            segments = self._segments
+            if len(segments) > 1:
+                # 各分段的 category 类别逐段扩充，以最后一段的类别为准统一后拼接
+                last = segments[-1]
+                aligned = []
+                for segment in segments:
+                    for col, dtype in last.dtypes.items():
+                        if isinstance(dtype, pd.CategoricalDtype) and segment[col].dtype != dtype:
+                            segment = segment.assign(**{col: segment[col].cat.set_categories(dtype.categories)})
+                    aligned.append(segment)
+                self._segments = [pd.concat(aligned)]
+            return self._segments[0]
+
+    def new_rows(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """筛出可追加的行：同批内 (code, date) 去重，且日期严格晚于该 code 已有的最后交易日。"""
+        if rows.empty or "code" not in rows.columns or "date" not in rows.columns:
+            return rows.iloc[0:0]
+        rows = normalize_price_frame(rows)
+        rows = rows.drop_duplicates(["code", "date"], keep="last").sort_values(["date", "code"], kind="stable")
+        last_dates = {
+            code: block.dates[-1] for code, block in self.panel.blocks.items() if len(block)
+        }
+        last = rows["code"].map(last_dates)
+        keep = last.isna() | (rows["date"] > pd.to_datetime(last))
+        return rows[keep.to_numpy(dtype=bool)]
+
+    def append(self, rows: pd.DataFrame) -> pd.DataFrame:
+        """追加新行情并返回实际接受的行；新行作为长表的一个分段发布，panel 整体替换 blocks，读者不会看到半成品。"""
+        accepted = self.new_rows(rows)
+        if accepted.empty:
+            return accepted
+        with self._lock:
+            last = self._segments[-1]
+            if self._next_index == 0:
+                extra = accepted.reset_index(drop=True)
+                if self.compact:
+                    extra = compact_price_frame(extra)
+            else:
+                extra = _align_dtypes(accepted.reindex(columns=list(last.columns)), last)
+                extra.index = pd.RangeIndex(self._next_index, self._next_index + len(extra))
+            self.panel.append(accepted)
+            if self._next_index == 0:
+                self._segments = [extra]
+            else:
+                self._segments.append(extra)
+            self._next_index += len(extra)
+        return accepted
+
+    def memory_report(self) -> Dict[str, Any]:
+        """行情表逐列字节数（含字符串对象本身）与 MarketPanel 各数组字节数。"""
+        usage = self.frame.memory_usage(deep=True, index=True)
+        frame_bytes = {str(name): int(value) for name, value in usage.items()}
+        panel_bytes = self.panel.memory_bytes()
+        return {
+            "compact": self.compact,
+            "rows": int(len(self.frame)),
+            "frame": frame_bytes,
+            "frame_total": int(sum(frame_bytes.values())),
+            "panel": panel_bytes,
+            "panel_total": int(sum(panel_bytes.values())),
+        }
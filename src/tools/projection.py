@@ -0,0 +1,97 @@
+"""Exact solvers for weight vectors on the capped simplex.
+
+Both work on the box-constrained simplex ``{lower <= w <= upper, sum(w) = total}``
+and run in O(n log n) (one sort of the breakpoints):
+
+* ``project_capped_simplex`` — Euclidean projection, ``w = clip(v - tau, lower,
+  upper)`` with the shift ``tau`` located exactly between sorted breakpoints.
+* ``l1_box_solve`` — minimizes ``sum|w - target| + lam * sum|w - current|``,
+  the rebalancing LP objective, without the turnover constraint.  Each coordinate
+  is a convex piecewise-linear cost, so filling the segments in increasing
+  slope order from ``lower`` is optimal; segments with equal slope are filled
+  proportionally to their length.
+
+Both return ``None`` when the box cannot reach ``total``.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+_TOL = 1e-12
+
+
+def _feasible(lower: np.ndarray, upper: np.ndarray, total: float) -> bool:
+    return bool(np.all(lower <= upper + _TOL)) and lower.sum() <= total + 1e-9 and upper.sum() >= total - 1e-9
+
+
+def project_capped_simplex(
+    v: np.ndarray,
+    upper: np.ndarray | float,
+    lower: np.ndarray | float = 0.0,
+    total: float = 1.0,
+) -> Optional[np.ndarray]:
+    """v 在 {lower ≤ w ≤ upper, Σw = total} 上的欧氏投影；v 为 (K, n) 时逐行投影。不可行时返回 None。"""
+    v = np.asarray(v, dtype=float)
+    n = v.shape[-1]
+    upper = np.broadcast_to(np.asarray(upper, dtype=float), (n,))
+    lower = np.broadcast_to(np.asarray(lower, dtype=float), (n,))
+    if n == 0 or not _feasible(lower, upper, total):
+        return None
+
+    # g(tau) = Σ clip(v - tau, lower, upper) 单调不增、分段线性：
+    # tau 越过 v - upper 时该分量开始随 tau 下降（斜率 -1），越过 v - lower 时触底（斜率恢复）
+    points = np.concatenate([v - upper, v - lower], axis=-1)
+    steps = np.broadcast_to(np.concatenate([-np.ones(n), np.ones(n)]), points.shape)
+    order = np.argsort(points, axis=-1, kind="stable")
+    points = np.take_along_axis(points, order, axis=-1)
+    slope = np.cumsum(np.take_along_axis(steps, order, axis=-1), axis=-1)  # points[k] 与 points[k + 1] 之间的斜率
+    rise = np.cumsum(slope[..., :-1] * np.diff(points, axis=-1), axis=-1)
+    g = upper.sum() + np.concatenate([np.zeros(rise.shape[:-1] + (1,)), rise], axis=-1)
+    k = np.clip((g >= total).sum(axis=-1, keepdims=True) - 1, 0, 2 * n - 1)
+    tau = np.take_along_axis(points, k, axis=-1)
+    slope_k = np.take_along_axis(slope, k, axis=-1)
+    g_k = np.take_along_axis(g, k, axis=-1)
+    tau = tau + np.where(slope_k < 0, (g_k - total) / np.where(slope_k < 0, -slope_k, 1.0), 0.0)
+    return np.clip(v - tau, lower, upper)
+
+
+def l1_box_solve(
+    target: np.ndarray,
+    current: np.ndarray,
+    lower: np.ndarray,
+    upper: np.ndarray,
+    lam: float = 0.0,
+    total: float = 1.0,
+) -> Optional[np.ndarray]:
+    """min Σ|w - target| + lam·Σ|w - current|，s.t. lower ≤ w ≤ upper、Σw = total；不可行时返回 None。"""
+    target = np.asarray(target, dtype=float)
+    current = np.asarray(current, dtype=float)
+    lower = np.asarray(lower, dtype=float)
+    upper = np.asarray(upper, dtype=float)
+    n = len(target)
+    if n == 0 or not _feasible(lower, upper, total):
+        return None
+    upper = np.maximum(upper, lower)
+
+    # 每个分量在 [lower, upper] 上以 target、current 为折点切成至多 3 段，段内斜率为常数
+    knots = np.sort(
+        np.stack([lower, np.clip(target, lower, upper), np.clip(current, lower, upper), upper], axis=1), axis=1
+    )
+    length = np.diff(knots, axis=1).ravel()
+    mid = ((knots[:, :-1] + knots[:, 1:]) / 2).ravel()
+    owner = np.repeat(np.arange(n), 3)
+    slope = np.sign(mid - target[owner]) + lam * np.sign(mid - current[owner])
+    keep = length > 0
+    length, slope, owner = length[keep], np.round(slope[keep], 12), owner[keep]
+
+    need = total - lower.sum()
+    fill = np.zeros_like(length)
+    if need > 0 and len(length):
+        levels, group = np.unique(slope, return_inverse=True)
+        group_length = np.bincount(group, weights=length, minlength=len(levels))
+        before = np.concatenate([[0.0], np.cumsum(group_length)[:-1]])
+        share = np.clip((need - before) / np.where(group_length > 0, group_length, 1.0), 0.0, 1.0)
+        fill = length * share[group]
+    return lower + np.bincount(owner, weights=fill, minlength=n)
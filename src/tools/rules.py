@@ -1,12 +1,12 @@
 from __future__ import annotations
 
-from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Tuple
 
 import yaml
 
 from ..config import RuntimeConfig, DEFAULT_CONFIG
+from ..resource_cache import ResourceCache
 
 _DEFAULT_RULES = {
     "default": {
@@ -28,6 +28,7 @@ _DEFAULT_RULES = {
 }
 
 _ROOT = Path(__file__).resolve().parents[2]
+_RULES_CACHE = ResourceCache("rules", capacity=32)
 
 
 def _rules_path(config: RuntimeConfig | None = None) -> Path:
@@ -37,8 +38,7 @@ def _rules_path(config: RuntimeConfig | None = None) -> Path:
     return _ROOT / "cufel_practice_data" / "rules.yaml"
 
 
-@lru_cache(maxsize=32)
-def _load_rules_cached(profile: str, path_str: str) -> Tuple[Dict[str, Any], str]:
+def _read_rules(profile: str, path_str: str) -> Tuple[Dict[str, Any], str]:
     path = Path(path_str)
     if path.exists():
         data = yaml.safe_load(path.read_text(encoding="utf-8")) or {}
@@ -52,6 +52,10 @@ def _load_rules_cached(profile: str, path_str: str) -> Tuple[Dict[str, Any], str
     return fallback, "local-default"
 
 
+def _load_rules_cached(profile: str, path_str: str) -> Tuple[Dict[str, Any], str]:
+    return _RULES_CACHE.get((profile, path_str), [path_str], lambda: _read_rules(profile, path_str))
+
+
 def load_rules(profile: str, config: RuntimeConfig | None = None) -> Tuple[Dict[str, Any], str]:
     path = _rules_path(config)
     rules, version = _load_rules_cached(profile, str(path))
@@ -0,0 +1,86 @@
+"""Per-year / per-month data shards under CSV_DATA_DIR.
+
+A shard is a file whose name carries its period, e.g. ``etf_2025_data.csv``
+(the whole of 2025) or ``etf_202601_data.csv`` / ``etf_2026-01_data.csv``
+(January 2026).  Requests only load the shards whose period overlaps their
+date window, and loaded shards are kept in a bounded LRU (see
+``src.resource_cache``) so memory tracks the windows in use rather than the
+size of the archive.
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+_PERIOD = r"(?P<year>\d{4})(?:[-_]?(?P<month>\d{2}))?"
+
+
+@dataclass(frozen=True)
+class Shard:
+    path: Path
+    start: np.datetime64  # datetime64[D]，含
+    end: np.datetime64  # datetime64[D]，含
+    monthly: bool = False
+
+    def overlaps(self, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> bool:
+        if start is not None and self.end < start.astype("datetime64[D]"):
+            return False
+        if end is not None and self.start > end.astype("datetime64[D]"):
+            return False
+        return True
+
+    def contains(self, date: np.datetime64) -> bool:
+        day = date.astype("datetime64[D]")
+        return bool(self.start <= day <= self.end)
+
+
+def _period(year: int, month: Optional[int]) -> Tuple[np.datetime64, np.datetime64]:
+    if month is None:
+        return np.datetime64(f"{year:04d}-01-01"), np.datetime64(f"{year:04d}-12-31")
+    start = np.datetime64(f"{year:04d}-{month:02d}", "M")
+    return start.astype("datetime64[D]"), (start + 1).astype("datetime64[D]") - 1
+
+
+def shard_path(directory: Path, prefix: str, suffix: str, date: np.datetime64, monthly: bool) -> Path:
+    """date 所在周期的分片文件名（按年或按月）。"""
+    month = date.astype("datetime64[M]")
+    year = int(str(month)[:4])
+    name = f"{year:04d}{str(month)[5:7]}" if monthly else f"{year:04d}"
+    return directory / f"{prefix}{name}{suffix}"
+
+
+@lru_cache(maxsize=64)
+def _discover_cached(dir_str: str, prefix: str, suffix: str, dir_mtime_ns: int) -> Tuple[Shard, ...]:
+    pattern = re.compile(rf"{re.escape(prefix)}{_PERIOD}{re.escape(suffix)}")
+    shards = []
+    for path in Path(dir_str).glob(f"{prefix}*{suffix}"):
+        match = pattern.fullmatch(path.name)
+        if not match:
+            continue
+        month = match.group("month")
+        if month is not None and not 1 <= int(month) <= 12:
+            continue
+        start, end = _period(int(match.group("year")), int(month) if month else None)
+        shards.append(Shard(path, start, end, monthly=month is not None))
+    shards.sort(key=lambda s: (s.start, s.end))
+    return tuple(shards)
+
+
+def discover_shards(directory: Path, prefix: str, suffix: str) -> List[Shard]:
+    """目录下匹配 ``<prefix><YYYY[MM]><suffix>`` 的分片，按周期升序；目录 mtime 变化时重新扫描。"""
+    try:
+        mtime = directory.stat().st_mtime_ns
+    except OSError:
+        return []
+    return list(_discover_cached(str(directory), prefix, suffix, mtime))
+
+
+def overlapping(
+    shards: Iterable[Shard], start: Optional[np.datetime64], end: Optional[np.datetime64]
+) -> List[Shard]:
+    return [shard for shard in shards if shard.overlaps(start, end)]
@@ -1,11 +1,13 @@
 from __future__ import annotations
 
-from typing import Dict, Any
+from typing import Any, Dict, Sequence
+
+import numpy as np
 
 from ..state import RiskState
 from ..config import RuntimeConfig, DEFAULT_CONFIG
-from .csv_data import market_metrics, lookback_start_date
-from .utils import normalize_weights, compute_hhi, compute_effective_n
+from .market_context import MarketContext, market_context
+from .utils import EPSILON, normalize_weights, compute_hhi, compute_effective_n
 
 
 def risk_snapshot_bundle(state: RiskState, config: RuntimeConfig | None = None) -> Dict[str, Any]:
@@ -18,11 +20,9 @@ def risk_snapshot_bundle(state: RiskState, config: RuntimeConfig | None = None)
     aum = normalized.get("aum")
     if aum is None:
         aum = cfg.default_aum
-    lookback_days = int(cfg.market_lookback_days)
-    start_date = lookback_start_date(asof_date, lookback_days)
-
-    codes = set(target_weights) | set(current_weights)
-    market = market_metrics(codes, start_date or asof_date, asof_date, cfg)
+    codes = list(dict.fromkeys([*target_weights, *current_weights]))
+    context = market_context(state, codes, asof_date, cfg)
+    market = context.metrics_for(codes)
     missing = [c for c in target_weights if c not in market]
 
     # Use shared utility functions instead of local definitions
@@ -70,12 +70,20 @@ def risk_snapshot_bundle(state: RiskState, config: RuntimeConfig | None = None)
             continue
         current_vol += weight * float(row.get("volatility") or 0.0)
 
+    if cfg.volatility_model == "covariance":
+        # 计入相关性：同一窗口与 universe 的协方差分解跨请求复用
+        model = context.covariance(market)
+        if model is not None:
+            weighted_vol = model.volatility(target_norm)
+            current_vol = model.volatility(current_norm)
+
     macro_severity = 0
 
     metrics = {
         "portfolio_volatility": weighted_vol,
         "current_portfolio_volatility": current_vol,
         "delta_portfolio_volatility": weighted_vol - current_vol,
+        "volatility_model": cfg.volatility_model,
         "weighted_spread_bps": weighted_spread,
         "weighted_adv": weighted_adv,
         "hhi": hhi,
@@ -94,4 +102,106 @@ def risk_snapshot_bundle(state: RiskState, config: RuntimeConfig | None = None)
         "missing_market_rows": missing,
     }
 
-    return {"snapshot_metrics": metrics}
+    return {"snapshot_metrics": metrics, "market_context": context}
+
+
+def _normalize_rows(weights: np.ndarray) -> np.ndarray:
+    """逐行归一化；行和不为正时保持原值（与 normalize_weights 一致）。"""
+    total = weights.sum(axis=1, keepdims=True)
+    return np.divide(weights, total, out=weights.copy(), where=total > 0)
+
+
+def _concentration(norm: np.ndarray) -> Dict[str, np.ndarray]:
+    hhi = (norm * norm).sum(axis=1)
+    effective_n = np.divide(1.0, hhi, out=np.zeros_like(hhi), where=hhi > EPSILON)
+    top = norm.max(axis=1) if norm.shape[1] else np.zeros(len(norm))
+    return {"hhi": hhi, "effective_n": effective_n, "top_weight": top}
+
+
+def risk_snapshot_batch(
+    weights_matrix: Any,
+    current_matrix: Any,
+    codes: Sequence[str],
+    asof_date: str,
+    *,
+    aum: float | None = None,
+    config: RuntimeConfig | None = None,
+    context: MarketContext | None = None,
+) -> Dict[str, Any]:
+    """对 K 个候选组合（K×N 权重矩阵，列与 codes 对齐）一次性计算快照指标，返回逐列数组。
+
+    current_matrix 可为 K×N、N（所有候选共用同一当前持仓）或 None（空仓）。各指标口径与
+    risk_snapshot_bundle 相同（权重为 0 的列视为未持有）；max_adv_ratio 无可计算标的时为 NaN。
+    行情只读取一次（传入同一窗口的 context 时直接复用）；VOLATILITY_MODEL=covariance 时协方差按
+    全部 codes 统一估计，候选之间可直接比较。
+    """
+    cfg = config or DEFAULT_CONFIG
+    codes = [str(c) for c in codes]
+    target = np.atleast_2d(np.asarray(weights_matrix, dtype=float))
+    if target.shape[1] != len(codes):
+        raise ValueError(f"weights_matrix has {target.shape[1]} columns for {len(codes)} codes")
+    if current_matrix is None:
+        current = np.zeros_like(target)
+    else:
+        current = np.broadcast_to(np.asarray(current_matrix, dtype=float), target.shape)
+    if aum is None:
+        aum = cfg.default_aum
+
+    context = market_context({"market_context": context}, codes, asof_date, cfg)
+    market = context.metrics_for(codes)
+    has_row = np.asarray([code in market for code in codes], dtype=bool)
+
+    def column(name: str) -> np.ndarray:
+        return np.asarray([float((market.get(code) or {}).get(name) or 0.0) for code in codes])
+
+    vol, spread, adv = column("volatility"), column("spread_bps"), column("adv")
+    target_norm = _normalize_rows(target)
+    current_norm = _normalize_rows(current)
+
+    weighted_vol = target_norm @ vol
+    current_vol = current_norm @ vol
+    if cfg.volatility_model == "covariance":
+        model = context.covariance(market)
+        if model is not None:
+            index = {code: i for i, code in enumerate(model.codes)}
+            factor = np.zeros((len(codes), model.factor.shape[1]))
+            for j, code in enumerate(codes):
+                if code in index:
+                    factor[j] = model.factor[index[code]]
+            weighted_vol = np.linalg.norm(target_norm @ factor, axis=1)
+            current_vol = np.linalg.norm(current_norm @ factor, axis=1)
+
+    deltas = target - current
+    trade = np.abs(deltas)
+    max_adv_ratio = np.full(len(target), np.nan)
+    tradable = has_row & (adv > 0)
+    if aum and tradable.any():
+        # 与逐个计算时一致：只统计目标组合中的标的（权重为 0 的列视为未持有）
+        ratios = np.where(tradable & (target != 0), trade * float(aum) / np.where(tradable, adv, 1.0), np.nan)
+        held = ~np.isnan(ratios).all(axis=1)
+        max_adv_ratio[held] = np.nanmax(ratios[held], axis=1)
+
+    target_conc = _concentration(target_norm)
+    current_conc = _concentration(current_norm)
+    return {
+        "codes": codes,
+        "portfolio_volatility": weighted_vol,
+        "current_portfolio_volatility": current_vol,
+        "delta_portfolio_volatility": weighted_vol - current_vol,
+        "weighted_spread_bps": target_norm @ spread,
+        "weighted_adv": target_norm @ adv,
+        "hhi": target_conc["hhi"],
+        "effective_n": target_conc["effective_n"],
+        "top_weight": target_conc["top_weight"],
+        "current_hhi": current_conc["hhi"],
+        "current_effective_n": current_conc["effective_n"],
+        "current_top_weight": current_conc["top_weight"],
+        "delta_hhi": target_conc["hhi"] - current_conc["hhi"],
+        "delta_effective_n": target_conc["effective_n"] - current_conc["effective_n"],
+        "turnover": 0.5 * trade.sum(axis=1),
+        "max_position_delta": trade.max(axis=1) if len(codes) else np.zeros(len(target)),
+        "max_adv_ratio": max_adv_ratio,
+        "missing_market_count": ((target != 0) & ~has_row).sum(axis=1),
+        "adv_by_symbol": {code: float(market[code].get("adv") or 0.0) for code in codes if code in market},
+        "volatility_model": cfg.volatility_model,
+    }
@@ -1,6 +1,17 @@
 from __future__ import annotations
 
-from typing import Dict, Any, List, Tuple, Optional
+import itertools
+import math
+import multiprocessing
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
 
 try:
     import cvxpy as cp
@@ -9,43 +20,38 @@ except ImportError:  # pragma: no cover - optional dependency
 
 from ..config import RuntimeConfig, DEFAULT_CONFIG
 from ..state import RiskState
+from .projection import l1_box_solve, project_capped_simplex
 from .rules import load_rules
-from .utils import normalize_weights, compute_hhi, compute_effective_n
+from .utils import EPSILON, normalize_weights, compute_hhi, compute_effective_n
 
 
 def _strip_cash(weights: Dict[str, float], cash_symbol: str) -> Dict[str, float]:
     return {k: v for k, v in weights.items() if k != cash_symbol}
 
 
+def _cap_vector(values: np.ndarray, cap: float, budget: float) -> np.ndarray:
+    """values 在 {0 ≤ w ≤ cap, Σw = budget} 上的投影；cap 不足以容纳 budget 时全部取 cap。"""
+    if budget >= values.shape[-1] * cap:
+        return np.full(values.shape, cap)
+    return project_capped_simplex(values, cap, 0.0, budget)
+
+
 def _cap_and_fill(
     weights: Dict[str, float], cap: float, cash_symbol: str
 ) -> Dict[str, float]:
     out = {k: float(v) for k, v in weights.items() if float(v) > 0}
-    if cap <= 0:
+    if cap <= 0 or all(v <= cap for v in out.values()):
         return out
 
-    excess = 0.0
-    for k, v in list(out.items()):
-        if v > cap:
-            excess += v - cap
-            out[k] = cap
-
-    # redistribute excess to those under cap
-    for _ in range(5):
-        if excess <= 1e-12:
-            break
-        capacity = {k: cap - v for k, v in out.items() if k != cash_symbol and v < cap}
-        total_cap = float(sum(capacity.values()))
-        if total_cap <= 1e-12:
-            break
-        for k, cap_left in capacity.items():
-            out[k] += excess * (cap_left / total_cap)
-        excess = max(0.0, 1.0 - float(sum(out.values())))
-
-    if excess > 1e-8:
-        out[cash_symbol] = out.get(cash_symbol, 0.0) + excess
-
-    return out
+    # 超出上限的部分按欧氏投影精确摊回 {0 ≤ w ≤ cap, Σw = 1 - cash}，仅在全部触顶仍有余量时记为现金
+    cash = min(out.get(cash_symbol, 0.0), cap)
+    names = [k for k in out if k != cash_symbol]
+    filled = _cap_vector(np.asarray([out[k] for k in names]), cap, 1.0 - cash)
+    result = {k: float(v) for k, v in zip(names, filled) if v > 0}
+    cash += max(0.0, 1.0 - cash - float(filled.sum()))
+    if cash > 1e-8:
+        result[cash_symbol] = cash
+    return result
 
 
 def _blend_equal(weights: Dict[str, float], alpha: float) -> Dict[str, float]:
@@ -74,6 +80,49 @@ def _limit_holdings(
         trimmed[cash_symbol] = cash
     return normalize_weights(trimmed), True
 
+_ALPHA_POINTS = 17
+_ALPHA_ROUNDS = 4
+
+
+def _blend_hhi(weights: np.ndarray, alphas: np.ndarray, cap: float) -> np.ndarray:
+    """按 alpha 向等权混合、归一化并按 cap 截顶后的 HHI（逐行对应每个 alpha，与 _adjust_weights 的候选一致）。"""
+    n = len(weights)
+    blended = (1.0 - alphas)[:, None] * weights + alphas[:, None] / n
+    total = blended.sum(axis=1, keepdims=True)
+    blended = np.divide(blended, total, out=blended.copy(), where=total > 0)
+    over = blended.max(axis=1) > cap
+    if cap > 0 and over.any():
+        # 基础权重均为正，逐行投影与 _cap_and_fill 的结果一致
+        blended[over] = _cap_vector(blended[over], cap, 1.0)
+    total = blended.sum(axis=1, keepdims=True)
+    norm = np.divide(blended, total, out=blended.copy(), where=total > 0)
+    return (norm * norm).sum(axis=1)
+
+
+def _diversify_alpha(weights: np.ndarray, cap: float, hhi_target: float, n_target: float) -> float:
+    """使 HHI ≤ hhi_target 且有效持仓数 ≥ n_target 的最小混合比例 alpha；等权仍不满足时返回 1。
+
+    向等权混合时 HHI 随 alpha 单调不增：每轮在当前区间的网格上整体求值，收缩到首个满足目标的格点，
+    固定轮数后取满足目标的一端（精度 16^-4）。
+    """
+
+    def meets(hhi: np.ndarray) -> np.ndarray:
+        effective_n = np.divide(1.0, hhi, out=np.zeros_like(hhi), where=hhi > EPSILON)
+        return ((hhi <= hhi_target) | (not hhi_target)) & ((effective_n >= n_target) | (not n_target))
+
+    lo, hi = 0.0, 1.0
+    for _ in range(_ALPHA_ROUNDS):
+        alphas = np.linspace(lo, hi, _ALPHA_POINTS)
+        ok = meets(_blend_hhi(weights, alphas, cap))
+        if not ok[-1]:
+            return 1.0
+        if ok[0]:
+            return lo
+        first = int(np.argmax(ok))
+        lo, hi = float(alphas[first - 1]), float(alphas[first])
+    return hi
+
+
 def _adjust_weights(
     target_weights: Dict[str, float],
     profile: Dict[str, Any],
@@ -93,85 +142,293 @@ def _adjust_weights(
     if need_diversify:
         base = _strip_cash(adjusted, cash_symbol)
         if (hhi_target and compute_hhi(base) > hhi_target) or (n_target and compute_effective_n(base) < n_target):
-            for alpha in (0.3, 0.6, 1.0):
-                blended = _blend_equal(base, alpha)
-                candidate = _cap_and_fill(blended, cap, cash_symbol)
-                cand_base = _strip_cash(candidate, cash_symbol)
-                if (not hhi_target or compute_hhi(cand_base) <= hhi_target) and (
-                    not n_target or compute_effective_n(cand_base) >= n_target
-                ):
-                    adjusted = candidate
-                    notes.append("improve_diversification")
-                    break
-            else:
-                adjusted = candidate
-                notes.append("improve_diversification")
+            alpha = _diversify_alpha(np.asarray(list(base.values()), dtype=float), cap, hhi_target, n_target)
+            adjusted = _cap_and_fill(normalize_weights(_blend_equal(base, alpha)), cap, cash_symbol)
+            notes.append("improve_diversification")
 
     return adjusted, notes
 
 
-def _solve_lp(
+class _LPTemplate:
+    """参数化（DPP）的调仓 LP：同一规模与约束组合只构建、编译一次，之后仅更新参数值求解。"""
+
+    def __init__(self, n: int, has_cap: bool, has_turnover: bool, has_trade_limit: bool) -> None:
+        self.target = cp.Parameter(n)
+        self.current = cp.Parameter(n)
+        self.turnover_weight = cp.Parameter(nonneg=True)
+        self.cap = cp.Parameter(nonneg=True) if has_cap else None
+        self.max_turnover = cp.Parameter(nonneg=True) if has_turnover else None
+        self.trade_limit = cp.Parameter(n, nonneg=True) if has_trade_limit else None
+        self.w = cp.Variable(n)
+        t = cp.Variable(n)  # |w - target|
+        u = cp.Variable(n)  # |w - current|
+
+        constraints = [self.w >= 0, cp.sum(self.w) == 1]
+        if self.cap is not None:
+            constraints.append(self.w <= self.cap)
+        constraints += [t >= self.w - self.target, t >= self.target - self.w]
+        constraints += [u >= self.w - self.current, u >= self.current - self.w]
+        if self.max_turnover is not None:
+            constraints.append(0.5 * cp.sum(u) <= self.max_turnover)
+        if self.trade_limit is not None:
+            constraints.append(u <= self.trade_limit)
+
+        objective = cp.Minimize(cp.sum(t) + self.turnover_weight * cp.sum(u))
+        self.problem = cp.Problem(objective, constraints)
+        self.lock = threading.Lock()
+
+
+_LP_CACHE_SIZE = 32
+_LP_CACHE: "OrderedDict[Tuple[int, bool, bool, bool], _LPTemplate]" = OrderedDict()
+_LP_CACHE_LOCK = threading.Lock()
+
+
+def _lp_template(n: int, has_cap: bool, has_turnover: bool, has_trade_limit: bool) -> _LPTemplate:
+    key = (n, has_cap, has_turnover, has_trade_limit)
+    with _LP_CACHE_LOCK:
+        template = _LP_CACHE.get(key)
+        if template is None:
+            template = _LPTemplate(*key)
+            _LP_CACHE[key] = template
+        _LP_CACHE.move_to_end(key)
+        while len(_LP_CACHE) > _LP_CACHE_SIZE:
+            _LP_CACHE.popitem(last=False)
+    return template
+
+
+# 各求解器自身的时限参数名（秒）；不在表中的求解器不设时限
+_TIME_LIMIT_OPTIONS = {
+    "CLARABEL": "time_limit",
+    "HIGHS": "time_limit",
+    "OSQP": "time_limit",
+    "SCS": "time_limit_secs",
+    "GUROBI": "TimeLimit",
+    "CBC": "maximumSeconds",
+}
+# LP_SOLVER 未设置时按此顺序选用已安装的求解器，以便传入时限
+_DEFAULT_LP_SOLVERS = ("CLARABEL", "HIGHS", "SCS")
+# 接受 LP 解之前按约束复核的容差（SCS 等一阶求解器的默认精度约 1e-5）
+_FEASIBILITY_TOL = 1e-4
+
+
+def _lp_solver(name: Optional[str]) -> Optional[str]:
+    if name:
+        return name.upper()
+    installed = set(cp.installed_solvers())
+    return next((solver for solver in _DEFAULT_LP_SOLVERS if solver in installed), None)
+
+
+def _hit_time_limit(stats: Any) -> bool:
+    """求解器把超时报告为近似最优时（如 SCS 的 "solved (inaccurate - reached time_limit_secs)"）返回 True。"""
+    extra = stats.extra_stats
+    info = extra.get("info") if isinstance(extra, dict) else None
+    return isinstance(info, dict) and "time_limit" in str(info.get("status") or "")
+
+
+def _max_violation(weights: np.ndarray, args: Dict[str, Any]) -> float:
+    """权重对 LP 各约束（非负、权重和、单标的上限、换手率、单标的调仓上限）的最大违反量。"""
+    delta = np.abs(weights - args["current"])
+    violations = [float(-weights.min(initial=0.0)), abs(float(weights.sum()) - 1.0)]
+    if args["cap"] is not None:
+        violations.append(float((weights - args["cap"]).max(initial=0.0)))
+    if args["max_turnover"] is not None:
+        violations.append(0.5 * float(delta.sum()) - args["max_turnover"])
+    if args["trade_limit"] is not None:
+        violations.append(float((delta - args["trade_limit"]).max(initial=0.0)))
+    return max(violations)
+
+
+def _run_lp(args: Dict[str, Any]) -> Dict[str, Any]:
+    """用缓存的参数化模板求解 LP，返回解与求解统计；time_limit > 0 时交给求解器自身限时。"""
+    template = _lp_template(
+        args["n"], args["cap"] is not None, args["max_turnover"] is not None, args["trade_limit"] is not None
+    )
+    solver = args["solver"]
+    options: Dict[str, Any] = {}
+    option = _TIME_LIMIT_OPTIONS.get(solver or "")
+    if option and args.get("time_limit", 0.0) > 0:
+        options[option] = float(args["time_limit"])
+    with template.lock:
+        template.target.value = args["target"]
+        template.current.value = args["current"]
+        template.turnover_weight.value = args["turnover_weight"]
+        if template.cap is not None:
+            template.cap.value = args["cap"]
+        if template.max_turnover is not None:
+            template.max_turnover.value = args["max_turnover"]
+        if template.trade_limit is not None:
+            template.trade_limit.value = args["trade_limit"]
+        try:
+            with warnings.catch_warnings():
+                # 达到时限时 cvxpy 会提示解可能不精确，由 status 反映
+                warnings.simplefilter("ignore", UserWarning)
+                template.problem.solve(solver=solver, warm_start=True, **options)
+        except cp.error.SolverError as exc:
+            return {"value": None, "status": "solver_error", "error": str(exc)}
+        stats = template.problem.solver_stats
+        value = template.w.value
+        return {
+            "value": None if value is None else np.array(value, dtype=float),
+            "status": template.problem.status,
+            "solver": stats.solver_name,
+            "iterations": None if stats.num_iters is None else int(stats.num_iters),
+            "solve_time_ms": None if stats.solve_time is None else round(stats.solve_time * 1000.0, 3),
+            "time_limited": bool(options),
+            "timed_out": bool(options) and _hit_time_limit(stats),
+        }
+
+
+def _solve_box(
     target_weights: Dict[str, float],
     current_weights: Dict[str, float],
     profile: Dict[str, Any],
     adv_by_symbol: Dict[str, float],
     aum: Optional[float],
     config: RuntimeConfig,
-) -> Optional[Dict[str, float]]:
-    if cp is None:
-        return None
+) -> Tuple[Optional[Dict[str, float]], Dict[str, Any], Optional[Dict[str, Any]]]:
+    """box ∩ simplex 上的精确求解，返回 (权重或 None, 遥测, LP 参数)；换手率约束起作用时 LP 参数非 None，需继续 _finish_lp。"""
+    started = time.perf_counter()
+    telemetry: Dict[str, Any] = {
+        "method": "box",
+        "solver": None,
+        "status": None,
+        "iterations": None,
+        "solve_time_ms": None,
+        "elapsed_ms": None,
+        "time_limit_s": float(config.lp_time_limit),
+        "fallback_reason": None,
+        "fallback": None,
+    }
+
+    def finish(
+        weights: Optional[Dict[str, float]], status: str, reason: Optional[str] = None
+    ) -> Tuple[Optional[Dict[str, float]], Dict[str, Any], None]:
+        weights, info = _finish(weights, telemetry, started, status, reason)
+        return weights, info, None
 
     codes = list(dict.fromkeys(list(target_weights.keys()) + list(current_weights.keys())))
     n = len(codes)
     if n == 0:
-        return None
+        return finish(None, "empty", "empty_universe")
 
-    target_vec = [float(target_weights.get(c, 0.0)) for c in codes]
-    current_vec = [float(current_weights.get(c, 0.0)) for c in codes]
-
-    w = cp.Variable(n)
-    t = cp.Variable(n)  # |w - target|
-    u = cp.Variable(n)  # |w - current|
-
-    constraints = [w >= 0, cp.sum(w) == 1]
+    target_vec = np.asarray([float(target_weights.get(c, 0.0)) for c in codes])
+    current_vec = np.asarray([float(current_weights.get(c, 0.0)) for c in codes])
 
     max_single = float(profile.get("max_single_weight", 1.0))
-    if max_single > 0:
-        constraints.append(w <= max_single)
-
-    constraints += [t >= w - target_vec, t >= -(w - target_vec)]
-    constraints += [u >= w - current_vec, u >= -(w - current_vec)]
-
     max_turnover = float(profile.get("max_turnover", 0.0))
-    if max_turnover > 0:
-        constraints.append(0.5 * cp.sum(u) <= max_turnover)
-
     max_delta = float(profile.get("max_position_delta", 0.0))
-    if max_delta > 0:
-        constraints.append(u <= max_delta)
-
     max_adv_ratio = float(profile.get("max_adv_ratio", 0.0))
-    if max_adv_ratio > 0:
-        for i, code in enumerate(codes):
-            adv = float(adv_by_symbol.get(code, 0.0))
-            if adv > 0 and aum:
-                limit = max_adv_ratio * adv / float(aum)
-            else:
-                limit = max_adv_ratio
-            constraints.append(u[i] <= limit)
 
-    turnover_weight = float(config.lp_turnover_weight)
-    objective = cp.Minimize(cp.sum(t) + turnover_weight * cp.sum(u))
-    problem = cp.Problem(objective, constraints)
-    problem.solve(solver=config.lp_solver or None)
+    # 单标的调仓上限：max_position_delta 与按 ADV 折算的上限取较小者，合并为一个向量参数
+    trade_limit = np.full(n, np.inf)
+    if max_delta > 0:
+        trade_limit = np.minimum(trade_limit, max_delta)
+    if max_adv_ratio > 0:
+        adv = np.asarray([float(adv_by_symbol.get(c, 0.0)) for c in codes])
+        if aum:
+            by_adv = np.where(adv > 0, max_adv_ratio * adv / float(aum), max_adv_ratio)
+        else:
+            by_adv = np.full(n, max_adv_ratio)
+        trade_limit = np.minimum(trade_limit, by_adv)
+
+    # 除换手率外的约束都是逐标的的区间，先在 box ∩ simplex 上精确求解；
+    # box 不可行时 LP 同样不可行，换手率约束不紧时该解即 LP 最优解
+    lower = np.maximum(current_vec - trade_limit, 0.0)
+    upper = np.minimum(current_vec + trade_limit, max_single if max_single > 0 else 1.0)
+    exact = l1_box_solve(target_vec, current_vec, lower, upper, float(config.lp_turnover_weight))
+    if exact is None:
+        return finish(None, "infeasible", "infeasible")
+    if max_turnover <= 0 or 0.5 * float(np.abs(exact - current_vec).sum()) <= max_turnover + 1e-9:
+        return finish({code: float(v) for code, v in zip(codes, exact)}, "optimal")
+    telemetry["method"] = "lp"
+    if cp is None:
+        return finish(None, "unavailable", "cvxpy_unavailable")
+
+    telemetry["elapsed_ms"] = round((time.perf_counter() - started) * 1000.0, 3)
+    args = {
+        "codes": codes,
+        "n": n,
+        "target": target_vec,
+        "current": current_vec,
+        "turnover_weight": float(config.lp_turnover_weight),
+        "cap": max_single if max_single > 0 else None,
+        "max_turnover": max_turnover,
+        # u ≤ 2 恒成立（权重在 [0, 1]），以此代替无上限
+        "trade_limit": np.minimum(trade_limit, 2.0) if np.isfinite(trade_limit).any() else None,
+        "solver": _lp_solver(config.lp_solver),
+        "time_limit": float(config.lp_time_limit),
+    }
+    return None, telemetry, args
+
+
+def _finish(
+    weights: Optional[Dict[str, float]],
+    telemetry: Dict[str, Any],
+    started: float,
+    status: str,
+    reason: Optional[str] = None,
+) -> Tuple[Optional[Dict[str, float]], Dict[str, Any]]:
+    telemetry["status"] = telemetry["status"] or status
+    telemetry["fallback_reason"] = reason
+    # elapsed_ms 累加各阶段耗时（批量求解时两阶段可能在不同进程中完成）
+    telemetry["elapsed_ms"] = round((telemetry["elapsed_ms"] or 0.0) + (time.perf_counter() - started) * 1000.0, 3)
+    return weights, telemetry
+
+
+def _finish_lp(
+    args: Dict[str, Any], telemetry: Dict[str, Any]
+) -> Tuple[Optional[Dict[str, float]], Dict[str, Any]]:
+    """求解 _solve_box 交出的 LP；时限由求解器在当前进程内执行，超时或失败时返回 None（回退到启发式调仓）。"""
+    started = time.perf_counter()
+    codes = args["codes"]
+
+    def finish(
+        weights: Optional[Dict[str, float]], status: str, reason: Optional[str] = None
+    ) -> Tuple[Optional[Dict[str, float]], Dict[str, Any]]:
+        return _finish(weights, telemetry, started, status, reason)
+
+    result = _run_lp(args)
+    for key in ("solver", "status", "iterations", "solve_time_ms"):
+        telemetry[key] = result.get(key)
+    if args["time_limit"] > 0 and not result.get("time_limited") and result.get("status") != "solver_error":
+        telemetry["time_limit_s"] = None
+        warnings.warn(
+            f"LP solver {args['solver'] or telemetry['solver']} has no time-limit option; "
+            "LP_TIME_LIMIT is not enforced (use CLARABEL, HIGHS, OSQP or SCS)",
+            RuntimeWarning,
+            stacklevel=2,
+        )
+    if result.get("error"):
+        telemetry["error"] = result["error"]
+    value = result.get("value")
+    if telemetry["status"] == cp.USER_LIMIT or result.get("timed_out"):
+        return finish(None, "failed", "timeout")
+    if telemetry["status"] not in (cp.OPTIMAL, cp.OPTIMAL_INACCURATE) or value is None:
+        return finish(None, "failed", str(telemetry["status"] or "failed"))
+
+    raw = np.maximum(np.asarray(value, dtype=float), 0.0)
+    weights = raw / (raw.sum() or 1.0)
+    # 近似最优的解（含求解器未如实报告的超时）可能违反换手率等约束：复核后才接受
+    violation = _max_violation(weights, args)
+    if not np.isfinite(violation) or violation > _FEASIBILITY_TOL:
+        telemetry["violation"] = float(violation)
+        return finish(None, "failed", "inaccurate")
+    return finish({code: float(v) for code, v in zip(codes, weights)}, str(telemetry["status"]))
 
-    if w.value is None:
-        return None
 
-    raw = [max(0.0, float(v)) for v in w.value]
-    total = sum(raw) or 1.0
-    weights = {code: v / total for code, v in zip(codes, raw)}
-    return weights
+def _solve_lp(
+    target_weights: Dict[str, float],
+    current_weights: Dict[str, float],
+    profile: Dict[str, Any],
+    adv_by_symbol: Dict[str, float],
+    aum: Optional[float],
+    config: RuntimeConfig,
+) -> Tuple[Optional[Dict[str, float]], Dict[str, Any]]:
+    """返回 (权重或 None, 求解遥测)：求解方式、求解器、状态、迭代次数、耗时与回退原因。"""
+    weights, telemetry, args = _solve_box(target_weights, current_weights, profile, adv_by_symbol, aum, config)
+    if args is None:
+        return weights, telemetry
+    return _finish_lp(args, telemetry)
 
 
 def constraint_solver(state: RiskState, config: RuntimeConfig | None = None) -> Dict[str, Any]:
@@ -211,7 +468,7 @@ def constraint_solver(state: RiskState, config: RuntimeConfig | None = None) ->
     adv_by_symbol = snapshot.get("adv_by_symbol") or {}
 
     cash_symbol = str(rules.get("cash_symbol") or cfg.cash_symbol).strip() or "CASH"
-    adjusted_lp = _solve_lp(target_weights, current_weights, rules, adv_by_symbol, aum, cfg)
+    adjusted_lp, solve_info = _solve_lp(target_weights, current_weights, rules, adv_by_symbol, aum, cfg)
     if adjusted_lp and adjusted_lp != target_weights:
         adjusted_lp, limited = _limit_holdings(adjusted_lp, max_holdings, cash_symbol)
         rationale = "使用线性规划在约束下优化目标权重"
@@ -224,10 +481,14 @@ def constraint_solver(state: RiskState, config: RuntimeConfig | None = None) ->
                     "rationale": rationale,
                     "drivers": drivers,
                     "target_weights": adjusted_lp,
+                    "solver": solve_info,
                 }
             ]
         }
 
+    if adjusted_lp:
+        solve_info["fallback_reason"] = "no_change"
+    solve_info["fallback"] = "heuristic"
     adjusted, notes = _adjust_weights(target_weights, rules, drivers, cfg)
     if adjusted and adjusted != target_weights:
         adjusted, limited = _limit_holdings(adjusted, max_holdings, cash_symbol)
@@ -246,6 +507,7 @@ def constraint_solver(state: RiskState, config: RuntimeConfig | None = None) ->
                     "rationale": rationale,
                     "drivers": drivers,
                     "target_weights": adjusted,
+                    "solver": solve_info,
                 }
             ]
         }
@@ -271,6 +533,141 @@ def constraint_solver(state: RiskState, config: RuntimeConfig | None = None) ->
                 "rationale": "风控结果为 restrict，建议调整权重以满足阈值要求。",
                 "drivers": drivers,
                 "guidance": guidance,
+                "solver": dict(solve_info, fallback="review_targets"),
             }
         ]
     }
+
+
+BatchItem = Union[Mapping[str, Any], Sequence[Any]]
+
+
+def _batch_problem(item: BatchItem, config: RuntimeConfig) -> Dict[str, Any]:
+    """把 (target, current, rules, adv, aum) 元组或同名字段的映射整理为 _solve_lp 的参数。"""
+    if isinstance(item, Mapping):
+        target = item.get("target_weights") or {}
+        current = item.get("current_weights") or item.get("current_positions") or {}
+        rules = item.get("rules")
+        if rules is None:
+            rules, _ = load_rules(item.get("policy_profile", "default"), config)
+        adv, aum = item.get("adv_by_symbol") or {}, item.get("aum")
+    else:
+        target, current, rules, adv, aum = item
+    return {
+        "target_weights": {k: float(v) for k, v in (target or {}).items()},
+        "current_weights": {k: float(v) for k, v in (current or {}).items()},
+        "profile": dict(rules or {}),
+        "adv_by_symbol": dict(adv or {}),
+        "aum": config.default_aum if aum is None else aum,
+    }
+
+
+def _solve_chunk(chunk: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """逐个求解一段 LP；同一进程内相同规模与约束组合的 LP 模板复用。"""
+    results = []
+    for args, telemetry in chunk:
+        weights, telemetry = _finish_lp(args, telemetry)
+        telemetry["worker"] = multiprocessing.current_process().name
+        results.append({"target_weights": weights, "solver": telemetry})
+    return results
+
+
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _process_pool(size: int) -> ProcessPoolExecutor:
+    """模块级进程池，跨调用复用（进程内的 LP 模板随之保留）；进程数在首次创建时确定，之后不随调用参数重建。"""
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            if "forkserver" in multiprocessing.get_all_start_methods():
+                ctx = multiprocessing.get_context("forkserver")
+                # forkserver 预先导入本模块（含 cvxpy），子进程 fork 后无需各自重新导入
+                ctx.set_forkserver_preload([__name__])
+            else:
+                ctx = multiprocessing.get_context("spawn")
+            _POOL = ProcessPoolExecutor(max_workers=size, mp_context=ctx)
+        return _POOL
+
+
+def _drop_pool(pool: ProcessPoolExecutor) -> None:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is pool:
+            _POOL = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _pool_solve(
+    chunks: List[List[Tuple[Dict[str, Any], Dict[str, Any]]]], in_flight: int, pool_size: int
+) -> List[Optional[List[Dict[str, Any]]]]:
+    """在进程池上求解各块，同时在途的块不超过 in_flight；进程池不可用时未完成的块为 None。"""
+    done: List[Optional[List[Dict[str, Any]]]] = [None] * len(chunks)
+    futures: Dict[Any, int] = {}
+    pool = _process_pool(pool_size)
+    queue = iter(range(len(chunks)))
+    try:
+        for i in itertools.islice(queue, in_flight):
+            futures[pool.submit(_solve_chunk, chunks[i])] = i
+        while futures:
+            finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done[futures.pop(future)] = future.result()
+            for i in itertools.islice(queue, len(finished)):
+                futures[pool.submit(_solve_chunk, chunks[i])] = i
+    except RuntimeError:
+        # BrokenProcessPool（无法启动或有子进程异常退出），或该池已被其他线程关闭
+        # （cannot schedule new futures after shutdown）：丢弃该池，下次调用重建
+        _drop_pool(pool)
+    for future in futures:
+        future.cancel()
+    return done
+
+
+def solve_batch(
+    problems: Iterable[BatchItem],
+    config: RuntimeConfig | None = None,
+    *,
+    max_workers: int | None = None,
+    chunksize: int | None = None,
+) -> List[Dict[str, Any]]:
+    """批量求解多个账户的调仓 LP，按输入顺序返回 {"target_weights", "solver"}。
+
+    每个问题为 (target, current, rules, adv_by_symbol, aum) 元组，或含 target_weights、
+    current_weights / current_positions、rules（缺省按 policy_profile 读取）、adv_by_symbol、aum 的映射。
+    box 阶段在当前进程内完成；需要求解 LP 的问题分块后分发到模块级进程池（进程数为 SOLVER_WORKERS，
+    0 为 CPU 核数，首次使用时确定并跨调用、跨线程复用），每个 LP 仍按 LP_TIME_LIMIT 限时。max_workers
+    只限制本次调用同时在途的块数，不改变进程池大小。并发数为 1、只有一个 LP 或进程池不可用（如入口
+    脚本缺少 ``if __name__ == "__main__":`` 保护）时未完成的块在当前进程内逐个求解。
+    不可行或求解失败时 target_weights 为 None。
+    """
+    cfg = config or DEFAULT_CONFIG
+    results: List[Dict[str, Any]] = []
+    pending: List[Tuple[int, Tuple[Dict[str, Any], Dict[str, Any]]]] = []
+    for item in problems:
+        # box 阶段（微秒级）在当前进程内完成，只有换手率约束起作用的问题才交给进程池求解 LP
+        weights, telemetry, args = _solve_box(config=cfg, **_batch_problem(item, cfg))
+        if args is not None:
+            pending.append((len(results), (args, telemetry)))
+        else:
+            telemetry["worker"] = multiprocessing.current_process().name
+        results.append({"target_weights": weights, "solver": telemetry})
+    if not pending:
+        return results
+
+    lps = [lp for _, lp in pending]
+    pool_size = max(1, int(cfg.solver_workers or os.cpu_count() or 1))
+    workers = max_workers if max_workers is not None else pool_size
+    workers = max(1, min(int(workers), len(lps)))
+    size = chunksize or max(1, math.ceil(len(lps) / (workers * 4)))
+    chunks = [lps[i : i + size] for i in range(0, len(lps), size)]
+    done: List[Optional[List[Dict[str, Any]]]] = [None] * len(chunks)
+    if workers > 1 and pool_size > 1:
+        done = _pool_solve(chunks, workers, pool_size)
+    solved: List[Dict[str, Any]] = []
+    for chunk, part in zip(chunks, done):
+        solved.extend(part if part is not None else _solve_chunk(chunk))
+    for (index, _), result in zip(pending, solved):
+        results[index] = result
+    return results
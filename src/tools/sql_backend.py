@@ -0,0 +1,206 @@
+"""Optional embedded-database backend for the csv_data accessors.
+
+``DATA_BACKEND=sqlite`` (stdlib) or ``DATA_BACKEND=duckdb`` (requires the
+``duckdb`` package) routes ``market_metrics``, ``market_metrics_by_range``,
+``previous_trading_date``, ``sample_universe`` and literal ``macro_search_hits`` queries to a local
+database file built from CSV_DATA_DIR, so filters, window functions and
+aggregations run inside the database instead of over a fully loaded frame.
+
+Build the file once (and again after the source data changes) with
+``python -m src.tools.sql_build --engine sqlite``.
+
+Dates are stored as ISO ``YYYY-MM-DD`` text so both engines share one SQL
+dialect, and a ``seq`` column records the source row order that the CSV path
+relies on (first-appearance order of codes, date-sorted macro documents).
+"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import duckdb
+except ImportError:  # pragma: no cover - optional dependency
+    duckdb = None
+
+from .trading_calendar import TradingCalendar, to_datetime64
+
+ENGINES = ("sqlite", "duckdb")
+_DB_NAMES = {"sqlite": "risk_data.sqlite", "duckdb": "risk_data.duckdb"}
+PRICE_COLUMNS = ("date", "code", "close", "high", "low", "amount", "adj_factor")
+MACRO_COLUMNS = ("date", "title", "content", "industry_name", "sentiment_score")
+
+SCHEMA = (
+    """CREATE TABLE etf_prices (
+        seq BIGINT, date TEXT, code TEXT, close DOUBLE, high DOUBLE, low DOUBLE, amount DOUBLE, adj_factor DOUBLE
+    )""",
+    """CREATE TABLE macro_docs (
+        seq BIGINT, date TEXT, title TEXT, content TEXT, industry_name TEXT, sentiment_score DOUBLE
+    )""",
+)
+INDEXES = (
+    "CREATE INDEX idx_etf_prices_code_date ON etf_prices (code, date)",
+    "CREATE INDEX idx_etf_prices_date ON etf_prices (date)",
+    "CREATE INDEX idx_macro_docs_date ON macro_docs (date)",
+)
+
+_METRICS_SQL = """
+WITH w AS (
+    SELECT code, date, amount,
+           CASE WHEN close != 0 THEN (high - low) / close * 10000 END AS spread_bps,
+           COALESCE(close * adj_factor, close) AS price
+    FROM etf_prices
+    WHERE code IN ({placeholders}) AND date >= ? AND date <= ?
+), r AS (
+    SELECT code, amount, spread_bps,
+           price / LAG(price) OVER (PARTITION BY code ORDER BY date) - 1 AS ret
+    FROM w
+)
+SELECT code, COUNT(ret), SUM(ret), SUM(ret * ret), AVG(amount), AVG(spread_bps)
+FROM r
+GROUP BY code
+"""
+
+
+def engine_available(engine: str) -> bool:
+    if engine == "sqlite":
+        return True
+    if engine == "duckdb":
+        return duckdb is not None
+    return False
+
+
+def default_db_path(data_dir: Path, engine: str) -> Path:
+    return data_dir / _DB_NAMES.get(engine, _DB_NAMES["sqlite"])
+
+
+def connect(path: Path, engine: str, read_only: bool) -> Any:
+    if engine == "duckdb":
+        if duckdb is None:
+            raise RuntimeError("DATA_BACKEND=duckdb requires the duckdb package")
+        return duckdb.connect(str(path), read_only=read_only)
+    if read_only:
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+    return sqlite3.connect(str(path))
+
+
+def _iso(value: str | None) -> Optional[str]:
+    ts = to_datetime64(value)
+    return None if ts is None else str(ts.astype("datetime64[D]"))
+
+
+class SQLBackend:
+    """只读查询接口；单连接加锁，供同进程内多线程节点共用。close 后再查询时重新打开连接。"""
+
+    def __init__(self, path: Path, engine: str) -> None:
+        self.path = path
+        self.engine = engine
+        self._conn: Any = connect(path, engine, read_only=True)
+        self._lock = threading.Lock()
+        self._calendar: Optional[TradingCalendar] = None
+
+    def _fetchall(self, sql: str, params: Iterable[Any] = ()) -> List[tuple]:
+        with self._lock:
+            if self._conn is None:
+                self._conn = connect(self.path, self.engine, read_only=True)
+            return self._conn.execute(sql, list(params)).fetchall()
+
+    def close(self) -> None:
+        """关闭连接（等待进行中的查询结束）；缓存替换或淘汰该后端时调用。"""
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def market_metrics(
+        self, codes: Iterable[str], start_date: str | None, end_date: str | None
+    ) -> Dict[str, Dict[str, float]]:
+        codes = sorted(codes)
+        if not codes:
+            return {}
+        start = _iso(start_date) or "0000-01-01"
+        end = _iso(end_date) or "9999-12-31"
+        sql = _METRICS_SQL.format(placeholders=", ".join("?" for _ in codes))
+        out: Dict[str, Dict[str, float]] = {}
+        for code, n, s, ss, adv, spread in self._fetchall(sql, [*codes, start, end]):
+            volatility = 0.0
+            if n:
+                mean = s / n
+                volatility = float(np.sqrt(max(ss / n - mean * mean, 0.0)))
+            out[str(code)] = {
+                "volatility": volatility,
+                "adv": float(adv) if adv is not None else 0.0,
+                "spread_bps": float(spread) if spread is not None else 0.0,
+            }
+        return out
+
+    def price_history(
+        self, codes: Iterable[str], start_date: str | None, end_date: str | None
+    ) -> Dict[str, tuple]:
+        """各 code 窗口内按日期排序的 (dates, 复权价格)，口径与 market_metrics 相同。"""
+        codes = sorted(codes)
+        if not codes:
+            return {}
+        start = _iso(start_date) or "0000-01-01"
+        end = _iso(end_date) or "9999-12-31"
+        sql = (
+            "SELECT code, date, COALESCE(close * adj_factor, close) FROM etf_prices "
+            f"WHERE code IN ({', '.join('?' for _ in codes)}) AND date >= ? AND date <= ? ORDER BY code, date"
+        )
+        rows = self._fetchall(sql, [*codes, start, end])
+        if not rows:
+            return {}
+        df = pd.DataFrame(rows, columns=["code", "date", "price"])
+        df["date"] = pd.to_datetime(df["date"])
+        df["price"] = pd.to_numeric(df["price"], errors="coerce")
+        return {
+            str(code): (group["date"].to_numpy(), group["price"].to_numpy(dtype=float))
+            for code, group in df.groupby("code", sort=False)
+        }
+
+    def previous_trading_date(self, asof_date: str) -> Optional[str]:
+        cutoff = _iso(asof_date)
+        if cutoff is None:
+            return None
+        rows = self._fetchall("SELECT MAX(date) FROM etf_prices WHERE date < ?", [cutoff])
+        return rows[0][0] if rows and rows[0][0] else None
+
+    def calendar(self) -> TradingCalendar:
+        if self._calendar is None:
+            rows = self._fetchall("SELECT DISTINCT date FROM etf_prices")
+            self._calendar = TradingCalendar.from_dates([row[0] for row in rows])
+        return self._calendar
+
+    def window_codes(self, start_date: str | None, end_date: str | None) -> List[str]:
+        """[start_date, end_date] 内有行情的 code，按窗口内首次出现的顺序。"""
+        start = _iso(start_date) or "0000-01-01"
+        end = _iso(end_date) or "9999-12-31"
+        sql = "SELECT code FROM etf_prices WHERE date >= ? AND date <= ? GROUP BY code ORDER BY MIN(seq)"
+        return [str(row[0]) for row in self._fetchall(sql, [start, end])]
+
+    def codes_asof(self, asof_date: str | None, min_history: int = 0) -> List[str]:
+        """截至 asof_date 出现过（且至少有 min_history 行）的 code，按源文件中首次出现的顺序。"""
+        cutoff = _iso(asof_date)
+        where = "WHERE date <= ?" if cutoff else ""
+        params: List[Any] = [cutoff] if cutoff else []
+        sql = f"SELECT code FROM etf_prices {where} GROUP BY code HAVING COUNT(*) >= ? ORDER BY MIN(seq)"
+        return [str(row[0]) for row in self._fetchall(sql, [*params, max(int(min_history), 1)])]
+
+    def macro_search(self, query: str, limit: int, asof_date: str | None = None) -> pd.DataFrame:
+        q = query.lower()
+        cutoff = _iso(asof_date)
+        where = "(instr(lower(title), ?) > 0 OR instr(lower(content), ?) > 0)"
+        params: List[Any] = [q, q]
+        if cutoff:
+            where += " AND date <= ?"
+            params.append(cutoff)
+        sql = f"SELECT date, title, content, sentiment_score FROM macro_docs WHERE {where} ORDER BY seq LIMIT ?"
+        rows = self._fetchall(sql, [*params, max(int(limit), 0)])
+        df = pd.DataFrame(rows, columns=["date", "title", "content", "sentiment_score"])
+        df["date"] = pd.to_datetime(df["date"], errors="coerce")
+        return df
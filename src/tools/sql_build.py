@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+from ..config import RuntimeConfig, DEFAULT_CONFIG
+from .csv_data import _data_dir, load_macro_docs, price_shards
+from .price_store import normalize_price_frame
+from .sql_backend import (
+    ENGINES,
+    INDEXES,
+    MACRO_COLUMNS,
+    PRICE_COLUMNS,
+    SCHEMA,
+    connect,
+    default_db_path,
+    engine_available,
+)
+
+
+def _price_rows(chunk: pd.DataFrame, offset: int) -> pd.DataFrame:
+    seq = np.arange(offset, offset + len(chunk))
+    chunk = normalize_price_frame(chunk.assign(seq=seq))
+    out = chunk.reindex(columns=["seq", *PRICE_COLUMNS])
+    out["date"] = out["date"].dt.strftime("%Y-%m-%d")
+    return out
+
+
+def _macro_rows(frame: pd.DataFrame) -> pd.DataFrame:
+    out = frame.reset_index(drop=True).reindex(columns=list(MACRO_COLUMNS))
+    out.insert(0, "seq", np.arange(len(out)))
+    out["date"] = pd.to_datetime(out["date"], errors="coerce").dt.strftime("%Y-%m-%d")
+    out["sentiment_score"] = pd.to_numeric(out["sentiment_score"], errors="coerce")
+    return out
+
+
+def _insert(conn: Any, engine: str, table: str, rows: pd.DataFrame) -> None:
+    if rows.empty:
+        return
+    if engine == "duckdb":
+        conn.register("_incoming", rows)
+        conn.execute(f"INSERT INTO {table} SELECT * FROM _incoming")
+        conn.unregister("_incoming")
+        return
+    records = rows.astype(object).where(rows.notna(), None).itertuples(index=False, name=None)
+    placeholders = ", ".join("?" for _ in rows.columns)
+    conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})", records)
+
+
+def build_database(
+    config: RuntimeConfig | None = None,
+    *,
+    engine: str = "sqlite",
+    target: Path | None = None,
+    chunk_size: int = 200_000,
+) -> Dict[str, Any]:
+    """从 CSV_DATA_DIR 构建数据库文件（各行情分片依次分块导入，不整表载入内存），原子替换旧文件。"""
+    cfg = config or DEFAULT_CONFIG
+    if not engine_available(engine):
+        raise RuntimeError(f"database engine {engine!r} is not available")
+    data_dir = _data_dir(cfg)
+    target = target or default_db_path(data_dir, engine)
+    tmp = target.with_name(f".{target.name}.building")
+    tmp.unlink(missing_ok=True)
+
+    conn = connect(tmp, engine, read_only=False)
+    prices = 0
+    try:
+        for sql in SCHEMA:
+            conn.execute(sql)
+        offset = 0
+        for shard in price_shards(cfg):
+            for chunk in pd.read_csv(shard.path, chunksize=chunk_size):
+                rows = _price_rows(chunk, offset)
+                _insert(conn, engine, "etf_prices", rows)
+                offset += len(chunk)
+                prices += len(rows)
+        macro_docs = load_macro_docs(cfg)
+        macro = _macro_rows(macro_docs) if not macro_docs.empty else pd.DataFrame()
+        _insert(conn, engine, "macro_docs", macro)
+        for sql in INDEXES:
+            conn.execute(sql)
+        if engine == "sqlite":
+            conn.commit()
+    finally:
+        conn.close()
+    tmp.replace(target)
+    return {"path": str(target), "engine": engine, "etf_prices": prices, "macro_docs": int(len(macro))}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the embedded database used by DATA_BACKEND=sqlite/duckdb.")
+    parser.add_argument("--engine", choices=ENGINES, default=DEFAULT_CONFIG.data_backend if DEFAULT_CONFIG.data_backend in ENGINES else "sqlite")
+    parser.add_argument("--target", default=DEFAULT_CONFIG.data_db_path, help="database file path")
+    parser.add_argument("--chunk-size", type=int, default=200_000, help="CSV rows per import batch")
+    args = parser.parse_args()
+
+    result = build_database(
+        engine=args.engine,
+        target=Path(args.target) if args.target else None,
+        chunk_size=args.chunk_size,
+    )
+    print(json.dumps(result, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
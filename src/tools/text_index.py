@@ -0,0 +1,181 @@
+"""Inverted indexes over the macro / compliance text corpora."""
+from __future__ import annotations
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+_REGEX_META = frozenset(".^$*+?{}[]\\|()")
+_CJK = "\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|[^\\W{_CJK}]+")
+_CJK_RUN_RE = re.compile(f"[{_CJK}]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """中文连续片段切成字符 bigram（单字保留 unigram），其余按词切分；统一小写。"""
+    tokens: List[str] = []
+    for run in _TOKEN_RE.findall(text.lower()):
+        if _CJK_RUN_RE.fullmatch(run):
+            if len(run) == 1:
+                tokens.append(run)
+            else:
+                tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def is_literal_query(query: str) -> bool:
+    """原有检索走 pandas str.contains（正则语义）；不含正则元字符的查询才能用索引精确替代。"""
+    return not any(ch in _REGEX_META for ch in query)
+
+
+def _grams(text: str) -> set:
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+class SubstringIndex:
+    """字符 unigram/bigram 倒排索引，回答大小写不敏感的子串查询。
+
+    每篇文档可包含多个字段（如 title/content），查询命中任一字段即视为命中。
+    postings 为升序 doc id 数组，doc id 即文档在原语料中的位置；``dates`` 与
+    doc id 对齐，供 as-of 过滤直接作用于候选集合。
+    """
+
+    def __init__(self, fields: Sequence[Sequence[str]], dates: Optional[np.ndarray] = None) -> None:
+        self.fields: List[List[str]] = [[str(v).lower() for v in values] for values in fields]
+        self.size = len(self.fields[0]) if self.fields else 0
+        self.dates = dates
+        postings: Dict[str, List[int]] = {}
+        for doc_id in range(self.size):
+            for gram in self._doc_grams(doc_id):
+                postings.setdefault(gram, []).append(doc_id)
+        self.postings: Dict[str, np.ndarray] = {
+            gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()
+        }
+
+    def _doc_grams(self, doc_id: int) -> set:
+        grams = set()
+        for values in self.fields:
+            grams |= _grams(values[doc_id])
+        return grams
+
+    def add_documents(self, fields: Sequence[Sequence[str]], dates: Optional[np.ndarray] = None) -> None:
+        """在末尾追加文档（doc id 顺延），只更新新文档涉及的 postings。"""
+        if len(fields) != len(self.fields):
+            raise ValueError("field count mismatch")
+        new_count = len(fields[0]) if fields else 0
+        if not new_count:
+            return
+        for values, new_values in zip(self.fields, fields):
+            values.extend(str(v).lower() for v in new_values)
+        if self.dates is not None and dates is not None:
+            self.dates = np.concatenate([self.dates, np.asarray(dates).astype(self.dates.dtype)])
+        added: Dict[str, List[int]] = {}
+        for doc_id in range(self.size, self.size + new_count):
+            for gram in self._doc_grams(doc_id):
+                added.setdefault(gram, []).append(doc_id)
+        self.size += new_count
+        for gram, ids in added.items():
+            new_ids = np.asarray(ids, dtype=np.int32)
+            current = self.postings.get(gram)
+            self.postings[gram] = new_ids if current is None else np.concatenate([current, new_ids])
+
+    def _candidates(self, query: str) -> np.ndarray:
+        grams = {query} if len(query) == 1 else {query[i:i + 2] for i in range(len(query) - 1)}
+        lists = []
+        for gram in grams:
+            ids = self.postings.get(gram)
+            if ids is None:
+                return np.empty(0, dtype=np.int32)
+            lists.append(ids)
+        lists.sort(key=len)
+        result = lists[0]
+        for ids in lists[1:]:
+            result = np.intersect1d(result, ids, assume_unique=True)
+            if not result.size:
+                break
+        return result
+
+    def search(
+        self,
+        query: str,
+        limit: int,
+        cutoff: Optional[np.datetime64] = None,
+        before: Optional[int] = None,
+    ) -> List[int]:
+        """返回命中的 doc id（按语料原顺序），至多 limit 个。
+
+        ``before`` 限定 doc id < before（语料按日期排序时即为 as-of 截断，
+        直接在 postings 上二分）；``cutoff`` 则按 doc 日期逐个过滤候选。
+        """
+        q = query.lower()
+        if not q or limit <= 0 or not self.size:
+            return []
+        candidates = self._candidates(q)
+        if before is not None:
+            candidates = candidates[: int(np.searchsorted(candidates, before, side="left"))]
+        if cutoff is not None and self.dates is not None and candidates.size:
+            cand_dates = self.dates[candidates]
+            candidates = candidates[~np.isnat(cand_dates) & (cand_dates <= cutoff)]
+        hits: List[int] = []
+        for doc_id in candidates.tolist():
+            if any(q in values[doc_id] for values in self.fields):
+                hits.append(doc_id)
+                if len(hits) >= limit:
+                    break
+        return hits
+
+
+class BM25Index:
+    """预分词的 BM25 倒排索引；每个 posting 预先存好长度归一化后的词频权重。"""
+
+    def __init__(self, texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> None:
+        self.size = len(texts)
+        doc_tokens = [Counter(tokenize(str(text))) for text in texts]
+        doc_len = np.asarray([sum(c.values()) for c in doc_tokens], dtype=float)
+        avg_len = float(doc_len.mean()) if self.size and doc_len.sum() > 0 else 1.0
+        norm = k1 * (1.0 - b + b * doc_len / avg_len)
+
+        ids: Dict[str, List[int]] = {}
+        tfs: Dict[str, List[int]] = {}
+        for doc_id, counts in enumerate(doc_tokens):
+            for term, tf in counts.items():
+                ids.setdefault(term, []).append(doc_id)
+                tfs.setdefault(term, []).append(tf)
+
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for term, doc_ids in ids.items():
+            id_arr = np.asarray(doc_ids, dtype=np.int32)
+            tf_arr = np.asarray(tfs[term], dtype=float)
+            df = len(doc_ids)
+            idf = math.log(1.0 + (self.size - df + 0.5) / (df + 0.5))
+            weight = idf * tf_arr * (k1 + 1.0) / (tf_arr + norm[id_arr])
+            self.postings[term] = (id_arr, weight)
+
+    def search(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """返回 (doc id, score)，按得分降序，至多 limit 个。"""
+        if not self.size or limit <= 0:
+            return []
+        scores = np.zeros(self.size)
+        matched = False
+        for term, qtf in Counter(tokenize(query)).items():
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, weight = posting
+            scores[doc_ids] += qtf * weight
+            matched = True
+        if not matched:
+            return []
+        candidates = np.flatnonzero(scores > 0)
+        if candidates.size > limit:
+            top = np.argpartition(-scores[candidates], limit - 1)[:limit]
+            candidates = candidates[top]
+        order = np.lexsort((candidates, -scores[candidates]))
+        return [(int(candidates[i]), float(scores[candidates[i]])) for i in order]
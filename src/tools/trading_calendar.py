@@ -0,0 +1,149 @@
+"""Sorted trading-date index with bisect-based lookups."""
+from __future__ import annotations
+
+from typing import Callable, Iterable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def to_datetime64(value: str | None) -> Optional[np.datetime64]:
+    if not value:
+        return None
+    ts = pd.to_datetime(value, errors="coerce")
+    if pd.isna(ts):
+        return None
+    return ts.to_datetime64()
+
+
+class TradingCalendar:
+    """行情中出现过的交易日（去重、升序），所有查询均为二分查找。"""
+
+    def __init__(self, dates: np.ndarray) -> None:
+        self.dates = dates
+
+    @classmethod
+    def from_dates(cls, values: Iterable) -> "TradingCalendar":
+        arr = np.asarray(values)
+        if arr.dtype.kind != "M":
+            arr = arr.astype("datetime64[ns]")
+        arr = arr[~np.isnat(arr)]
+        return cls(np.unique(arr))
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    def append(self, values: Iterable) -> None:
+        new = TradingCalendar.from_dates(values).dates
+        if not len(new):
+            return
+        if len(self.dates):
+            new = new.astype(self.dates.dtype)
+            if new[0] > self.dates[-1]:
+                self.dates = np.concatenate([self.dates, new])
+                return
+            new = np.union1d(self.dates, new)
+        self.dates = new
+
+    def _format(self, pos: int) -> str:
+        return str(self.dates[pos].astype("datetime64[D]"))
+
+    def latest(self) -> Optional[str]:
+        return self._format(len(self.dates) - 1) if len(self.dates) else None
+
+    def previous(self, asof_date: str) -> Optional[str]:
+        """严格早于 asof_date 的最近交易日。"""
+        cutoff = to_datetime64(asof_date)
+        if cutoff is None:
+            return None
+        pos = int(np.searchsorted(self.dates, cutoff, side="left")) - 1
+        return self._format(pos) if pos >= 0 else None
+
+    def next(self, asof_date: str) -> Optional[str]:
+        """严格晚于 asof_date 的最近交易日。"""
+        cutoff = to_datetime64(asof_date)
+        if cutoff is None:
+            return None
+        pos = int(np.searchsorted(self.dates, cutoff, side="right"))
+        return self._format(pos) if pos < len(self.dates) else None
+
+    def shift_back(self, asof_date: str, n: int) -> Optional[str]:
+        """asof_date 当日或之前最近交易日再回溯 n 个交易日（不足时取首个交易日）。"""
+        cutoff = to_datetime64(asof_date)
+        if cutoff is None:
+            return None
+        pos = int(np.searchsorted(self.dates, cutoff, side="right")) - 1
+        if pos < 0:
+            return None
+        return self._format(max(pos - max(int(n), 0), 0))
+
+
+class ShardedCalendar:
+    """按周期分片的交易日历；查询只加载 asof 附近的分片，结果与合并后的单一日历一致。"""
+
+    def __init__(
+        self,
+        periods: Sequence[Tuple[np.datetime64, np.datetime64]],
+        load: Callable[[int], TradingCalendar],
+    ) -> None:
+        self._periods = list(periods)
+        self._load = load
+
+    def _upto(self, cutoff: np.datetime64) -> range:
+        day = cutoff.astype("datetime64[D]")
+        count = sum(1 for start, _ in self._periods if start <= day)
+        return range(count - 1, -1, -1)
+
+    def latest(self) -> Optional[str]:
+        for i in range(len(self._periods) - 1, -1, -1):
+            latest = self._load(i).latest()
+            if latest:
+                return latest
+        return None
+
+    def previous(self, asof_date: str) -> Optional[str]:
+        cutoff = to_datetime64(asof_date)
+        if cutoff is None:
+            return None
+        for i in self._upto(cutoff):
+            found = self._load(i).previous(asof_date)
+            if found:
+                return found
+        return None
+
+    def next(self, asof_date: str) -> Optional[str]:
+        cutoff = to_datetime64(asof_date)
+        if cutoff is None:
+            return None
+        day = cutoff.astype("datetime64[D]")
+        for i, (_, end) in enumerate(self._periods):
+            if end < day:
+                continue
+            found = self._load(i).next(asof_date)
+            if found:
+                return found
+        return None
+
+    def shift_back(self, asof_date: str, n: int) -> Optional[str]:
+        cutoff = to_datetime64(asof_date)
+        if cutoff is None:
+            return None
+        steps = max(int(n), 0)
+        anchored = False
+        earliest: Optional[str] = None
+        for i in self._upto(cutoff):
+            calendar = self._load(i)
+            if not len(calendar):
+                continue
+            if anchored:
+                top = len(calendar) - 1
+            else:
+                top = int(np.searchsorted(calendar.dates, cutoff, side="right")) - 1
+                if top < 0:
+                    continue
+                anchored = True
+            if top >= steps:
+                return calendar._format(top - steps)
+            steps -= top + 1
+            earliest = calendar._format(0)
+        return earliest
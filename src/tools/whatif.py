@@ -0,0 +1,253 @@
+"""Stateful what-if session for interactive pre-trade weight edits.
+
+``WhatIfSession`` runs validation, data quality and the snapshot once, then
+keeps running sums (sum of weights, sum of squares, weighted vol/spread/ADV,
+absolute deltas) and lazy max-heaps (top weight, largest position change,
+largest ADV ratio) over the target weights.  ``update`` applies a handful of
+weight changes in O(changed positions) — O(changed x universe) under
+``VOLATILITY_MODEL=covariance`` — and re-runs only the rule checks whose
+metric moved.  Codes the session has not seen before are priced through the
+shared market context.  Under the covariance model the shrinkage estimate
+depends on the whole universe (target and current codes), so an update that
+adds or drops a code from that universe rebuilds the session, including the
+current-portfolio volatility, to stay identical to a fresh snapshot.
+"""
+from __future__ import annotations
+
+import heapq
+from typing import Any, Dict, Hashable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from ..config import RuntimeConfig, DEFAULT_CONFIG
+from ..state import RiskState, new_state
+from .constraints import blocklist_finding, compile_rules
+from .data_quality import check_data_quality
+from .market_context import market_context
+from .snapshot import risk_snapshot_bundle
+from .utils import EPSILON, normalize_weights
+from .validate import validate_and_normalize
+
+# 随 update 变化的指标；current_* 与 adv_by_symbol 等在会话内保持不变
+_TARGET_METRICS = (
+    "portfolio_volatility",
+    "delta_portfolio_volatility",
+    "weighted_spread_bps",
+    "weighted_adv",
+    "hhi",
+    "effective_n",
+    "top_weight",
+    "delta_hhi",
+    "delta_effective_n",
+    "turnover",
+    "max_position_delta",
+    "max_adv_ratio",
+    "missing_market_rows",
+)
+
+
+class _LazyMax:
+    """带惰性删除的最大堆：更新某个 key 只需 O(log n)，过期条目在取最大值时丢弃。"""
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, Hashable]] = []
+        self._values: Dict[Hashable, float] = {}
+
+    def set(self, key: Hashable, value: Optional[float]) -> None:
+        if value is None:
+            self._values.pop(key, None)
+            return
+        self._values[key] = value
+        heapq.heappush(self._heap, (-value, key))
+        if len(self._heap) > 4 * len(self._values) + 64:
+            self._heap = [(-v, k) for k, v in self._values.items()]
+            heapq.heapify(self._heap)
+
+    def max(self) -> Optional[float]:
+        while self._heap:
+            neg, key = self._heap[0]
+            if self._values.get(key) == -neg:
+                return -neg
+            heapq.heappop(self._heap)
+        return None
+
+
+class WhatIfSession:
+    """持有一次完整快照的交互式会话；update 增量更新指标并只重跑受影响的规则。"""
+
+    def __init__(self, state: RiskState, config: RuntimeConfig | None = None) -> None:
+        self.config = config or DEFAULT_CONFIG
+        self.state = state
+        normalized = state.get("normalized") or {}
+        self.asof_date = normalized.get("asof_date") or ""
+        aum = normalized.get("aum")
+        self.aum = self.config.default_aum if aum is None else aum
+        self.rules = compile_rules(normalized.get("policy_profile", "default"), self.config)
+        self.blocklist = set(state.get("compliance_blocklist") or self.rules.blocklist)
+        self.target: Dict[str, float] = {c: float(w) for c, w in (normalized.get("target_weights") or {}).items()}
+        self.current: Dict[str, float] = {
+            c: float(w) for c, w in (normalized.get("current_positions") or {}).items()
+        }
+        self.metrics: Dict[str, Any] = dict(state.get("snapshot_metrics") or {})
+        self._rebuild()
+
+    @classmethod
+    def open(
+        cls, intent: Dict[str, Any], context: Optional[Dict[str, Any]] = None, config: RuntimeConfig | None = None
+    ) -> "WhatIfSession":
+        """按 RiskMAS 前处理流程（校验、数据质量、快照）建立会话。"""
+        cfg = config or DEFAULT_CONFIG
+        state = new_state(intent, context or {})
+        for step in (validate_and_normalize, check_data_quality, risk_snapshot_bundle):
+            state.update(step(state, cfg))
+        return cls(state, cfg)
+
+    # ----- 全量重建 -----
+
+    def _rebuild(self) -> None:
+        """按当前权重从头计算全部累加量（会话建立、引入新标的或需要消除累积误差时调用）。"""
+        codes = list(dict.fromkeys([*self.target, *self.current]))
+        self.context = market_context(self.state, codes, self.asof_date, self.config)
+        self.state["market_context"] = self.context
+        self.market = self.context.metrics_for(codes)
+        self.sum_w = 0.0
+        self.sum_w2 = 0.0
+        self.sum_vol = 0.0
+        self.sum_spread = 0.0
+        self.sum_adv = 0.0
+        self.sum_abs_delta = 0.0
+        self.top = _LazyMax()
+        self.delta_max = _LazyMax()
+        self.adv_ratio = _LazyMax()
+        self.missing = {code for code in self.target if code not in self.market}
+        for code in codes:
+            self._apply(code, 0.0, self.target.get(code), self.current.get(code, 0.0), fresh=True)
+
+        self.model = None
+        if self.config.volatility_model == "covariance":
+            self.model = self.context.covariance(self.market)
+        if self.model is not None:
+            self.model_index = {code: i for i, code in enumerate(self.model.codes)}
+            self.t_vec = self.model.weight_vector(self.target)
+            self.cov_t = self.model.cov @ self.t_vec
+            self.quad = float(self.t_vec @ self.cov_t)
+
+        self.metrics["adv_by_symbol"] = {code: float(row.get("adv") or 0.0) for code, row in self.market.items()}
+        self.metrics["current_portfolio_volatility"] = self._current_volatility()
+        self._recompute_metrics()
+        self.findings: Dict[str, Optional[Dict[str, Any]]] = self.rules.evaluate(self.metrics)
+        self.findings["blocklist"] = blocklist_finding(self.target, self.blocklist)
+
+    # ----- 增量更新 -----
+
+    def _apply(self, code: str, old: float, new: Optional[float], current: float, fresh: bool = False) -> None:
+        """把 code 的目标权重从 old 改为 new（None 表示不在目标组合中），更新累加量与各最大堆。"""
+        new_w = 0.0 if new is None else new
+        row = self.market.get(code)
+        self.sum_w += new_w - old
+        self.sum_w2 += new_w * new_w - old * old
+        if row:
+            self.sum_vol += (new_w - old) * float(row.get("volatility") or 0.0)
+            self.sum_spread += (new_w - old) * float(row.get("spread_bps") or 0.0)
+            self.sum_adv += (new_w - old) * float(row.get("adv") or 0.0)
+        old_delta = 0.0 if fresh else abs(old - current)
+        new_delta = abs(new_w - current)
+        self.sum_abs_delta += new_delta - old_delta
+        self.delta_max.set(code, new_delta)
+        self.top.set(code, None if new is None else new_w)
+        adv = float(row.get("adv") or 0.0) if row else 0.0
+        if new is not None and row and adv > 0 and self.aum:
+            self.adv_ratio.set(code, new_delta * float(self.aum) / adv)
+        else:
+            self.adv_ratio.set(code, None)
+
+    def _current_volatility(self) -> float:
+        """当前持仓波动率，口径同 risk_snapshot_bundle（协方差模式下用本 universe 的模型）。"""
+        current_norm = normalize_weights(self.current)
+        if self.model is not None:
+            return self.model.volatility(current_norm)
+        return sum(
+            weight * float(self.market[code].get("volatility") or 0.0)
+            for code, weight in current_norm.items()
+            if self.market.get(code)
+        )
+
+    def _recompute_metrics(self) -> None:
+        scale = self.sum_w if self.sum_w > 0 else 1.0
+        m = self.metrics
+        hhi = self.sum_w2 / (scale * scale)
+        effective_n = 1.0 / hhi if hhi > EPSILON else 0.0
+        if self.model is not None:
+            vol = float(np.sqrt(max(self.quad, 0.0))) / scale
+        else:
+            vol = self.sum_vol / scale
+        top = self.top.max()
+        m["portfolio_volatility"] = vol
+        m["delta_portfolio_volatility"] = vol - float(m.get("current_portfolio_volatility") or 0.0)
+        m["weighted_spread_bps"] = self.sum_spread / scale
+        m["weighted_adv"] = self.sum_adv / scale
+        m["hhi"] = hhi
+        m["effective_n"] = effective_n
+        m["top_weight"] = 0.0 if top is None else top / scale
+        m["delta_hhi"] = hhi - float(m.get("current_hhi") or 0.0)
+        m["delta_effective_n"] = effective_n - float(m.get("current_effective_n") or 0.0)
+        m["turnover"] = 0.5 * self.sum_abs_delta
+        m["max_position_delta"] = self.delta_max.max() or 0.0
+        m["max_adv_ratio"] = self.adv_ratio.max()
+        m["missing_market_rows"] = [code for code in self.target if code in self.missing]
+
+    def update(self, weights: Mapping[str, float]) -> Dict[str, Any]:
+        """修改部分目标权重（权重为 None 表示移出目标组合），返回新指标、规则结果与变化的指标名。"""
+        changes = {str(code): (None if w is None else float(w)) for code, w in weights.items()}
+        unseen = [code for code, w in changes.items() if w is not None and code not in self.target and code not in self.current]
+        dropped = [code for code, w in changes.items() if w is None and code in self.target and code not in self.current]
+        if unseen or (dropped and self.model is not None):
+            # 新标的需要行情指标；协方差模式下 universe 变化还需按新 universe 重估模型，走一次全量重建
+            self.target.update({code: w for code, w in changes.items() if w is not None})
+            for code in [c for c, w in changes.items() if w is None]:
+                self.target.pop(code, None)
+            before = {key: self.metrics.get(key) for key in _TARGET_METRICS}
+            self._rebuild()
+            return self._result([key for key in _TARGET_METRICS if self.metrics.get(key) != before[key]])
+
+        before = {key: self.metrics.get(key) for key in _TARGET_METRICS}
+        for code, new in changes.items():
+            old = self.target.get(code)
+            if old is None and new is None:
+                continue
+            self._apply(code, 0.0 if old is None else old, new, self.current.get(code, 0.0))
+            if self.model is not None and code in self.model_index:
+                i = self.model_index[code]
+                delta = (0.0 if new is None else new) - self.t_vec[i]
+                self.quad += 2.0 * delta * self.cov_t[i] + delta * delta * self.model.cov[i, i]
+                self.cov_t += delta * self.model.cov[:, i]
+                self.t_vec[i] += delta
+            if new is None:
+                self.target.pop(code, None)
+                self.missing.discard(code)
+                if code not in self.current:
+                    # 移出后不再属于快照 universe（协方差模式下已在上方走全量重建）
+                    self.market.pop(code, None)
+                    self.metrics["adv_by_symbol"].pop(code, None)
+            else:
+                self.target[code] = new
+                if code not in self.market:
+                    self.missing.add(code)
+        self._recompute_metrics()
+        changed = [key for key in _TARGET_METRICS if self.metrics.get(key) != before[key]]
+        self.findings.update(self.rules.evaluate(self.metrics, only=changed))
+        if any(code in self.blocklist for code in changes):
+            self.findings["blocklist"] = blocklist_finding(self.target, self.blocklist)
+        return self._result(changed)
+
+    def _result(self, changed: List[str]) -> Dict[str, Any]:
+        return {
+            "snapshot_metrics": self.metrics,
+            "rule_findings": [f for f in self.findings.values() if f is not None],
+            "changed_metrics": changed,
+        }
+
+    def refresh(self) -> Dict[str, Any]:
+        """全量重算（消除长时间增量更新后的浮点累积误差）。"""
+        self._rebuild()
+        return self._result(list(_TARGET_METRICS))